@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+"""
+Local archive plugin.
+This plugin is an output like zabbix_sender.
+It gets the items from Queue and appends them to local segment files
+as newline-delimited JSON, so that full resolution history is kept
+without Zabbix server.
+
+Segments are partitioned by time("segment_seconds")
+and also rotated by size("segment_bytes").
+Closed segments are compressed by gzip,
+and the compressed segments older than "retention" seconds are removed.
+The writer holds an exclusive lock of "PATH/PREFIX.lock",
+so two sections(or processes) can't write the same "path" and "prefix".
+Uncompressed segments other than the current one were left by
+a previous process, they are compressed at the first run.
+The directory is scanned only at the first run and after rotation.
+e.g:
+    [archive]
+    module = archive
+    path = /var/lib/blackbird/archive
+    # fsync after every run(run), only before closing segments(rotate),
+    # or never(never).
+    fsync = rotate
+"""
+
+import errno
+import fcntl
+import gzip
+import os
+import shutil
+import time
+
+from blackbird.plugins import base
+from blackbird.utils import jsonbackend
+
+SUFFIX = '.ndjson'
+COMPRESSED_SUFFIX = SUFFIX + '.gz'
+
+
+class ConcreteJob(base.JobBase):
+
+    is_output = True
+
+    def __init__(self, options, queue=None, stats_queue=None, logger=None):
+        super(ConcreteJob, self).__init__(options, queue, logger)
+
+        self.path = options['path']
+        self.prefix = options['prefix']
+        if not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError as error:
+                raise base.BlackbirdPluginError(
+                    'cannot create archive directory {0}: {1}'
+                    ''.format(self.path, error)
+                )
+
+        self.segment = None
+        self.segment_path = None
+        self.segment_start = None
+        self.segment_bytes = 0
+        self.sequence = 0
+        # taken at the first run, file descriptors are closed by daemonizing.
+        self.lock = None
+        self.cleanup_needed = True
+
+        self.written = 0
+        self.stats_queue = stats_queue
+
+    def build_items(self):
+        """
+        main loop
+        """
+        written = 0
+        written_bytes = 0
+        now = time.time()
+
+        if self.lock is None:
+            self.acquire()
+
+        while not self.queue.empty():
+            item = self.queue.get()
+            record = self.serialize(item)
+
+            self.rotate(now, len(record))
+            self.segment.write(record)
+            self.segment_bytes += len(record)
+            written += 1
+            written_bytes += len(record)
+
+        if self.segment is not None:
+            if self.partition(now) != self.segment_start:
+                self.close()
+            else:
+                self.segment.flush()
+                if self.options['fsync'] == 'run':
+                    os.fsync(self.segment.fileno())
+
+        self.written += written
+        if written:
+            self._put_stats('blackbird.archive.items', written)
+            self._put_stats('blackbird.archive.bytes', written_bytes)
+
+        if self.cleanup_needed:
+            self.cleanup()
+            self.cleanup_needed = False
+
+    def acquire(self):
+        """
+        Take the exclusive lock of "path" and "prefix".
+        """
+        lock_path = os.path.join(self.path, self.prefix + '.lock')
+        lock = open(lock_path, 'a')
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError as error:
+            lock.close()
+            if error.errno not in (errno.EAGAIN, errno.EACCES):
+                raise
+            raise base.BlackbirdPluginError(
+                '{0} is locked, another archive section or process '
+                'writes to {1} with prefix "{2}"'
+                ''.format(lock_path, self.path, self.prefix)
+            )
+        self.lock = lock
+
+    def serialize(self, item):
+        """
+        One line per data.
+        """
+        data = item.data
+        if isinstance(data, (list, tuple)):
+            return ''.join(
+                [jsonbackend.dumps(entry) + '\n' for entry in data]
+            )
+        return item.wire + '\n'
+
+    def partition(self, now):
+        now = int(now)
+        return now - now % self.options['segment_seconds']
+
+    def rotate(self, now, size):
+        """
+        Open the segment which the record of given size goes to.
+        """
+        start = self.partition(now)
+        if self.segment is not None:
+            if start == self.segment_start and (
+                    self.segment_bytes + size <= self.options['segment_bytes']
+                    or self.segment_bytes == 0):
+                return
+            self.close()
+
+        if start != self.segment_start:
+            self.sequence = 0
+        else:
+            self.sequence += 1
+
+        self.segment_start = start
+        self.segment_path = self.segment_name(start, self.sequence)
+        # don't overwrite the segment of previous process.
+        while (os.path.exists(self.segment_path) or
+               os.path.exists(self.segment_path + '.gz')):
+            self.sequence += 1
+            self.segment_path = self.segment_name(start, self.sequence)
+
+        self.segment = open(
+            self.segment_path, 'ab', self.options['buffer_size']
+        )
+        self.segment_bytes = 0
+        self.logger.debug('opened archive segment %s', self.segment_path)
+
+    def segment_name(self, start, sequence):
+        return os.path.join(self.path, '{0}.{1}.{2}{3}'.format(
+            self.prefix,
+            time.strftime('%Y%m%d%H%M%S', time.gmtime(start)),
+            sequence,
+            SUFFIX
+        ))
+
+    def close(self):
+        """
+        Close the current segment and compress it.
+        """
+        self.segment.flush()
+        if self.options['fsync'] != 'never':
+            os.fsync(self.segment.fileno())
+        self.segment.close()
+        self.segment = None
+
+        if self.options['compress']:
+            self.compress(self.segment_path)
+        self.segment_path = None
+        self.cleanup_needed = True
+
+    def compress(self, path):
+        with open(path, 'rb') as source:
+            with gzip.open(path + '.gz', 'wb') as destination:
+                shutil.copyfileobj(source, destination)
+        os.remove(path)
+        self.logger.debug('compressed archive segment %s', path)
+
+    def cleanup(self):
+        """
+        Compress the segments left by previous process,
+        and remove the segments older than "retention" seconds.
+        Other writers are excluded by the lock,
+        so the uncompressed segments except the current one are left.
+        """
+        retention = self.options['retention']
+        now = time.time()
+
+        for filename in os.listdir(self.path):
+            if not filename.startswith(self.prefix + '.'):
+                continue
+            path = os.path.join(self.path, filename)
+
+            if path == self.segment_path:
+                continue
+
+            if filename.endswith(SUFFIX) and self.options['compress']:
+                self.compress(path)
+            elif (retention and
+                    filename.endswith((COMPRESSED_SUFFIX, SUFFIX)) and
+                    now - os.path.getmtime(path) > retention):
+                os.remove(path)
+                self.logger.info(
+                    'removed archive segment {0}'.format(path)
+                )
+
+    def status(self):
+        return {
+            'segment': self.segment_path,
+            'segment_bytes': self.segment_bytes,
+            'written': self.written,
+        }
+
+    def _put_stats(self, key, value):
+        if self.stats_queue is None:
+            return
+        self.enqueue(
+            item=base.StatisticsItem(key=key, value=value),
+            queue=self.stats_queue
+        )
+
+
+class Validator(base.ValidatorBase):
+    u"""
+    This class store information
+    which is used by validation config file.
+    """
+
+    def __init__(self):
+        self.__spec = None
+
+    @property
+    def spec(self):
+        self.__spec = (
+            "[{0}]".format(__name__),
+            "path = string()",
+            "prefix = string(default='blackbird')",
+            "segment_seconds = integer(min=1, default=3600)",
+            "segment_bytes = integer(min=1, default=67108864)",
+            "buffer_size = integer(min=0, default=65536)",
+            "fsync = option('run', 'rotate', 'never', default='rotate')",
+            "compress = boolean(default=True)",
+            "retention = integer(min=0, default=604800)",
+        )
+        return self.__spec
@@ -3,12 +3,20 @@
 """Various Base objects"""
 
 import abc
-import datetime
+import collections
+import contextlib
 import json
+import select
 import socket
+import sys
+import threading
 import time
 
 from Queue import Full
+from blackbird.utils import aggregate
+from blackbird.utils import deadband
+from blackbird.utils import jsonbackend
+from blackbird.utils import lld
 from blackbird.utils.error import BlackbirdError
 
 
@@ -17,12 +25,38 @@ class JobBase(object):
 
     __metaclass__ = abc.ABCMeta
 
+    # Output plugins(e.g: zabbix_sender) get items from "queue".
+    # Each section of them has its own queue(see utils/router.py).
+    is_output = False
+
     def __init__(self, options, queue, logger):
         self.options = options
         self.queue = queue
         self.logger = logger
         self.invalid_key_list = None
 
+        self.deadband = None
+        if options.get('deadband'):
+            self.deadband = deadband.Deadband(
+                rules=options['deadband'],
+                heartbeat=options.get('heartbeat', 10)
+            )
+
+        self.discovery_cache = lld.DiscoveryCache(
+            refresh=options.get('lld_refresh', 6)
+        )
+
+        self.aggregator = None
+        if options.get('aggregate'):
+            self.aggregator = aggregate.Aggregator(
+                patterns=options['aggregate'],
+                window=options.get('aggregate_window', 60),
+                functions=options.get(
+                    'aggregate_functions', aggregate.Aggregator.FUNCTIONS
+                ),
+                size=options.get('aggregate_size', 600)
+            )
+
     # TODO: looped_method to build_items
     # @abc.abstractmethod
     # def looped_method(self):
@@ -34,6 +68,12 @@ class JobBase(object):
         If you define "self.filter" (sequence),
         this method put the item to queue after filtering.
         "self.filter" operates as blacklist.
+        DiscoveryItem which has same entities as the last one
+        is not put(see utils/lld.py).
+        If "aggregate" option is set,
+        the summaries of values are put instead(see utils/aggregate.py).
+        If "deadband" option is set,
+        unchanged values are not put(see utils/deadband.py).
 
         This method expects that
         "item" argument has dict type "data" attribute.
@@ -46,25 +86,84 @@ class JobBase(object):
             for entry in self.invalid_key_list:
                 if entry in item.data['key']:
                     is_enqueue_item = False
-                    log_message = (
-                        '{key} is filtered by "invalid_key_list".'
-                        ''.format(key=item.data['key'],
-                                  plugin=__name__)
+                    self.logger.debug(
+                        '%s is filtered by "invalid_key_list".',
+                        item.data['key']
                     )
-                    self.logger.debug(log_message)
                     break
 
-        if is_enqueue_item:
-            try:
-                queue.put(item, block=False)
+        discovery_checked = False
+        if (is_enqueue_item and isinstance(item, DiscoveryItem) and
+                queue is self.queue):
+            is_enqueue_item = self.discovery_cache.check(
+                item.host, item.key, item.value
+            )
+            discovery_checked = is_enqueue_item
+            if not is_enqueue_item:
+                self.logger.debug(
+                    '%s is not changed since the last run.', item.key
+                )
+
+        if (is_enqueue_item and self.aggregator is not None and
+                queue is self.queue):
+            summaries = self.aggregator.add(
+                item.host, item.key, item.value, item.clock
+            )
+            if summaries is not None:
+                for key, value, clock in summaries:
+                    self._put(queue, DataItem({
+                        'host': item.host,
+                        'key': key,
+                        'value': value,
+                        'clock': clock,
+                    }))
                 return True
-            except Full:
-                self.logger.error('Blackbird item Queue is Full!!!')
+
+        deadband_checked = False
+        if (is_enqueue_item and self.deadband is not None and
+                queue is self.queue):
+            is_enqueue_item = self.deadband.check(
+                item.host, item.key, item.value
+            )
+            deadband_checked = is_enqueue_item
+
+        if is_enqueue_item:
+            if not self._put(queue, item):
                 return False
+            # the value becomes the last sent one only if it is put.
+            if discovery_checked:
+                self.discovery_cache.sent(item.host, item.key, item.value)
+            if deadband_checked:
+                self.deadband.sent(item.host, item.key, item.value)
+            return True
 
         else:
             return False
 
+    def flush_aggregates(self, now=None):
+        """
+        Put the summaries of the aggregate windows which have ended,
+        so that the last window of a key which stopped reporting is sent.
+        This is called after each run by JobClock.
+        """
+        if self.aggregator is None:
+            return
+        for host, key, value, clock in self.aggregator.flush(now):
+            self._put(self.queue, DataItem({
+                'host': host,
+                'key': key,
+                'value': value,
+                'clock': clock,
+            }))
+
+    def _put(self, queue, item):
+        try:
+            queue.put(item, block=False)
+            return True
+        except Full:
+            self.logger.error('Blackbird item Queue is Full!!!')
+            return False
+
 
 class ItemBase(object):
     """
@@ -75,17 +174,36 @@ class ItemBase(object):
 
     __metaclass__ = abc.ABCMeta
 
-    def __init__(self, key=None, value=None, host=None, clock=None):
+    def __init__(self, key=None, value=None, host=None, clock=None, ns=None):
         self.key = key
         self.value = value
         self.host = host
-        self.clock = self.__set_timestamp(clock)
+        self.clock, self.ns = self.__set_timestamp(clock, ns)
 
     @abc.abstractproperty
     def data(self):
         u"""Dequeued data."""
         raise NotImplementedError
 
+    @property
+    def wire(self):
+        u"""
+        "data" serialized as JSON(UTF-8 bytes) for sending.
+        It is serialized only once,
+        and reused when the item is sent again after a failure.
+        If "data" is list or tuple,
+        serialized elements are joined with ",".
+        """
+        wire = getattr(self, '_wire', None)
+        if wire is None:
+            data = self.data
+            if isinstance(data, (list, tuple)):
+                wire = ','.join([jsonbackend.dumps(entry) for entry in data])
+            else:
+                wire = jsonbackend.dumps(data)
+            self._wire = wire
+        return wire
+
     def _generate(self):
         u"""overrided in each modules."""
 
@@ -93,22 +211,69 @@ class ItemBase(object):
         self._data['value'] = self.value
         self._data['host'] = self.host
         self._data['clock'] = self.clock
+        if self.ns is not None:
+            self._data['ns'] = self.ns
 
-    def __set_timestamp(self, clock):
+    def __set_timestamp(self, clock, ns):
         """
-        If "clock" is None, set the time now.
+        If "clock" is None, set the time of current job run
+        (see JobClock) as "clock" and "ns".
         This function is called self.__init__()
         """
         if clock is None:
-            unix_timestamp = time.mktime(
-                datetime.datetime.now().utctimetuple()
-            )
-            timestamp = int(unix_timestamp)
-
-            return timestamp
+            return now()
 
         else:
-            return clock
+            return clock, ns
+
+
+_tick = threading.local()
+
+
+def read_clock():
+    """
+    Return the current time as (seconds, nanoseconds).
+    """
+    if hasattr(time, 'time_ns'):
+        seconds, ns = divmod(time.time_ns(), 1000000000)
+        return seconds, ns
+    timestamp = time.time()
+    seconds = int(timestamp)
+    return seconds, min(int(round((timestamp - seconds) * 1e9)), 999999999)
+
+
+def now():
+    """
+    Return (seconds, nanoseconds) of the current job run,
+    or the current time outside of job runs.
+    """
+    clock = getattr(_tick, 'clock', None)
+    if clock is None:
+        return read_clock()
+    return clock
+
+
+class JobClock(object):
+    """
+    Wrapper of the job method.
+    The clock is read once at the start of each run,
+    and all the items created in the run share it.
+    The ended aggregate windows of the job are flushed after each run.
+    """
+
+    def __init__(self, method):
+        self.method = method
+        job_obj = getattr(method, 'im_self', None)
+        self.job_obj = job_obj if isinstance(job_obj, JobBase) else None
+
+    def __call__(self):
+        _tick.clock = read_clock()
+        try:
+            return self.method()
+        finally:
+            if self.job_obj is not None:
+                self.job_obj.flush_aggregates()
+            _tick.clock = None
 
 
 class DiscoveryItem(ItemBase):
@@ -142,10 +307,13 @@ class DiscoveryItem(ItemBase):
         super(DiscoveryItem, self).__init__(key, value, host)
 
         self.__data = dict()
-        self._generate()
 
     @property
     def data(self):
+        # generated at first access,
+        # the value isn't serialized if the item is skipped by enqueue.
+        if not self.__data:
+            self._generate()
         return self.__data
 
     def _generate(self):
@@ -159,6 +327,54 @@ class DiscoveryItem(ItemBase):
         self.__data['value'] = json.dumps(value)
 
 
+class StatisticsItem(ItemBase):
+    """
+    Item of blackbird's own statistics.
+    Put this item to "stats_queue", not to "queue".
+    The statistics plugin sums up the values of same key.
+    If "gauge" is True, the statistics plugin overwrites the value instead.
+    e.x:
+        item = StatisticsItem(
+            key='blackbird.job.cpu_seconds[redis]',
+            value=0.012
+        )
+    """
+
+    def __init__(self, key, value, host=None, gauge=False):
+        super(StatisticsItem, self).__init__(key, value, host)
+        self.gauge = gauge
+
+        self._data = dict()
+        self._generate()
+
+    @property
+    def data(self):
+        return self._data
+
+
+class DataItem(ItemBase):
+    """
+    Item which is rebuilt from "data" of another item.
+    e.g: items which are received from a worker process.
+    "data" may be a list of dictionaries.
+    """
+
+    def __init__(self, data):
+        fields = data if isinstance(data, dict) else dict()
+        super(DataItem, self).__init__(
+            key=fields.get('key'),
+            value=fields.get('value'),
+            host=fields.get('host'),
+            clock=fields.get('clock'),
+            ns=fields.get('ns')
+        )
+        self._data = data
+
+    @property
+    def data(self):
+        return self._data
+
+
 class BlackbirdPluginError(BlackbirdError):
     """
     blackbird error object.
@@ -268,3 +484,380 @@ class Timer(object):
 
         self.sec = str(round(diff, 6))
         self.msec = str(round(diff * 1000, 6))
+
+
+class _Flight(object):
+    """
+    A fetch in progress of SharedCache.
+    Other callers of the same key wait for its result.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.exc_info = None
+
+    def set_result(self, value):
+        self.value = value
+        self.event.set()
+
+    def set_error(self, exc_info):
+        self.exc_info = exc_info
+        self.event.set()
+
+    def wait(self):
+        self.event.wait()
+        if self.exc_info is not None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.value
+
+
+class SharedCache(object):
+    """
+    TTL cache shared among ConcreteJobs.
+    When several sections read the same source
+    (e.g: different keys of one redis INFO),
+    wrap the fetch with this cache so that the source is fetched
+    once per "ttl" seconds however many sections read it.
+    Usage:
+        info = base.shared_cache.fetch(
+            key=('redis', self.options['host'], self.options['port']),
+            func=self.redis.info,
+            ttl=self.options['interval']
+        )
+
+    "key" is the identity of the source, it must be hashable.
+    Concurrent callers of the same key wait for one fetch(single-flight).
+    If the fetch raises, all of them get the error and nothing is cached.
+    The number of entries is bounded by "max_entries"
+    and the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._flights = dict()
+
+    def fetch(self, key, func, ttl):
+        """
+        Return cached value of "key",
+        or call "func" and cache the result for "ttl" seconds.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and entry[1] > time.time():
+                # re-insert as the most recently used.
+                self._entries[key] = entry
+                self.hits += 1
+                return entry[0]
+
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            return flight.wait()
+
+        # the flight is removed and the waiters are woken up
+        # even by BaseException(e.g: KeyboardInterrupt, SystemExit).
+        # sys.exc_info() is empty in "finally" of python 2,
+        # so it is kept in "except".
+        exc_info = None
+        try:
+            value = func()
+        except BaseException:
+            exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if exc_info is None:
+                    self._entries[key] = (value, time.time() + float(ttl))
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            if exc_info is None:
+                flight.set_result(value)
+            else:
+                flight.set_error(exc_info)
+
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+        }
+
+
+# SharedCache instance shared by all plugins.
+shared_cache = SharedCache()
+
+
+class ConnectionPool(object):
+    """
+    Pool of keep-alive connections shared among ConcreteJobs.
+    Plugins which connect to the same endpoint every interval
+    (e.g: redis, memcached, HTTP status page) reuse the sockets
+    instead of leaving thousands of TIME_WAIT connections.
+    Usage:
+        with base.connection_pool.connection(('127.0.0.1', 6379)) as sock:
+            sock.sendall('INFO\\r\\n')
+            ...
+
+    "endpoint" is (host, port) or the path of unix domain socket.
+    The socket goes back to the pool when the block exits normally,
+    and it is closed when the block raises.
+    Call "checkin(endpoint, sock, reuse=False)" to close it explicitly
+    (e.g: the server closes the connection after the response).
+
+    On checkout, the idle socket is reused if it is healthy:
+    it must not be readable(closed by the peer or unread data is left)
+    and "check(sock)" must return True if it is given.
+    Idle sockets older than "idle_timeout" seconds are closed.
+    At most "max_per_endpoint" sockets(idle and in use) are opened
+    per endpoint, and the caller waits for a free one at most
+    "timeout" seconds.
+    TCP keepalive is enabled on new sockets if "keepalive" is True.
+    """
+
+    def __init__(self, max_per_endpoint=4, idle_timeout=60, keepalive=True,
+                 keepalive_idle=60, keepalive_interval=10, keepalive_count=3):
+        self.max_per_endpoint = max_per_endpoint
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.keepalive_idle = keepalive_idle
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_count = keepalive_count
+
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+
+        self._condition = threading.Condition(threading.Lock())
+        self._idle = dict()
+        self._in_use = collections.defaultdict(int)
+        self._pruned = time.time()
+
+    @contextlib.contextmanager
+    def connection(self, endpoint, timeout=5, check=None):
+        sock = self.checkout(endpoint, timeout, check)
+        # the slot is released even by BaseException
+        # (e.g: GeneratorExit, CancelledError of the cancelled coroutine).
+        reuse = False
+        try:
+            yield sock
+            reuse = True
+        finally:
+            self.checkin(endpoint, sock, reuse=reuse)
+
+    def checkout(self, endpoint, timeout=5, check=None):
+        """
+        Return the healthy idle socket or a new socket of the endpoint.
+        "timeout" is also set to the new socket.
+        """
+        sock = self._reserve(endpoint, timeout)
+        while sock is not None:
+            if _healthy(sock, check):
+                with self._condition:
+                    self.hits += 1
+                return sock
+            _close(sock)
+            with self._condition:
+                self.discarded += 1
+                sock = self._pop_idle(endpoint)
+
+        try:
+            sock = self._connect(endpoint, timeout)
+        except BaseException:
+            self.checkin(endpoint, None, reuse=False)
+            raise
+        with self._condition:
+            self.misses += 1
+        return sock
+
+    def checkin(self, endpoint, sock, reuse=True):
+        """
+        Return the socket to the pool, or close it if "reuse" is False.
+        """
+        with self._condition:
+            self._in_use[endpoint] -= 1
+            if not self._in_use[endpoint]:
+                del self._in_use[endpoint]
+            if reuse and sock is not None:
+                self._idle.setdefault(endpoint, list()).append(
+                    (sock, time.time())
+                )
+            self._condition.notify()
+        if not reuse and sock is not None:
+            _close(sock)
+
+    def _reserve(self, endpoint, timeout):
+        """
+        Take an idle socket, or reserve a slot to connect(return None).
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        with self._condition:
+            self._prune()
+            while True:
+                sock = self._pop_idle(endpoint)
+                if sock is not None:
+                    self._in_use[endpoint] += 1
+                    return sock
+                opened = (
+                    len(self._idle.get(endpoint, ())) +
+                    self._in_use.get(endpoint, 0)
+                )
+                if opened < self.max_per_endpoint:
+                    self._in_use[endpoint] += 1
+                    return None
+
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise BlackbirdPluginError(
+                            'no connection to {0} is available '
+                            '({1} connections are in use).'
+                            ''.format(endpoint, self.max_per_endpoint)
+                        )
+                self._condition.wait(remaining)
+
+    def _pop_idle(self, endpoint):
+        """
+        Pop the most recently used idle socket which is not expired.
+        Called with the lock held.
+        """
+        idle = self._idle.get(endpoint)
+        now = time.time()
+        while idle:
+            sock, last_used = idle.pop()
+            if now - last_used <= self.idle_timeout:
+                if not idle:
+                    del self._idle[endpoint]
+                return sock
+            _close(sock)
+            self.discarded += 1
+        self._idle.pop(endpoint, None)
+        return None
+
+    def _prune(self):
+        """
+        Close expired idle sockets of all the endpoints once per second.
+        Called with the lock held.
+        """
+        now = time.time()
+        if now - self._pruned < 1:
+            return
+        self._pruned = now
+
+        for endpoint, idle in self._idle.items():
+            alive = list()
+            for sock, last_used in idle:
+                if now - last_used > self.idle_timeout:
+                    _close(sock)
+                    self.discarded += 1
+                else:
+                    alive.append((sock, last_used))
+            if alive:
+                self._idle[endpoint] = alive
+            else:
+                del self._idle[endpoint]
+
+    def _connect(self, endpoint, timeout):
+        if isinstance(endpoint, basestring):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(endpoint)
+            except Exception:
+                sock.close()
+                raise
+            return sock
+
+        sock = socket.create_connection(endpoint, timeout)
+        if self.keepalive:
+            self._set_keepalive(sock)
+        return sock
+
+    def _set_keepalive(self, sock):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # not every platform has them(e.g: mac os has no TCP_KEEPIDLE).
+        options = (
+            ('TCP_KEEPIDLE', self.keepalive_idle),
+            ('TCP_KEEPINTVL', self.keepalive_interval),
+            ('TCP_KEEPCNT', self.keepalive_count),
+        )
+        for name, value in options:
+            if hasattr(socket, name):
+                sock.setsockopt(
+                    socket.IPPROTO_TCP, getattr(socket, name), value
+                )
+
+    def clear(self):
+        """
+        Close all the idle sockets.
+        """
+        with self._condition:
+            for idle in self._idle.values():
+                for sock, _ in idle:
+                    _close(sock)
+            self._idle.clear()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'idle': sum([len(idle) for idle in self._idle.values()]),
+                'in_use': sum(self._in_use.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'discarded': self.discarded,
+            }
+
+
+def _healthy(sock, check=None):
+    """
+    The idle socket must not be readable.
+    If it is, the peer has closed it or unread data is left.
+    """
+    try:
+        if select.select([sock], [], [], 0)[0]:
+            return False
+    except (select.error, socket.error, ValueError):
+        return False
+    if check is not None:
+        return check(sock)
+    return True
+
+
+def _close(sock):
+    try:
+        sock.close()
+    except socket.error:
+        pass
+
+
+# ConnectionPool instance shared by all plugins.
+connection_pool = ConnectionPool()
@@ -34,7 +34,7 @@ class ConcreteJob(base.JobBase):
                                    host=self.hostname
                                    )
 
-                self.queue.put(item, block=False)
+                self.enqueue(item)
 
     @staticmethod
     def count(procfile):
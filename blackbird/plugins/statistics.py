@@ -6,8 +6,18 @@ This plugin get the items queue for "stats" and
 put the items queue for "item".
 """
 
+import re
+
 import blackbird
 from blackbird.plugins import base
+from blackbird.utils import procstat
+from blackbird.utils.logger import storm_filter
+
+
+# e.g: blackbird.job.cpu_seconds[SECTION_NAME]
+JOB_ACCOUNTING_KEY = re.compile(
+    r'^blackbird\.job\.(cpu_seconds|allocated_bytes)\[(.+)\]$'
+)
 
 
 class ConcreteJob(base.JobBase):
@@ -24,6 +34,10 @@ class ConcreteJob(base.JobBase):
         }
         self.stats_queue = stats_queue
 
+        self.process_stat = None
+        if options.get('process_stats', True):
+            self.process_stat = procstat.ProcessStat()
+
     def build_items(self):
         """
         get the items from STATS QUEUE
@@ -35,24 +49,90 @@ class ConcreteJob(base.JobBase):
             item = self.stats_queue.get()
             self.calculate(item)
 
+        if self.process_stat is not None:
+            try:
+                self.stats.update(self.process_stat.read())
+            except (IOError, OSError, IndexError, ValueError) as error:
+                self.logger.error(
+                    'cannot read resource usage of blackbird process: '
+                    '{0}'.format(error)
+                )
+
+        # suppressed log storms (see utils/logger.py StormFilter).
+        storm = storm_filter(self.logger)
+        if storm is not None:
+            storm.flush()
+            self.stats.update(storm.stats())
+
+        # only after some plugin has used plugins.base.connection_pool.
+        pool_stats = base.connection_pool.stats()
+        if pool_stats['misses']:
+            for name, value in pool_stats.items():
+                self.stats['blackbird.connection_pool.' + name] = value
+
+        # with "max_queue_bytes" in global section.
+        queue_bytes = getattr(self.queue, 'bytes', None)
+        if queue_bytes is not None:
+            self.stats['blackbird.queue.bytes'] = queue_bytes
+
         for key, value in self.stats.iteritems():
             if 'blackbird.queue.length' == key:
                 value = self.queue.qsize()
+            elif isinstance(value, float):
+                value = round(value, 6)
             item = BlackbirdStatisticsItem(
                 key=key,
                 value=value,
                 host=self.options['hostname']
             )
             if self.enqueue(item=item, queue=self.queue):
-                self.logger.debug(
-                    'Inserted {0} to the queue.'.format(item.data)
-                )
+                self.logger.debug('Inserted %s to the queue.', item.data)
+
+        self.log_job_accounting()
 
     def calculate(self, item):
+        """
+        Sum up the value of known keys.
+        Keys which start with "blackbird." (e.g: per job statistics)
+        are added to self.stats when they are first seen.
+        Gauge items overwrite the value.
+        """
         if 'key' in item.data:
-            if item.data['key'] in self.stats.keys():
-                key = item.data['key']
+            key = item.data['key']
+            if getattr(item, 'gauge', False):
+                self.stats[key] = item.data['value']
+            elif key in self.stats:
                 self.stats[key] += item.data['value']
+            elif key.startswith('blackbird.'):
+                self.stats[key] = item.data['value']
+
+    def log_job_accounting(self):
+        """
+        Log the summary of cumulative CPU time and allocated bytes per section.
+        """
+        summary = dict()
+        for key, value in self.stats.items():
+            matched = JOB_ACCOUNTING_KEY.match(key)
+            if matched:
+                name, section = matched.groups()
+                summary.setdefault(section, dict())[name] = value
+
+        if not summary:
+            return
+
+        entries = list()
+        for section in sorted(summary):
+            usage = summary[section]
+            entry = '{0}(cpu_seconds={1}'.format(
+                section, round(usage.get('cpu_seconds', 0), 6)
+            )
+            if 'allocated_bytes' in usage:
+                entry += ' allocated_bytes={0}'.format(
+                    usage['allocated_bytes']
+                )
+            entries.append(entry + ')')
+
+        self.logger.info('job accounting: {0}'.format(', '.join(entries)))
 
 
 class BlackbirdStatisticsItem(base.ItemBase):
@@ -76,6 +156,7 @@ class Validator(base.ValidatorBase):
     def spec(self):
         self.__spec = (
             "[{0}]".format(__name__),
-            "hostname = string(default={0})".format(self.detect_hostname())
+            "hostname = string(default={0})".format(self.detect_hostname()),
+            "process_stats = boolean(default=True)",
         )
         return self.__spec
@@ -6,14 +6,49 @@ This plugin get the item from Queue and send the item to zabbix-server.
 Beforehand, you need to map each key with Zabbix template.
 """
 
+import collections
+import itertools
 import json
+import random
+import re
 import socket
 import struct
+import time
 
 from blackbird.plugins import base
 
+FAILED_PATTERN = re.compile(r'failed: *(\d+)')
+
+
+class Batch(object):
+    """
+    Items which are sent in one request.
+    A batch keeps its items until the server answers,
+    so that a failed batch is retried as is and never duplicated.
+    """
+
+    def __init__(self, batch_id, items):
+        self.id = batch_id
+        self.items = items
+        self.created = time.time()
+        self.attempts = 0
+
+    def age(self):
+        return time.time() - self.created
+
+    def status(self):
+        return {
+            'id': self.id,
+            'items': len(self.items),
+            'attempts': self.attempts,
+            'age': round(self.age(), 3),
+        }
+
 
 class ConcreteJob(base.JobBase):
+
+    is_output = True
+
     def __init__(self, options, queue=None, stats_queue=None, logger=None):
         super(ConcreteJob, self).__init__(options, queue, logger)
 
@@ -22,13 +57,20 @@ class ConcreteJob(base.JobBase):
         self.server_port = None
         self.set_server_port(options['port'])
 
-        self.body = dict()
-        self.body['request'] = 'sender data'
-        self.body['data'] = list()
         self.result = None
 
-        # Pool for when it fails to send.
-        self.pool = list()
+        # Batches which are not sent yet (oldest first).
+        self.batches = collections.deque()
+        self.batch_ids = itertools.count(1)
+
+        # Reconnection backoff
+        self.failures = 0
+        self.next_connect = 0
+
+        # Groups of (host, key) which include rejected items,
+        # and the negative cache of rejected (host, key).
+        self.suspects = list()
+        self.rejected = dict()
 
         # For blackbird's statistics
         self.stats_queue = stats_queue
@@ -38,38 +80,257 @@ class ConcreteJob(base.JobBase):
         main loop
         """
 
-        conn = self.connect(address=self.server_address, port=self.server_port)
+        # while backing off, new items wait in the bounded item queue.
+        items = list()
+        if not self.batches or time.time() >= self.next_connect:
+            while not self.queue.empty():
+                items.append(self.queue.get())
+        items = self.suppress_rejected(items)
+        if items:
+            self.batches.append(Batch(next(self.batch_ids), items))
+
+        self.expire_batches()
+        self.limit_batches()
+        self.logger.debug(
+            'Queue length is %d (%d batches pending)',
+            len(items), len(self.batches)
+        )
 
-        if conn:
+        if self.batches and time.time() >= self.next_connect:
+            self.send_batches()
 
-            while not self.queue.empty():
-                item = self.queue.get()
-                self.pool.append(item)
-                if type(item.data) is (tuple or list):
-                    self.body['data'].extend(item.data)
-                else:
-                    self.body['data'].append(item.data)
-            self.logger.debug(self.body['data'])
+        self.build_statistics_item()
 
+    def send_batches(self):
+        """
+        Send pending batches, the newest first
+        so that fresh data isn't blocked by the batches which failed before.
+        Stop at the first failure and retry after the backoff.
+        """
+        for batch in reversed(list(self.batches)):
+            batch.attempts += 1
             try:
-                log_message = (
-                    'Queue length is {0}'.format(len(self.body['data']))
-                )
-                self.logger.debug(log_message)
-                if len(self.body['data']) != 0:
-                    self.send(conn)
-                    self.logger.debug(self.get_result())
-            except:
-                self._reverse_queue()
-                log_message = (
-                    'An error occurred.'
-                    'Maybe socket error, or get invalid value.'
-                )
-                self.logger.debug(log_message)
+                self.send_batch(batch)
+            except Exception as error:
+                self.failed(batch, error)
+                return
+
+            self.batches.remove(batch)
+            self.failures = 0
+            self.next_connect = 0
+            if batch.attempts > 1:
+                self._put_stats('blackbird.zabbix_sender.retried', 1)
+
+    def send_batch(self, batch):
+        """
+        Send the batch in one request,
+        or in several requests while suspects are bisected.
+        Sent items are removed from the batch at once,
+        so that they aren't sent again if a following request fails.
+        """
+        for group, items in self.split(batch.items):
+            result = self.request(items)
+            sent = set([id(item) for item in items])
+            batch.items = [
+                item for item in batch.items if id(item) not in sent
+            ]
+            self.logger.debug('%s', result)
+            self.check_failures(group, items, result)
+
+    def request(self, items):
+        """
+        Send items in one connection and return the response.
+        """
+        conn = self.connect(
+            address=self.server_address, port=self.server_port
+        )
+        if not conn:
+            raise socket.error(
+                'could not connect to {0}:{1}'
+                ''.format(self.server_address, self.server_port)
+            )
+        try:
+            self.send(conn, items)
+        finally:
+            conn.close()
+
+        return self.get_result()
+
+    def split(self, items):
+        """
+        Split items into requests.
+        If "bisect_failures" is enabled, the items of each suspect group
+        are sent in two halves separately from the others,
+        so that the failed half is narrowed down at every cycle
+        without sending any item twice.
+        Return list of (group or None, items).
+        """
+        if not self.suspects:
+            return [(None, items)]
+
+        groups = list()
+        for group in self.suspects:
+            pairs = sorted(group)
+            half = len(pairs) // 2
+            if half:
+                groups.extend([set(pairs[:half]), set(pairs[half:])])
+            else:
+                groups.append(group)
+        self.suspects = list()
+
+        requests = dict()
+        for item in items:
+            pair = (item.host, item.key)
+            for index, group in enumerate(groups):
+                if pair in group:
+                    break
             else:
-                del self.body['data'][:]
+                index = None
+            requests.setdefault(index, list()).append(item)
 
-        self.build_statistics_item()
+        # keep the suspects which have no item in this batch.
+        for index, group in enumerate(groups):
+            if index not in requests:
+                self.suspects.append(group)
+
+        return [
+            (groups[index] if index is not None else None, requests[index])
+            for index in sorted(requests, key=lambda index: index is None)
+        ]
+
+    def check_failures(self, group, items, result):
+        """
+        Narrow down the items which the server has rejected.
+        """
+        if not self.options['bisect_failures']:
+            return
+
+        failed = FAILED_PATTERN.search(result.get('info', ''))
+        if failed is None:
+            return
+        pairs = set([(item.host, item.key) for item in items])
+
+        if int(failed.group(1)) == 0:
+            # a part of the suspect group which isn't sent is still suspect.
+            if group is not None and group - pairs:
+                self.suspects.append(group - pairs)
+        elif len(pairs) == 1:
+            self.reject(pairs.pop())
+        else:
+            self.suspects.append(pairs)
+
+    def reject(self, pair):
+        """
+        Put (host, key) to the negative cache for "reject_ttl" seconds.
+        """
+        self.rejected[pair] = time.time() + self.options['reject_ttl']
+        self.logger.warn(
+            'zabbix server rejected host "{0}" key "{1}". '
+            'it is not sent for {2} sec.'
+            ''.format(pair[0], pair[1], self.options['reject_ttl'])
+        )
+
+    def suppress_rejected(self, items):
+        """
+        Remove the items in the negative cache.
+        Expired entries are removed so that they are probed again.
+        """
+        if not self.rejected:
+            return items
+
+        now = time.time()
+        for pair, expires in self.rejected.items():
+            if expires <= now:
+                del self.rejected[pair]
+                self.logger.info(
+                    'probing host "{0}" key "{1}" again.'.format(*pair)
+                )
+
+        passed = [
+            item for item in items
+            if (item.host, item.key) not in self.rejected
+        ]
+        if len(passed) != len(items):
+            self._put_stats(
+                'blackbird.zabbix_sender.suppressed', len(items) - len(passed)
+            )
+        return passed
+
+    def failed(self, batch, reason):
+        """
+        Keep the batch and delay the next connection
+        by exponential backoff with jitter.
+        """
+        self.failures += 1
+        backoff = min(
+            self.options['retry_backoff'] * 2 ** min(self.failures - 1, 32),
+            self.options['retry_max_backoff']
+        )
+        backoff *= random.uniform(0.5, 1.0)
+        self.next_connect = time.time() + backoff
+
+        self.logger.warn(
+            'failed to send batch %d (%d items, attempt %d): %s. '
+            'retry after %.1f sec.',
+            batch.id, len(batch.items), batch.attempts, reason, backoff
+        )
+
+    def expire_batches(self):
+        """
+        Drop the batches older than "max_staleness" seconds.
+        """
+        max_staleness = self.options['max_staleness']
+        if not max_staleness:
+            return
+
+        while self.batches and self.batches[0].age() > max_staleness:
+            batch = self.batches.popleft()
+            self.logger.error(
+                'dropped batch %d (%d items) unsent for %.0f sec.',
+                batch.id, len(batch.items), batch.age()
+            )
+            self._put_stats(
+                'blackbird.zabbix_sender.dropped', len(batch.items)
+            )
+
+    def limit_batches(self):
+        """
+        Drop the oldest batches while the pending items are more than
+        the length of the item queue("max_queue_length"),
+        so that pending items are bounded even if "max_staleness" is 0.
+        """
+        max_items = getattr(self.queue, 'maxsize', 0)
+        if not max_items:
+            return
+
+        pending = sum([len(batch.items) for batch in self.batches])
+        while self.batches and pending > max_items:
+            batch = self.batches.popleft()
+            pending -= len(batch.items)
+            self.logger.error(
+                'dropped batch %d (%d items), '
+                'pending items exceed max_queue_length %d.',
+                batch.id, len(batch.items), max_items
+            )
+            self._put_stats(
+                'blackbird.zabbix_sender.dropped', len(batch.items)
+            )
+
+    def status(self):
+        """
+        Status of this sender for the status endpoint.
+        """
+        return {
+            'server': '{0}:{1}'.format(self.server_address, self.server_port),
+            'last_result': self.get_result() if self.result else None,
+            'batches': [batch.status() for batch in self.batches],
+            'failures': self.failures,
+            'next_connect': self.next_connect or None,
+            'suspects': len(self.suspects),
+            'rejected': sorted(
+                ['{0}:{1}'.format(*pair) for pair in self.rejected]
+            ),
+        }
 
     def connect(self, address, port):
         try:
@@ -81,8 +342,24 @@ class ConcreteJob(base.JobBase):
         except socket.error:
             return False
 
-    def send(self, sock):
-        request = json.dumps(self.body, ensure_ascii=False).encode('utf-8')
+    def build_request(self, items):
+        """
+        Build the request body from pre-serialized items.
+        Each item is serialized only once (see base.ItemBase.wire),
+        the fragments are just concatenated here.
+        "clock" and "ns" of the request are the time of sending,
+        Zabbix server corrects the clock of items by them.
+        """
+        clock, ns = base.read_clock()
+        return ''.join([
+            '{"request":"sender data","data":[',
+            ','.join([item.wire for item in items]),
+            '],"clock":{0},"ns":{1}}}'.format(clock, ns),
+        ])
+
+    def send(self, sock, items):
+        request = self.build_request(items)
+        self.logger.debug('%s', request)
         fmt = '<4sBQ' + str(len(request)) + 's'
         data = struct.pack(fmt, 'ZBXD', 1, len(request), request)
 
@@ -94,25 +371,19 @@ class ConcreteJob(base.JobBase):
         response = reader.read()
         reader.close()
 
-        sock.close()
-
         fmt = '<4sBQ' + str(len(response) - struct.calcsize('<4sBQ')) + 's'
         self.result = struct.unpack(fmt, response)
 
-        del self.pool[:]
-
     def get_result(self):
         return json.loads(self.result[3])
 
-    def _reverse_queue(self):
-        u"""When socket.timeout has occurred for Zabbix server,
-        this method is called.
-        Enqueue items in self.pool[].
-        """
-
-        while self.pool:
-            item = self.pool.pop()
-            self.queue.put(item, block=False)
+    def _put_stats(self, key, value):
+        if self.stats_queue is None:
+            return
+        self.enqueue(
+            item=base.StatisticsItem(key=key, value=value),
+            queue=self.stats_queue
+        )
 
     def build_statistics_item(self):
         """
@@ -173,13 +444,12 @@ class ConcreteJob(base.JobBase):
                 if key in stats_key_list:
                     if self.enqueue(item=item, queue=self.stats_queue):
                         self.logger.debug(
-                            'Inserted {0} to the statistics queue'
-                            ''.format(item.data)
+                            'Inserted %s to the statistics queue', item.data
                         )
                 else:
                     if self.enqueue(item=item, queue=self.queue):
                         self.logger.debug(
-                            'Inserted {0} to the queue'.format(item.data)
+                            'Inserted %s to the queue', item.data
                         )
 
     def set_server_port(self, port):
@@ -213,6 +483,8 @@ class BlackbirdStatisticsItem(base.ItemBase):
     def _generate(self):
         self.__data['host'] = self.host
         self.__data['clock'] = self.clock
+        if self.ns is not None:
+            self.__data['ns'] = self.ns
         self.__data['key'] = self.key
         self.__data['value'] = self.value
 
@@ -233,6 +505,11 @@ class Validator(base.ValidatorBase):
             "server = string()",
             "port = integer(0, 65535, default=10051)",
             "timeout = integer(default=4)",
+            "retry_backoff = float(min=0, default=1)",
+            "retry_max_backoff = float(min=0, default=300)",
+            "max_staleness = integer(min=0, default=600)",
+            "bisect_failures = boolean(default=False)",
+            "reject_ttl = integer(min=0, default=3600)",
             "hostname = string(default={0})".format(self.detect_hostname()),
         )
         return self.__spec
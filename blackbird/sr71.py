@@ -3,17 +3,34 @@
 
 import Queue
 import inspect
+import os
 import sys
 import threading
 import time
 from daemon import DaemonContext
 
 from blackbird import __version__
+from blackbird.utils import accounting
 from blackbird.utils import argumentparse
+from blackbird.utils import bench
 from blackbird.utils import configread
+from blackbird.utils import eventloop
+from blackbird.utils import jsonbackend
 from blackbird.utils import logger
+from blackbird.utils import profiler
+from blackbird.utils import router
+from blackbird.utils import spillqueue
+from blackbird.utils import status
+from blackbird.utils import targets
+from blackbird.utils import worker
 from blackbird.utils.error import BlackbirdError
-from blackbird.plugins.base import BlackbirdPluginError
+from blackbird.utils.error import JobTimeoutError
+from blackbird.utils.eventloop import From
+from blackbird.utils.supervisor import JobSupervisor
+from blackbird.plugins.base import JobBase
+from blackbird.plugins.base import JobClock
+from blackbird.plugins.base import StatisticsItem
+from blackbird.plugins.base import connection_pool
 
 try:
     # for python-daemon 1.5.x(lockfile 0.8.x)
@@ -40,8 +57,16 @@ class BlackBird(object):
         self.observers = configread.JobObserver()
         self.config = self._get_config()
         self.logger = self._set_logger()
+        self._set_json_backend()
+        self._set_connection_pool()
+        if self.args.once or self.args.bench:
+            self._select_sections()
 
         self.jobs = None
+        self.job_objects = None
+        self.queue = None
+        self.stats_queue = None
+        self.executors = dict()
 
         self._add_arguments(self.args)
         self._create_threads()
@@ -59,19 +84,94 @@ class BlackBird(object):
         return _config.config
 
     def _set_logger(self):
+        options = {
+            'buffer_size': self.config['global'].get('log_buffer', 0),
+            'overflow': self.config['global'].get('log_overflow', 'drop_new'),
+            'rate': self.config['global'].get('log_rate', 0),
+            'burst': self.config['global'].get('log_burst', 20),
+            'repeat_interval': self.config['global'].get(
+                'log_repeat_interval', 0
+            ),
+        }
         if self.args.debug_mode:
             logger_obj = logger.logger_factory(
                 sys.stdout,
-                'debug'
+                'debug',
+                **options
+            )
+        elif self.args.once or self.args.bench:
+            # stdout is used for the items and the report.
+            logger_obj = logger.logger_factory(
+                sys.stderr,
+                self.config['global']['log_level'],
+                fmt=self.config['global']['log_format'],
+                **options
             )
         else:
             logger_obj = logger.logger_factory(
                 filename=self.config['global']['log_file'],
                 level=self.config['global']['log_level'],
-                fmt=self.config['global']['log_format']
+                fmt=self.config['global']['log_format'],
+                **options
             )
         return logger_obj
 
+    def _set_json_backend(self):
+        try:
+            backend = jsonbackend.use(self.config['global']['json_backend'])
+        except BlackbirdError as error:
+            self.logger.error(error)
+            backend = jsonbackend.use()
+        self.logger.info('json backend: {0}'.format(backend))
+
+    def _set_connection_pool(self):
+        """
+        Apply the global options to plugins.base.connection_pool.
+        """
+        pool = connection_pool
+        pool.max_per_endpoint = self.config['global'].get(
+            'connection_pool_size', pool.max_per_endpoint
+        )
+        pool.idle_timeout = self.config['global'].get(
+            'connection_idle_timeout', pool.idle_timeout
+        )
+        pool.keepalive = self.config['global'].get(
+            'tcp_keepalive', pool.keepalive
+        )
+
+    def _select_sections(self):
+        """
+        Keep only the sections which are run by "--once" or "--bench".
+        Output sections are removed because nothing is sent,
+        and the item queue is not bounded because it is drained
+        after each run.
+        """
+        selected = self.args.sections
+        if selected:
+            unknown = [
+                section for section in selected
+                if section == 'global' or section not in self.config
+            ]
+            if unknown:
+                raise BlackbirdError(
+                    'no such section: {0}'.format(', '.join(unknown))
+                )
+
+        for section in list(self.config.keys()):
+            if section == 'global':
+                continue
+            options = self.config[section]
+            is_output = options.get('output')
+            if is_output is None:
+                is_output = getattr(
+                    self.observers.jobs[options['module']], 'is_output', False
+                )
+            if is_output or (selected and section not in selected):
+                del self.config[section]
+
+        self.config['global']['max_queue_length'] = 0
+        self.config['global']['max_queue_bytes'] = 0
+
     def _show_version(self):
         print (
             'blackbird version {0} (python {1})'
@@ -118,23 +218,122 @@ class BlackBird(object):
             self.logger
         )
         self.jobs = creator.job_factory()
+        self.job_objects = creator.job_objects
+        self.queue = creator.queue
+        self.stats_queue = creator.stats_queue
+
+    def status(self):
+        """
+        Return the internal status for utils.status.StatusServer.
+        Plugins which have "status" method can add their own status.
+        """
+        jobs = dict()
+        for job_name, concrete_job in self.jobs.items():
+            job_status = {
+                'section': concrete_job['section'],
+                'interval': concrete_job['interval'],
+                'alive': False,
+            }
+            executor = self.executors.get(job_name)
+            if executor is not None:
+                job_status.update(executor.status())
+            if isinstance(concrete_job['method'], targets.TargetGroup):
+                job_status['targets'] = concrete_job['method'].status()
+            elif hasattr(concrete_job['method'], 'status'):
+                job_status['worker'] = concrete_job['method'].status()
+            jobs[job_name] = job_status
+
+        plugins = dict()
+        for section, job_obj in self.job_objects.items():
+            if hasattr(job_obj, 'status'):
+                plugins[section] = job_obj.status()
+            if getattr(job_obj, 'deadband', None) is not None:
+                plugins.setdefault(section, dict())['deadband'] = (
+                    job_obj.deadband.stats()
+                )
+            if getattr(job_obj, 'aggregator', None) is not None:
+                plugins.setdefault(section, dict())['aggregate'] = (
+                    job_obj.aggregator.stats()
+                )
+
+        return {
+            'version': __version__,
+            'pid': os.getpid(),
+            'time': time.time(),
+            'queue': (
+                self.queue.status()
+                if isinstance(self.queue, spillqueue.SpillQueue) else {
+                    'length': self.queue.qsize(),
+                    'max_length': self.queue.maxsize,
+                }
+            ),
+            'outputs': (
+                self.queue.status()
+                if isinstance(self.queue, router.Router) else dict()
+            ),
+            'stats_queue': {
+                'length': self.stats_queue.qsize(),
+                'max_length': self.stats_queue.maxsize,
+            },
+            'jobs': jobs,
+            'plugins': plugins,
+            'connection_pool': connection_pool.stats(),
+        }
 
     def start(self):
         """
         main loop.
+        With "--once" or "--bench", run the jobs without daemonizing
+        and return the exit status instead.
         """
 
+        if self.args.once or self.args.bench:
+            return self.run_once()
+
+        trace_allocations = self.config['global']['trace_allocations']
+        if trace_allocations:
+            trace_allocations = accounting.start_tracing(self.logger)
+
         def main_loop():
+            status_socket = self.config['global']['status_socket']
+            if status_socket is not None:
+                status.StatusServer(
+                    path=status_socket,
+                    snapshot=self.status,
+                    logger=self.logger
+                ).start()
+
+            # coroutine jobs run on the shared event loop instead of threads.
+            event_loop = None
+            if any([job.get('coroutine') for job in self.jobs.values()]):
+                event_loop = eventloop.EventLoopThread(logger=self.logger)
+                event_loop.start()
+
             while True:
+                if event_loop is not None:
+                    self._start_coroutine_jobs(event_loop)
+                    if all([job.get('coroutine')
+                            for job in self.jobs.values()]):
+                        time.sleep(1)
+                        continue
+
                 threadnames = [thread.name for thread in threading.enumerate()]
                 for job_name, concrete_job in self.jobs.items():
+                    if concrete_job.get('coroutine'):
+                        continue
                     if job_name not in threadnames:
                         new_thread = Executor(
                             name=job_name,
                             job=concrete_job['method'],
                             logger=self.logger,
-                            interval=concrete_job['interval']
+                            interval=concrete_job['interval'],
+                            stats_queue=self.stats_queue,
+                            section=concrete_job['section'],
+                            trace_allocations=trace_allocations,
+                            timeout=concrete_job['timeout'],
+                            supervisor=concrete_job['supervisor']
                         )
+                        self.executors[job_name] = new_thread
                         new_thread.start()
                         new_thread.join(1)
                     else:
@@ -147,6 +346,10 @@ class BlackBird(object):
             self.logger.info(
                 'blackbird {0} : starting main process'.format(__version__)
             )
+            # the records buffered by the log writer thread
+            # must be written before forking.
+            for handler in self.logger.handlers:
+                handler.flush()
 
             with DaemonContext(
                 files_preserve=[logger.get_handler_fp(self.logger)],
@@ -166,6 +369,50 @@ class BlackBird(object):
             )
             main_loop()
 
+    def run_once(self):
+        """
+        Run the jobs "--bench" times(once with "--once")
+        and print the report(see utils/bench.py).
+        Return 1 if any run failed, otherwise 0.
+        """
+        job_bench = bench.JobBench(
+            jobs=self.jobs,
+            queue=self.queue,
+            stats_queue=self.stats_queue,
+            logger=self.logger,
+            runs=self.args.bench or 1,
+            show_items=self.args.once
+        )
+        failed = job_bench.run()
+        for handler in self.logger.handlers:
+            handler.flush()
+        return 1 if failed else 0
+
+    def _start_coroutine_jobs(self, event_loop):
+        """
+        Start AsyncExecutor of the coroutine jobs which are not running.
+        """
+        for job_name, concrete_job in self.jobs.items():
+            if not concrete_job.get('coroutine'):
+                continue
+            executor = self.executors.get(job_name)
+            if executor is not None and executor.is_alive():
+                continue
+
+            executor = AsyncExecutor(
+                name=job_name,
+                job=concrete_job['method'],
+                logger=self.logger,
+                interval=concrete_job['interval'],
+                event_loop=event_loop,
+                stats_queue=self.stats_queue,
+                section=concrete_job['section'],
+                timeout=concrete_job['timeout'],
+                supervisor=concrete_job['supervisor']
+            )
+            self.executors[job_name] = executor
+            executor.start()
+
 
 class JobCreator(object):
     """
@@ -176,13 +423,19 @@ class JobCreator(object):
     def __init__(self, config, plugins, logger):
         self.config = config
         self.plugins = plugins
-        self.queue = Queue.Queue(
-            config['global']['max_queue_length']
-        )
+        self.outputs = self._output_sections()
+        if self.outputs:
+            self.queue = router.Router(
+                config['global']['max_queue_length'],
+                queue_factory=self._item_queue
+            )
+        else:
+            self.queue = self._item_queue('queue')
         self.stats_queue = Queue.Queue(
             config['global']['max_queue_length']
         )
         self.logger = logger
+        self.job_objects = dict()
 
     def job_factory(self):
         """
@@ -191,6 +444,10 @@ class JobCreator(object):
             'PLUGINNAME-build_items': {
                 'method': FUNCTION_OBJECT,
                 'interval': INTERVAL_TIME ,
+                'section': SECTION_NAME,
+                'timeout': JOB_TIMEOUT or None,
+                'supervisor': JOB_SUPERVISOR_INSTANCE,
+                'coroutine': True if the method is a coroutine,
             }
             ...
         }
@@ -215,23 +472,33 @@ class JobCreator(object):
             plugin_name = options['module']
             job_kls = self.plugins[plugin_name]
 
-            if hasattr(job_kls, '__init__'):
-                job_argspec = inspect.getargspec(job_kls.__init__)
-
-                if 'stats_queue' in job_argspec.args:
-                    job_obj = job_kls(
-                        options=options,
-                        queue=self.queue,
-                        stats_queue=self.stats_queue,
-                        logger=self.logger
-                    )
+            queue = self.queue
+            if section in self.outputs:
+                queue = self.queue.add_output(
+                    section,
+                    keys=options.get('route_keys', ()),
+                    hosts=options.get('route_hosts', ())
+                )
 
-                else:
-                    job_obj = job_kls(
-                        options=options,
-                        queue=self.queue,
-                        logger=self.logger
+            # "targets" option: one ConcreteJob per target.
+            target_objects = None
+            entries = targets.load_targets(
+                options.get('targets', ()), options.get('targets_file')
+            )
+            if entries:
+                target_objects = list()
+                for entry in entries:
+                    target_obj = self._job_object(
+                        job_kls, targets.target_options(options, entry), queue
                     )
+                    target_objects.append((entry, target_obj))
+                    self.job_objects[
+                        '{0}[{1}]'.format(section, entry)
+                    ] = target_obj
+                job_obj = target_objects[0][1]
+            else:
+                job_obj = self._job_object(job_kls, options, queue)
+                self.job_objects[section] = job_obj
 
             # Deprecated!!
             if hasattr(job_obj, 'looped_method'):
@@ -247,10 +514,13 @@ class JobCreator(object):
                 elif 'interval' in self.config['global']:
                     interval = self.config['global']['interval']
 
-                jobs[name] = {
-                    'method': job_obj.looped_method,
-                    'interval': interval,
-                }
+                jobs[name] = self._concrete_job(
+                    name, section, job_obj,
+                    self._job_method(
+                        section, job_obj, 'looped_method', target_objects
+                    ),
+                    options, interval
+                )
 
             if hasattr(job_obj, 'build_items'):
                 name = '-'.join([section, 'build_items'])
@@ -260,10 +530,13 @@ class JobCreator(object):
                 elif 'interval' in self.config['global']:
                     interval = self.config['global']['interval']
 
-                jobs[name] = {
-                    'method': job_obj.build_items,
-                    'interval': interval,
-                }
+                jobs[name] = self._concrete_job(
+                    name, section, job_obj,
+                    self._job_method(
+                        section, job_obj, 'build_items', target_objects
+                    ),
+                    options, interval
+                )
 
                 self.logger.info(
                     'load plugin {0} (interval {1})'
@@ -278,10 +551,14 @@ class JobCreator(object):
                 elif 'lld_interval' in self.config['global']:
                     lld_interval = self.config['global']['lld_interval']
 
-                jobs[name] = {
-                    'method': job_obj.build_discovery_items,
-                    'interval': lld_interval,
-                }
+                jobs[name] = self._concrete_job(
+                    name, section, job_obj,
+                    self._job_method(
+                        section, job_obj, 'build_discovery_items',
+                        target_objects
+                    ),
+                    options, lld_interval
+                )
 
                 self.logger.info(
                     'load plugin {0} (lld_interval {1})'
@@ -290,8 +567,374 @@ class JobCreator(object):
 
         return jobs
 
+    def _job_object(self, job_kls, options, queue):
+        """
+        Create ConcreteJob instance.
+        "stats_queue" is given only to the plugins which accept it.
+        """
+        job_argspec = inspect.getargspec(job_kls.__init__)
+
+        if 'stats_queue' in job_argspec.args:
+            return job_kls(
+                options=options,
+                queue=queue,
+                stats_queue=self.stats_queue,
+                logger=self.logger
+            )
+
+        return job_kls(
+            options=options,
+            queue=queue,
+            logger=self.logger
+        )
+
+    def _job_method(self, section, job_obj, method_name, target_objects):
+        """
+        Return the method of the job,
+        or utils.targets.TargetGroup which runs the method of all targets.
+        """
+        if target_objects is None:
+            return getattr(job_obj, method_name)
+
+        coroutine = eventloop.iscoroutinefunction(
+            getattr(job_obj, method_name)
+        )
+        methods = list()
+        for entry, target_obj in target_objects:
+            method = getattr(target_obj, method_name)
+            if not coroutine:
+                method = JobClock(method)
+            methods.append((entry, method))
+
+        return targets.TargetGroup(
+            section=section,
+            methods=methods,
+            concurrency=self.config[section].get('target_concurrency', 16),
+            logger=self.logger,
+            stats_queue=self.stats_queue,
+            coroutine=coroutine
+        )
+
+    def _item_queue(self, name):
+        """
+        Create the item queue.
+        If "max_queue_bytes" is set in global section,
+        it is utils.spillqueue.SpillQueue which spills to
+        "spill_dir/NAME.spill".
+        """
+        max_length = self.config['global']['max_queue_length']
+        max_bytes = self.config['global'].get('max_queue_bytes', 0)
+        if not max_bytes:
+            return Queue.Queue(max_length)
+
+        spill_path = None
+        spill_dir = self.config['global'].get('spill_dir')
+        if spill_dir is not None:
+            spill_path = os.path.join(spill_dir, '{0}.spill'.format(name))
+        return spillqueue.SpillQueue(max_length, max_bytes, spill_path)
+
+    def _output_sections(self):
+        """
+        Return the sections of output plugins.
+        If there are several, each of them gets a copy of every item
+        through utils.router.Router.
+        """
+        outputs = list()
+        for section, options in self.config.items():
+            if section == 'global':
+                continue
+            is_output = options.get('output')
+            if is_output is None:
+                job_kls = self.plugins[options['module']]
+                is_output = getattr(job_kls, 'is_output', False)
+            if is_output:
+                outputs.append(section)
+        return outputs
+
+    def _concrete_job(self, name, section, job_obj, method, options,
+                      interval):
+        """
+        Create the concrete job of given method.
+        The method is wrapped in plugins.base.JobClock
+        so that the items of one run have the same timestamp.
+        If "profile" option of the section is True,
+        the method is wrapped in utils.profiler.JobProfiler.
+        If "executor" option of the section is "process",
+        the method is run in a worker process by utils.worker.ProcessJob.
+
+        "job_timeout" option is enforced by Executor in thread mode,
+        and by ProcessJob(kill and replace the worker) in process mode.
+
+        If the method is a coroutine, it runs on the shared event loop
+        by AsyncExecutor as it is(see utils/eventloop.py).
+        utils.targets.TargetGroup is not wrapped either,
+        the method of each target is wrapped in JobClock instead.
+        Neither of them is profiled or run in a worker process,
+        a warning is logged if "profile" or "executor = process" is set.
+        """
+        timeout = options.get('job_timeout')
+        supervisor = JobSupervisor(
+            interval=interval,
+            max_backoff=options.get('max_backoff', 600),
+            threshold=options.get('circuit_threshold', 5),
+            probe_interval=options.get('circuit_probe_interval', 600)
+        )
+
+        if isinstance(method, targets.TargetGroup):
+            coroutine = method.coroutine
+        else:
+            coroutine = eventloop.iscoroutinefunction(method)
+
+        if isinstance(method, targets.TargetGroup) or coroutine:
+            if options.get('executor', 'thread') == 'process':
+                self.logger.warn(
+                    '{0} is a coroutine or has "targets", '
+                    '"executor = process" is ignored.'.format(name)
+                )
+            # cProfile profiles only the calling thread,
+            # but the targets and coroutines run in other threads.
+            if options.get('profile', False):
+                self.logger.warn(
+                    '{0} is a coroutine or has "targets", '
+                    '"profile" is ignored.'.format(name)
+                )
+            if coroutine:
+                self.logger.info(
+                    '{0} is executed in the event loop'.format(name)
+                )
+            return {
+                'method': method,
+                'interval': interval,
+                'section': section,
+                'timeout': timeout,
+                'supervisor': supervisor,
+                'coroutine': coroutine,
+            }
+
+        method = JobClock(method)
+
+        if options.get('profile', False):
+            method = self._profiled_method(name, method, options)
+
+        if options.get('executor', 'thread') == 'process':
+            self.logger.info(
+                '{0} is executed in a worker process'.format(name)
+            )
+            method = worker.ProcessJob(
+                name=name,
+                section=section,
+                job_obj=job_obj,
+                method=method,
+                queue=self.queue,
+                stats_queue=self.stats_queue,
+                logger=self.logger,
+                timeout=timeout
+            )
+            timeout = None
+
+        return {
+            'method': method,
+            'interval': interval,
+            'section': section,
+            'timeout': timeout,
+            'supervisor': supervisor,
+            'coroutine': False,
+        }
+
+    def _profiled_method(self, name, method, options):
+        """
+        Wrap the method in utils.profiler.JobProfiler.
+        """
+        profile_dir = self.config['global'].get('profile_dir')
+        if profile_dir is None:
+            self.logger.error(
+                '{0}: "profile" requires "profile_dir" in global section. '
+                'This job is not profiled.'.format(name)
+            )
+            return method
+
+        self.logger.info(
+            '{0} is profiled (dump to {1} every {2} runs)'
+            ''.format(name, profile_dir, options['profile_runs'])
+        )
+        return profiler.JobProfiler(
+            name=name,
+            method=method,
+            profile_dir=profile_dir,
+            logger=self.logger,
+            runs=options['profile_runs'],
+            keep=self.config['global']['profile_keep']
+        )
+
+
+class JobExecution(object):
+    """
+    Accounting and supervision of the runs of one job.
+    Executor(thread) and AsyncExecutor(event loop) run the job
+    and report each run by "_finish" and its result by
+    "_succeeded", "_failed" or "_timed_out".
+    """
+
+    def __init__(self, name, job, logger, interval,
+                 stats_queue=None, section=None, trace_allocations=False,
+                 timeout=None, supervisor=None):
+        self.name = name
+        self.job = job
+        self.logger = logger
+        if type(interval) is not float:
+            self.interval = float(interval)
+        else:
+            self.interval = interval
+        self.stats_queue = stats_queue
+        self.section = section or name
+        self.trace_allocations = trace_allocations
+        self.timeout = timeout
+        if supervisor is None:
+            supervisor = JobSupervisor(self.interval)
+        self.supervisor = supervisor
+        self._reported_state = None
+
+        self.runs = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.last_run = None
+        self.last_duration = None
+        self.next_run = None
+
+    def is_running(self):
+        raise NotImplementedError
+
+    def _timed_out(self, error):
+        self.timeouts += 1
+        self.logger.warn(error)
+        self._put_stats('timeouts', 1)
 
-class Executor(threading.Thread):
+    def _failed(self, error):
+        """
+        Record the failure of the job and log it.
+        While the circuit is open, failures of probes are logged as info.
+        """
+        probing = self.supervisor.state == JobSupervisor.OPEN
+        opened = self.supervisor.failure()
+        self._put_stats('failures', 1)
+
+        # Tracebacks are worth logging only for unexpected errors.
+        exc_info = not isinstance(error, BlackbirdError)
+
+        if probing:
+            self.logger.info(
+                '{0} is still failing, the circuit stays open: {1}'
+                ''.format(self.name, error)
+            )
+        elif opened:
+            self.logger.error(
+                '{0} failed {1} times in a row, open the circuit '
+                '(probe every {2} sec): {3}'
+                ''.format(
+                    self.name, self.supervisor.failures,
+                    self.supervisor.probe_interval, error
+                ),
+                exc_info=exc_info
+            )
+        else:
+            self.logger.error(
+                '{0} failed ({1} in a row), retry after {2} sec: {3}'
+                ''.format(
+                    self.name, self.supervisor.failures,
+                    self.supervisor.delay(), error
+                ),
+                exc_info=exc_info
+            )
+
+    def _succeeded(self):
+        failures = self.supervisor.failures
+        if self.supervisor.success():
+            self.logger.info(
+                '{0} recovered, close the circuit'.format(self.name)
+            )
+        elif failures:
+            self.logger.info(
+                '{0} recovered after {1} failures'.format(self.name, failures)
+            )
+
+    def _report_circuit(self):
+        """
+        Put the state of the circuit when it has changed.
+        """
+        state = self.supervisor.state
+        if state != self._reported_state:
+            self._put_stats(
+                'circuit_open', int(state == JobSupervisor.OPEN), gauge=True
+            )
+            self._reported_state = state
+
+    def _finish(self, usage):
+        """
+        Called after each job run(in the runner thread if it is used).
+        """
+        if isinstance(self.job, targets.TargetGroup):
+            # the targets run in the threads of the pool, not in this one.
+            usage.cpu_seconds = self.job.cpu_seconds
+        self.runs += 1
+        self.last_duration = usage.wall_seconds
+        self._account(usage)
+
+    def status(self):
+        """
+        Return the status of this executor for BlackBird.status().
+        """
+        return {
+            'alive': self.is_alive(),
+            'running': self.is_running(),
+            'runs': self.runs,
+            'timeouts': self.timeouts,
+            'skipped': self.skipped,
+            'failures': self.supervisor.failures,
+            'circuit': self.supervisor.state,
+            'last_run': self.last_run,
+            'last_duration': self.last_duration,
+            'next_run': self.next_run,
+        }
+
+    def _account(self, usage):
+        """
+        Put the resource usage of one job run to "stats_queue".
+        """
+        self.logger.debug(
+            '%s finished (wall_seconds %s, cpu_seconds %s, '
+            'allocated_bytes %s)',
+            self.name, usage.wall_seconds,
+            usage.cpu_seconds, usage.allocated_bytes
+        )
+
+        stats = {
+            'cpu_seconds': usage.cpu_seconds,
+            'allocated_bytes': usage.allocated_bytes,
+        }
+        for name, value in stats.items():
+            if value is not None:
+                self._put_stats(name, value)
+
+    def _put_stats(self, name, value, gauge=False):
+        """
+        Put "blackbird.job.NAME[SECTION]" to "stats_queue".
+        """
+        if self.stats_queue is None:
+            return
+
+        item = StatisticsItem(
+            key='blackbird.job.{0}[{1}]'.format(name, self.section),
+            value=value,
+            gauge=gauge
+        )
+        try:
+            self.stats_queue.put(item, block=False)
+        except Queue.Full:
+            # statistics plugin may not be configured.
+            pass
+
+
+class Executor(JobExecution, threading.Thread):
     """
     job executor class.
     "interval" argument is interval of getting data.
@@ -300,26 +943,277 @@ class Executor(threading.Thread):
         interval = 30
 
     Executor get the data every 30 seconds.
+
+    Executor measures wall clock time, CPU time of own thread and
+    (if "trace_allocations" is True) allocated bytes of each job run.
+    CPU time and allocated bytes are put to "stats_queue" as
+    "blackbird.job.cpu_seconds[SECTION]" and
+    "blackbird.job.allocated_bytes[SECTION]",
+    and the statistics plugin sums them up.
+
+    If "timeout" is given(job_timeout option), the job runs in a JobRunner
+    thread and Executor waits for it at most "timeout" seconds.
+    The run which exceeds it is marked as overdue and counted as
+    "blackbird.job.timeouts[SECTION]". Executor never starts
+    a second run while the overdue run is still running,
+    such skipped runs are counted as "blackbird.job.skipped[SECTION]".
+
+    Failures of the job(any exception and timeout) don't stop Executor.
+    They are counted as "blackbird.job.failures[SECTION]" and
+    utils.supervisor.JobSupervisor decides the delay of the next run
+    (exponential backoff and circuit breaking).
+    The state of the circuit is put as
+    "blackbird.job.circuit_open[SECTION]"(0 or 1) gauge.
+
+    "stop" ends the loop, "run_once" runs the job once in the caller.
     """
-    def __init__(self, name, job, logger, interval):
+    def __init__(self, name, job, logger, interval,
+                 stats_queue=None, section=None, trace_allocations=False,
+                 timeout=None, supervisor=None):
         threading.Thread.__init__(self, name=name)
         self.setDaemon(True)
-        self.job = job
-        self.logger = logger
-        if type(interval) is not float:
-            self.interval = float(interval)
-        else:
-            self.interval = interval
+        JobExecution.__init__(
+            self, name, job, logger, interval,
+            stats_queue=stats_queue, section=section,
+            trace_allocations=trace_allocations,
+            timeout=timeout, supervisor=supervisor
+        )
+        self.stopped = threading.Event()
+        self.runner = None
 
     def run(self):
+        try:
+            while not self.stopped.is_set():
+                delay = self.supervisor.delay()
+                self.next_run = time.time() + delay
+                if self.stopped.wait(delay):
+                    break
+                self.run_once()
+        finally:
+            if isinstance(self.job, targets.TargetGroup):
+                self.job.close()
+
+    def is_running(self):
+        return self.runner is not None and self.runner.is_alive()
+
+    def stop(self):
+        """
+        Stop the loop after the current run.
+        An overdue JobRunner is abandoned(it is a daemon thread).
+        The thread pool of the target group is closed at the end.
+        """
+        self.stopped.set()
+
+    def run_once(self):
+        """
+        Run the job once and record the result.
+        """
+        if self.runner is not None and self.runner.is_alive():
+            self.skipped += 1
+            self.logger.warn(
+                '{0} is still running for {1} sec. Skip this run.'
+                ''.format(self.name, round(self.runner.elapsed(), 3))
+            )
+            self._put_stats('skipped', 1)
+            return
+
+        self.last_run = time.time()
+        try:
+            if self.timeout is None:
+                self._execute()
+            else:
+                self._execute_with_deadline()
+        except JobTimeoutError as error:
+            self._timed_out(error)
+            self._failed(error)
+        except Exception as error:
+            self._failed(error)
+        else:
+            self._succeeded()
+
+        self._report_circuit()
+
+    def _execute(self):
+        """
+        Run the job in this thread.
+        """
+        usage = accounting.JobAccounting(self.trace_allocations)
+        try:
+            with usage:
+                self.job()
+        finally:
+            self._finish(usage)
+
+    def _execute_with_deadline(self):
+        """
+        Run the job in JobRunner thread and wait for it until the deadline.
+        The overdue runner is abandoned, it finishes(or hangs) by itself.
+        """
+        self.runner = JobRunner(
+            name='{0}-runner'.format(self.name),
+            job=self.job,
+            logger=self.logger,
+            trace_allocations=self.trace_allocations,
+            callback=self._finish
+        )
+        self.runner.start()
+        self.runner.join(self.timeout)
+
+        if self.runner.is_alive():
+            self.runner.abandoned = True
+            raise JobTimeoutError(
+                '{0} exceeded job_timeout ({1} sec). '
+                'It is marked as overdue.'.format(self.name, self.timeout)
+            )
+
+        if self.runner.exc_info is not None:
+            exc_type, exc_value, exc_tb = self.runner.exc_info
+            raise exc_type, exc_value, exc_tb
+
+
+class AsyncExecutor(JobExecution):
+    """
+    Executor of the coroutine job(see utils/eventloop.py).
+    This is not a thread,
+    it runs the job as a task in the shared event loop.
+    The run which exceeds "timeout" is cancelled,
+    so no run is skipped like Executor.
+    CPU time is not measured because all the coroutines share one thread.
+    """
+
+    def __init__(self, name, job, logger, interval, event_loop,
+                 stats_queue=None, section=None, timeout=None,
+                 supervisor=None):
+        JobExecution.__init__(
+            self, name, job, logger, interval,
+            stats_queue=stats_queue, section=section,
+            timeout=timeout, supervisor=supervisor
+        )
+        self.event_loop = event_loop
+        self.task = None
+        self.running = False
+        self._started = False
+
+    def start(self):
+        self._started = True
+        self.event_loop.spawn(self._run(), callback=self._set_task)
+
+    def _set_task(self, task):
+        self.task = task
+
+    def is_alive(self):
+        if self.task is None:
+            return self._started
+        return not self.task.done()
+
+    def _run(self):
         while True:
-            time.sleep(self.interval)
+            delay = self.supervisor.delay()
+            self.next_run = time.time() + delay
+            yield From(eventloop.asyncio.sleep(delay))
 
+            self.last_run = time.time()
             try:
+                yield From(self._execute_coroutine())
+            except JobTimeoutError as error:
+                self._timed_out(error)
+                self._failed(error)
+            except Exception as error:
+                self._failed(error)
+            else:
+                self._succeeded()
+
+            self._report_circuit()
+
+    def _execute_coroutine(self):
+        usage = accounting.JobAccounting(self.trace_allocations)
+        self.running = True
+        try:
+            with usage:
+                try:
+                    yield From(eventloop.asyncio.wait_for(
+                        self.job(), self.timeout
+                    ))
+                except eventloop.asyncio.TimeoutError:
+                    raise JobTimeoutError(
+                        '{0} exceeded job_timeout ({1} sec). '
+                        'It is cancelled.'.format(self.name, self.timeout)
+                    )
+        finally:
+            self.running = False
+            # other coroutines have used the thread in the meantime.
+            usage.cpu_seconds = None
+            self._finish(usage)
+            self._flush_aggregates()
+
+    def _flush_aggregates(self):
+        """
+        Coroutines aren't wrapped in JobClock,
+        so the ended aggregate windows are flushed here.
+        """
+        if isinstance(self.job, targets.TargetGroup):
+            methods = [method for _, method in self.job.methods]
+        else:
+            methods = [self.job]
+        for method in methods:
+            job_obj = getattr(method, 'im_self', None)
+            if isinstance(job_obj, JobBase):
+                job_obj.flush_aggregates()
+
+    def is_running(self):
+        return self.running
+
+    def status(self):
+        status = JobExecution.status(self)
+        status['coroutine'] = True
+        return status
+
+
+class JobRunner(threading.Thread):
+    """
+    Thread which runs the job once for Executor with "timeout".
+    CPU time is measured in this thread because it is per thread.
+    The exception raised by the job is kept in "exc_info",
+    and Executor raises it again.
+    If Executor has abandoned this runner("abandoned" is True),
+    the result is only logged.
+    """
+
+    def __init__(self, name, job, logger, trace_allocations, callback):
+        threading.Thread.__init__(self, name=name)
+        self.setDaemon(True)
+        self.job = job
+        self.logger = logger
+        self.trace_allocations = trace_allocations
+        self.callback = callback
+
+        self.exc_info = None
+        self.abandoned = False
+        self.started_at = None
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0
+        return time.time() - self.started_at
+
+    def run(self):
+        self.started_at = time.time()
+        usage = accounting.JobAccounting(self.trace_allocations)
+        try:
+            with usage:
                 self.job()
-            except BlackbirdPluginError as error:
-                self.logger.error(error)
-                raise BlackbirdError(error)
+        except Exception:
+            self.exc_info = sys.exc_info()
+        finally:
+            self.callback(usage)
+
+        if self.abandoned:
+            self.logger.warn(
+                '{0} finished {1} sec after it was started.'
+                ''.format(self.name, round(usage.wall_seconds, 3))
+            )
+            if self.exc_info is not None:
+                self.logger.error(self.exc_info[1])
 
 
 def main():
@@ -328,10 +1222,10 @@ def main():
     """
     try:
         sr71 = BlackBird()
-        sr71.start()
+        return sr71.start()
     except BlackbirdError as error:
         sys.stderr.write(error.__str__() + '\n')
         return(1)
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
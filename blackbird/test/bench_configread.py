@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Benchmark of config validation(utils/configread.py).
+It is not collected by nosetests, run it as following:
+    python -m blackbird.test.bench_configread [SECTIONS ...]
+
+Each section uses the built-in "netstat" plugin.
+The time of reading(including plugin import), global validation and
+validation of the sections is printed per number of sections.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import blackbird.plugins
+from blackbird.utils import configread
+
+DEFAULT_SECTIONS = (10, 100, 1000, 10000)
+
+
+def write_config(fileobj, sections):
+    fileobj.write(
+        '[global]\n'
+        'user = {user}\n'
+        'group = {group}\n'
+        'log_file = {log_file}\n'
+        'module_dir = {module_dir}\n'
+        ''.format(
+            user=os.getenv('USER', 'root'),
+            group='root',
+            log_file=os.path.join(tempfile.gettempdir(), 'blackbird.log'),
+            module_dir=os.path.dirname(blackbird.plugins.__file__)
+        )
+    )
+    for index in range(sections):
+        fileobj.write(
+            '[netstat{0}]\n'
+            'module = netstat\n'
+            'interval = {1}\n'
+            ''.format(index, index % 60 + 1)
+        )
+
+
+def bench(sections):
+    fd, path = tempfile.mkstemp(suffix='.cfg')
+    try:
+        with os.fdopen(fd, 'w') as fileobj:
+            write_config(fileobj, sections)
+
+        started = time.time()
+        reader = configread.ConfigReader(path, configread.JobObserver())
+        read = time.time()
+        reader.global_validate()
+        global_validated = time.time()
+        reader.validate()
+        validated = time.time()
+    finally:
+        os.remove(path)
+
+    return (
+        read - started,
+        global_validated - read,
+        validated - global_validated,
+    )
+
+
+def main(argv):
+    counts = [int(arg) for arg in argv] or DEFAULT_SECTIONS
+    print('{0:>8} {1:>10} {2:>10} {3:>10} {4:>14}'.format(
+        'sections', 'read', 'global', 'validate', 'per section'
+    ))
+    for sections in counts:
+        read, global_validate, validate = bench(sections)
+        print('{0:>8} {1:>10.3f} {2:>10.3f} {3:>10.3f} {4:>12.1f}us'.format(
+            sections, read, global_validate, validate,
+            validate / sections * 1000000
+        ))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
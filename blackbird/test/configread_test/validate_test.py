@@ -4,12 +4,15 @@ Tests for validation of each section other than [global].
 """
 
 import os
+import StringIO
+import sys
 import tempfile
 
-from nose.tools import assert_false, ok_
+from nose.tools import assert_false, assert_raises, eq_, ok_
+from validate import ValidateError
 
 from blackbird.test.configread_test.base import TmpPluginBase
-from blackbird.utils.configread import ConfigReader
+from blackbird.utils.configread import CachingValidator, ConfigReader
 
 
 class TestGetModule(TmpPluginBase):
@@ -96,26 +99,107 @@ class TestCreateSpecs(TmpPluginBase):
     def normal_test(self):
         plugin = self.create_plugins()
         mod_name = plugin[0]
-        section_name = 'temporary'
 
         cfg_lines = (
             '[global]',
             'module_dir = {0}'.format(self.tmp_dir),
-            '[{0}]'.format(section_name),
+            '[temporary]',
+            'module = {0}'.format(mod_name),
+            '[temporary2]',
             'module = {0}'.format(mod_name),
         )
 
         cfg_reader = ConfigReader(infile=cfg_lines)
+        specs = cfg_reader._create_specs()
 
-        spec_lines = cfg_reader._get_raw_specs(cfg_reader.config)
-        spec_lines = spec_lines[mod_name]
-        spec = cfg_reader._configspec_factory(
-            '{0}'.format(section_name),
-            mod_name,
-            spec_lines,
+        # one configspec per module, common options are merged.
+        ok_(
+            specs.keys() == [mod_name],
+            msg='Failed creation spec(for validation): {0}'.format(specs)
         )
+        ok_('profile' in specs[mod_name])
 
-        ok_(
-            section_name in spec,
-            msg='Failed creation spec(for validation)'
+
+class TestValidate(TmpPluginBase):
+    """
+    ConfigReader.validate() tests.
+    """
+    def create_plugin(self):
+        plugin = tempfile.NamedTemporaryFile(
+            dir=self.tmp_dir,
+            suffix='.py'
         )
+        plugin_name = os.path.split(plugin.name)[1].split('.')[0]
+        plugin.writelines((
+            'class ConcreteJob(object):\n',
+            '    pass\n',
+            'class Validator(object):\n',
+            '    def __init__(self):\n',
+            '        self.spec = (\n',
+            '            "[{0}]",\n'.format(plugin_name),
+            '            "port = integer(default=1)",\n',
+            '            "hosts = force_list(default=list(\'hoge\'))",\n',
+            '        )\n',
+        ))
+        plugin.seek(0)
+        return plugin_name, plugin
+
+    def list_default_is_not_shared_test(self):
+        plugin_name, plugin = self.create_plugin()
+        cfg_reader = ConfigReader(infile=(
+            '[global]',
+            'module_dir = {0}'.format(self.tmp_dir),
+            '[first]',
+            'module = {0}'.format(plugin_name),
+            '[second]',
+            'module = {0}'.format(plugin_name),
+        ))
+        cfg_reader.validate()
+
+        config = cfg_reader.config
+        config['first']['hosts'].append('fuga')
+        eq_(config['second']['hosts'], ['hoge'])
+        eq_(config['first']['port'], 1)
+
+    def only_invalid_section_is_reported_test(self):
+        plugin_name, plugin = self.create_plugin()
+        cfg_reader = ConfigReader(infile=(
+            '[global]',
+            'module_dir = {0}'.format(self.tmp_dir),
+            '[valid]',
+            'module = {0}'.format(plugin_name),
+            'port = 2',
+            '[invalid]',
+            'module = {0}'.format(plugin_name),
+            'port = hoge',
+        ))
+
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            assert_raises(ValidateError, cfg_reader.validate)
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+        ok_('"port" option in [invalid]' in output, msg=output)
+        ok_('[valid]' not in output, msg=output)
+
+
+class TestCachingValidator(object):
+    """
+    CachingValidator tests.
+    """
+    def list_is_copied_test(self):
+        validator = CachingValidator()
+        check = 'force_list(default=list("hoge"))'
+
+        first = validator.check(check, None, missing=True)
+        second = validator.check(check, None, missing=True)
+        eq_(first, ['hoge'])
+        ok_(first is not second)
+
+    def converted_value_is_cached_test(self):
+        validator = CachingValidator()
+        eq_(validator.check('integer', '10'), 10)
+        eq_(validator._results[('integer', '10', False)], 10)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/accounting.py
+"""
+
+from nose.tools import eq_, ok_
+
+from blackbird.utils import accounting
+
+
+class TestJobAccounting(object):
+
+    def test_cpu_seconds(self):
+        with accounting.JobAccounting() as usage:
+            sum(range(100000))
+
+        if accounting.thread_cpu_time is None:
+            eq_(usage.cpu_seconds, None)
+        else:
+            ok_(usage.cpu_seconds > 0, msg=usage.cpu_seconds)
+        ok_(usage.wall_seconds >= 0, msg=usage.wall_seconds)
+
+    def test_allocations_without_tracing(self):
+        with accounting.JobAccounting(trace_allocations=False) as usage:
+            [object() for _ in range(100)]
+
+        eq_(usage.allocated_bytes, None)
+
+    def test_cpu_time_is_per_thread(self):
+        if accounting.thread_cpu_time is None:
+            return
+
+        with accounting.JobAccounting() as usage:
+            accounting.time.sleep(0.05)
+
+        ok_(usage.cpu_seconds < usage.wall_seconds, msg=usage.cpu_seconds)
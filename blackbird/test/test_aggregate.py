@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/aggregate.py
+"""
+
+import time
+from nose.tools import eq_, ok_, raises
+
+from blackbird.utils import aggregate
+from blackbird.utils.error import BlackbirdError
+
+
+class TestRing(object):
+
+    def test_wrap(self):
+        ring = aggregate.Ring(3)
+        for value in range(5):
+            ring.append(value)
+        eq_(sorted(ring.values()), [2.0, 3.0, 4.0])
+        eq_(ring.last, 4)
+
+        ring.clear()
+        eq_(list(ring.values()), [])
+
+
+class TestAggregator(object):
+
+    def test_summaries(self):
+        aggregator = aggregate.Aggregator(
+            ['hoge.latency[*]'], window=60,
+            functions=['min', 'max', 'avg', 'last', 'p50', 'p90']
+        )
+
+        for value in (30, 20, 40, 50, 60, 70, 80, 90, 100):
+            eq_(aggregator.add('host', 'hoge.latency[get]', value, 2), [])
+
+        # close the window.
+        aggregator.windows[('host', 'hoge.latency[get]')][1] = 0
+        summaries = aggregator.add('host', 'hoge.latency[get]', 1, 3)
+        eq_(summaries, [
+            ('hoge.latency.min[get]', 20.0, 2),
+            ('hoge.latency.max[get]', 100.0, 2),
+            ('hoge.latency.avg[get]', 60.0, 2),
+            ('hoge.latency.last[get]', 100.0, 2),
+            ('hoge.latency.p50[get]', 60.0, 2),
+            ('hoge.latency.p90[get]', 100.0, 2),
+        ])
+        eq_(aggregator.stats()['summaries'], 1)
+
+    def test_window(self):
+        aggregator = aggregate.Aggregator(['hoge'], window=60)
+        eq_(aggregator.add('host', 'hoge', 1, 1), [])
+        eq_(aggregator.add('host', 'hoge', 2, 2), [])
+        eq_(aggregator.stats()['samples'], 2)
+
+    def test_flush(self):
+        aggregator = aggregate.Aggregator(
+            ['hoge'], window=60, functions=['max']
+        )
+        aggregator.add('host', 'hoge', 1, 1)
+        aggregator.add('host', 'hoge', 3, 2)
+        eq_(aggregator.flush(), [])
+
+        # the key stopped reporting after the window.
+        eq_(aggregator.flush(time.time() + 60), [('host', 'hoge.max', 3.0, 2)])
+        eq_(aggregator.flush(time.time() + 120), [])
+
+    def test_not_aggregated(self):
+        aggregator = aggregate.Aggregator(['hoge'])
+        ok_(aggregator.add('host', 'fuga', 1, 1) is None)
+        ok_(aggregator.add('host', 'hoge', 'string', 1) is None)
+
+    @raises(BlackbirdError)
+    def test_unknown_function(self):
+        aggregate.Aggregator(['hoge'], functions=['median'])
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test plugins/archive.py
+"""
+
+import gzip
+import json
+import logging
+import os
+import Queue
+import shutil
+import tempfile
+import time
+from nose.tools import assert_raises, eq_, ok_
+
+from blackbird.plugins import archive
+from blackbird.plugins import base
+
+
+class TestArchive(object):
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.queue = Queue.Queue()
+        self.stats_queue = Queue.Queue()
+        self.options = {
+            'path': os.path.join(self.tmp_dir, 'archive'),
+            'prefix': 'blackbird',
+            'segment_seconds': 3600,
+            'segment_bytes': 1024 * 1024,
+            'buffer_size': 65536,
+            'fsync': 'run',
+            'compress': True,
+            'retention': 3600,
+        }
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def job(self):
+        return archive.ConcreteJob(
+            options=self.options,
+            queue=self.queue,
+            stats_queue=self.stats_queue,
+            logger=logging.getLogger('test_archive')
+        )
+
+    def put(self, count):
+        for index in range(count):
+            self.queue.put(base.StatisticsItem(
+                key='hoge{0}'.format(index), value=index, host='fuga'
+            ))
+
+    def files(self):
+        return sorted([
+            filename for filename in os.listdir(self.options['path'])
+            if not filename.endswith('.lock')
+        ])
+
+    def leftover(self, name):
+        path = os.path.join(self.options['path'], name)
+        with open(path, 'w') as segment:
+            segment.write('{}\n')
+        return path
+
+    def read(self, filename):
+        path = os.path.join(self.options['path'], filename)
+        opener = gzip.open if filename.endswith('.gz') else open
+        with opener(path, 'rb') as segment:
+            return [json.loads(line) for line in segment]
+
+    def test_write(self):
+        job = self.job()
+        self.put(3)
+        job.build_items()
+
+        files = self.files()
+        eq_(len(files), 1)
+        ok_(files[0].endswith('.0.ndjson'), msg=files)
+        records = self.read(files[0])
+        eq_([record['key'] for record in records], ['hoge0', 'hoge1', 'hoge2'])
+        eq_(records[2]['value'], 2)
+        eq_(job.status()['written'], 3)
+
+    def test_size_rotation(self):
+        self.options['segment_bytes'] = 150
+        job = self.job()
+        self.put(5)
+        job.build_items()
+
+        files = self.files()
+        ok_(len(files) > 2, msg=files)
+        ok_(all([filename.endswith('.gz') for filename in files[:-1]]))
+        records = sum([self.read(filename) for filename in files], [])
+        eq_(len(records), 5)
+
+    def test_age_rotation_and_retention(self):
+        job = self.job()
+        self.put(1)
+        job.build_items()
+        job.segment_start -= 3600
+
+        job.build_items()
+        files = self.files()
+        eq_(len(files), 1)
+        ok_(files[0].endswith('.ndjson.gz'), msg=files)
+
+        path = os.path.join(self.options['path'], files[0])
+        os.utime(path, (time.time() - 3601, time.time() - 3601))
+        job.cleanup()
+        eq_(self.files(), [])
+
+    def test_leftover_segment(self):
+        job = self.job()
+        self.put(1)
+        job.build_items()
+
+        # restart
+        del job
+        job = self.job()
+        self.put(1)
+        job.build_items()
+
+        files = self.files()
+        eq_(len(files), 2)
+        ok_(files[0].endswith('.0.ndjson.gz'), msg=files)
+        ok_(files[1].endswith('.1.ndjson'), msg=files)
+
+    def test_cleanup_at_start_and_rotation(self):
+        job = self.job()
+        self.leftover('blackbird.20000101000000.0.ndjson')
+        self.put(1)
+        job.build_items()
+        ok_('blackbird.20000101000000.0.ndjson.gz' in self.files())
+
+        # the directory isn't scanned at every run.
+        self.leftover('blackbird.20000101000000.1.ndjson')
+        job.build_items()
+        ok_('blackbird.20000101000000.1.ndjson' in self.files())
+
+        job.segment_start -= 3600
+        job.build_items()
+        ok_('blackbird.20000101000000.1.ndjson.gz' in self.files())
+
+    def test_same_path_and_prefix(self):
+        first = self.job()
+        self.put(1)
+        first.build_items()
+
+        second = self.job()
+        self.put(1)
+        assert_raises(base.BlackbirdPluginError, second.build_items)
+
+        # the segment of the first writer is not touched.
+        first.build_items()
+        eq_(len(self.files()), 1)
+        ok_(self.files()[0].endswith('.ndjson'), msg=self.files())
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/bench.py
+"""
+
+import logging
+import Queue
+import StringIO
+from nose.tools import eq_, ok_
+
+from blackbird.plugins import base
+from blackbird.utils import bench
+from blackbird.utils import targets
+
+
+def test_percentile():
+    samples = range(1, 101)
+    eq_(bench.percentile(samples, 99), 99)
+    eq_(bench.percentile(samples, 100), 100)
+    eq_(bench.percentile([3], 99), 3)
+    eq_(bench.percentile([], 99), None)
+
+
+class TestJobBench(object):
+
+    def setup(self):
+        self.queue = Queue.Queue()
+        self.stats_queue = Queue.Queue()
+        self.output = StringIO.StringIO()
+        self.calls = 0
+
+    def job(self):
+        self.calls += 1
+        for index in range(3):
+            self.queue.put(base.StatisticsItem(
+                key='hoge[{0}]'.format(index), value=self.calls
+            ))
+
+    def failing_job(self):
+        self.stats_queue.put(base.StatisticsItem(key='fuga', value=1))
+        raise base.BlackbirdPluginError('hoge')
+
+    def job_bench(self, jobs, runs=1, show_items=False):
+        return bench.JobBench(
+            jobs=jobs,
+            queue=self.queue,
+            stats_queue=self.stats_queue,
+            logger=logging,
+            runs=runs,
+            show_items=show_items,
+            output=self.output
+        )
+
+    def test_once_prints_items(self):
+        job_bench = self.job_bench(
+            {'hoge-build_items': {'method': self.job}}, show_items=True
+        )
+        eq_(job_bench.run(), 0)
+
+        lines = self.output.getvalue().splitlines()
+        fields = lines[0].split('\t')
+        eq_(fields[1], 'hoge[0]')
+        eq_(fields[3], '1')
+        ok_(lines[3].startswith('job'))
+        eq_(lines[4].split()[:3], ['hoge-build_items', '1', '0'])
+        eq_(self.calls, 1)
+        ok_(self.queue.empty())
+
+    def test_bench_counts_runs_and_items(self):
+        job_bench = self.job_bench({
+            'hoge-build_items': {'method': self.job},
+            'fuga-build_items': {'method': self.failing_job},
+        }, runs=5)
+        eq_(job_bench.run(), 5)
+
+        eq_(self.calls, 5)
+        result = job_bench.results['hoge-build_items']
+        eq_(len(result['wall_seconds']), 5)
+        eq_(result['items'], 15)
+        eq_(job_bench.results['fuga-build_items']['errors'], 5)
+        ok_(self.stats_queue.empty())
+
+        lines = self.output.getvalue().splitlines()
+        eq_(len(lines), 3)
+        eq_(lines[2].split()[6], '3.0')
+
+    def test_target_pool_is_closed(self):
+        group = targets.TargetGroup(
+            section='hoge', methods=[('a', self.job)], logger=logging
+        )
+        job_bench = self.job_bench({'hoge-build_items': {'method': group}})
+        eq_(job_bench.run(), 0)
+        eq_(self.calls, 1)
+        eq_(group._pool, None)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/deadband.py
+"""
+
+from nose.tools import eq_, ok_, raises
+
+from blackbird.utils import deadband
+from blackbird.utils.error import BlackbirdError
+
+
+class TestDeadband(object):
+
+    def sent(self, band, key, values, host='hogehoge'):
+        sent = list()
+        for value in values:
+            if band.check(host, key, value):
+                band.sent(host, key, value)
+                sent.append(value)
+        return sent
+
+    def test_unchanged(self):
+        band = deadband.Deadband(['blackbird.version'], heartbeat=3)
+        eq_(
+            self.sent(band, 'blackbird.version', ['0.4', '0.4', '0.4', '0.4',
+                                                   '0.5', '0.5']),
+            ['0.4', '0.4', '0.5']
+        )
+        eq_(band.stats(), {'keys': 1, 'passed': 3, 'suppressed': 3})
+
+    def test_absolute(self):
+        band = deadband.Deadband(['*.load[*]=0.5'])
+        eq_(
+            self.sent(band, 'linux.load[1min]', [1.0, 1.2, 1.5, 1.6, 0.9]),
+            [1.0, 1.6, 0.9]
+        )
+
+    def test_relative(self):
+        band = deadband.Deadband(['mem.*=10%'])
+        eq_(
+            self.sent(band, 'mem.used', [100, 109, 90, 89, 98, 99]),
+            [100, 89, 98]
+        )
+
+    def test_not_matched(self):
+        band = deadband.Deadband(['mem.*=10%'])
+        eq_(self.sent(band, 'cpu.user', [1, 1, 1]), [1, 1, 1])
+        ok_(band.rule('cpu.user') is None)
+
+    def test_hosts_are_separated(self):
+        band = deadband.Deadband(['hoge'])
+        eq_(self.sent(band, 'hoge', [1], host='host1'), [1])
+        eq_(self.sent(band, 'hoge', [1], host='host2'), [1])
+        eq_(self.sent(band, 'hoge', [1], host='host1'), [])
+
+    def test_unsent_value_is_not_recorded(self):
+        band = deadband.Deadband(['hoge'])
+        ok_(band.check('hogehoge', 'hoge', 1))
+        # "sent" isn't called, e.g: the queue was full.
+        ok_(band.check('hogehoge', 'hoge', 1))
+
+    @raises(BlackbirdError)
+    def test_invalid_rule(self):
+        deadband.Deadband(['hoge=fuga%'])
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/eventloop.py and sr71.AsyncExecutor
+"""
+
+import logging
+import Queue
+import threading
+import time
+from nose.plugins.skip import SkipTest
+from nose.tools import assert_raises, eq_, ok_
+
+import blackbird.sr71
+from blackbird.plugins import base
+from blackbird.utils import eventloop
+from blackbird.utils.eventloop import From
+
+
+class HogeJob(base.JobBase):
+
+    def build_items(self):
+        pass
+
+
+def test_iscoroutinefunction():
+    job_obj = HogeJob({}, None, logging)
+    ok_(not eventloop.iscoroutinefunction(job_obj.build_items))
+
+
+class StubAsyncio(object):
+    """
+    Stands in for asyncio, the coroutines are driven by the test
+    with send and throw.
+    """
+
+    class TimeoutError(Exception):
+        pass
+
+    def __init__(self):
+        self.waited = list()
+
+    def wait_for(self, coroutine, timeout):
+        self.waited.append((coroutine, timeout))
+        return 'wait_for'
+
+
+class FlushJob(HogeJob):
+
+    flushed = 0
+
+    def flush_aggregates(self, now=None):
+        self.flushed += 1
+
+
+class TestExecuteCoroutine(object):
+    """
+    AsyncExecutor._execute_coroutine without the event loop.
+    """
+
+    def setup(self):
+        self.asyncio = eventloop.asyncio
+        eventloop.asyncio = StubAsyncio()
+        self.stats_queue = Queue.Queue()
+        self.job_obj = FlushJob({}, None, logging)
+
+    def teardown(self):
+        eventloop.asyncio = self.asyncio
+
+    def executor(self, job):
+        return blackbird.sr71.AsyncExecutor(
+            name='hogehoge-build_items',
+            job=job,
+            logger=logging,
+            interval=60,
+            event_loop=None,
+            stats_queue=self.stats_queue,
+            section='hogehoge',
+            timeout=5
+        )
+
+    def test_success(self):
+        executor = self.executor(self.job_obj.build_items)
+        run = executor._execute_coroutine()
+        eq_(run.next(), 'wait_for')
+        ok_(executor.status()['running'])
+        eq_(eventloop.asyncio.waited[0][1], 5)
+
+        assert_raises(StopIteration, run.send, None)
+        status = executor.status()
+        ok_(not status['running'])
+        ok_(status['coroutine'])
+        eq_(status['runs'], 1)
+        eq_(self.job_obj.flushed, 1)
+        # "is_alive" is not the one of threading.Thread.
+        ok_(not isinstance(executor, threading.Thread))
+        ok_(not status['alive'])
+
+    def test_timeout(self):
+        executor = self.executor(self.job_obj.build_items)
+        run = executor._execute_coroutine()
+        run.next()
+
+        assert_raises(
+            blackbird.sr71.JobTimeoutError,
+            run.throw, StubAsyncio.TimeoutError()
+        )
+        eq_(executor.runs, 1)
+        ok_(not executor.running)
+        eq_(self.job_obj.flushed, 1)
+
+
+class TestAsyncExecutor(object):
+
+    def setup(self):
+        if eventloop.asyncio is None:
+            raise SkipTest('asyncio(or trollius) is not installed')
+
+        self.queue = Queue.Queue()
+        self.stats_queue = Queue.Queue()
+        self.event_loop = eventloop.EventLoopThread(logger=logging)
+        self.event_loop.start()
+
+    def teardown(self):
+        self.event_loop.stop()
+        self.event_loop.join(1)
+
+    def stats(self):
+        stats = dict()
+        while not self.stats_queue.empty():
+            item = self.stats_queue.get()
+            key = item.data['key']
+            stats[key] = stats.get(key, 0) + item.data['value']
+        return stats
+
+    def executor(self, job, timeout=None):
+        return blackbird.sr71.AsyncExecutor(
+            name='hogehoge-build_items',
+            job=job,
+            logger=logging,
+            interval=0.05,
+            event_loop=self.event_loop,
+            stats_queue=self.stats_queue,
+            section='hogehoge',
+            timeout=timeout
+        )
+
+    def test_jobs_share_one_thread(self):
+        asyncio = eventloop.asyncio
+        threads = set()
+        job_obj = HogeJob({}, queue=self.queue, logger=logging)
+
+        @asyncio.coroutine
+        def job():
+            threads.add(threading.current_thread().name)
+            yield From(asyncio.sleep(0.01))
+            job_obj.enqueue(item=base.StatisticsItem(key='hoge', value=1))
+
+        ok_(eventloop.iscoroutinefunction(job))
+        executors = [self.executor(job) for _ in range(10)]
+        for executor in executors:
+            executor.start()
+        time.sleep(0.3)
+
+        ok_(all([executor.is_alive() for executor in executors]))
+        eq_(threads, set(['blackbird-event-loop']))
+        ok_(self.queue.qsize() >= 10)
+        ok_(all([executor.runs >= 1 for executor in executors]))
+
+    def test_timeout_cancels_run(self):
+        asyncio = eventloop.asyncio
+        cancelled = list()
+
+        @asyncio.coroutine
+        def job():
+            try:
+                yield From(asyncio.sleep(10))
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        executor = self.executor(job, timeout=0.05)
+        executor.start()
+        time.sleep(0.3)
+
+        status = executor.status()
+        ok_(status['timeouts'] >= 1, msg=status)
+        eq_(status['skipped'], 0, msg=status)
+        ok_(cancelled)
+        stats = self.stats()
+        ok_(stats['blackbird.job.timeouts[hogehoge]'] >= 1, msg=stats)
+
+    def test_failure_doesnt_stop_executor(self):
+        asyncio = eventloop.asyncio
+
+        @asyncio.coroutine
+        def job():
+            yield From(asyncio.sleep(0))
+            raise base.BlackbirdPluginError('hogehoge')
+
+        executor = self.executor(job)
+        executor.start()
+        time.sleep(0.2)
+
+        ok_(executor.is_alive())
+        ok_(executor.supervisor.failures >= 1)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/jsonbackend.py
+"""
+
+import json
+from nose.tools import eq_, ok_, raises
+
+from blackbird.utils import jsonbackend
+from blackbird.utils.error import BlackbirdError
+
+
+class TestJsonBackend(object):
+
+    def teardown(self):
+        jsonbackend.use()
+
+    def test_stdlib_fallback(self):
+        eq_(jsonbackend.use('json'), 'json')
+
+        value = jsonbackend.dumps({'key': u'あ', 'value': [1, 2]})
+        ok_(isinstance(value, str), msg=type(value))
+        ok_(' ' not in value, msg=value)
+        eq_(
+            json.loads(value.decode('utf-8')),
+            {'key': u'あ', 'value': [1, 2]}
+        )
+        ok_(u'あ'.encode('utf-8') in value, msg=value)
+
+    def test_auto(self):
+        ok_(jsonbackend.use('auto') in dict(jsonbackend.BACKENDS))
+
+    @raises(BlackbirdError)
+    def test_unknown_backend(self):
+        jsonbackend.use('hogehoge')
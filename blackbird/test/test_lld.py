@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/lld.py
+"""
+
+from nose.tools import eq_, ok_
+
+from blackbird.utils import lld
+
+
+class TestDiscoveryCache(object):
+
+    def put(self, cache, host, value):
+        if cache.check(host, 'redis.lld', value):
+            cache.sent(host, 'redis.lld', value)
+            return True
+        return False
+
+    def test_digest(self):
+        eq_(
+            lld.digest([{'{#A}': 'hoge', '{#B}': 1}, {'{#A}': 'fuga'}]),
+            lld.digest([{'{#A}': 'fuga'}, {'{#B}': 1, '{#A}': 'hoge'}])
+        )
+        ok_(
+            lld.digest([{'{#A}': 'hoge'}]) != lld.digest([{'{#A}': 'fuga'}])
+        )
+
+    def test_skip_unchanged(self):
+        cache = lld.DiscoveryCache(refresh=3)
+        value = [{'{#PORT}': 6379}]
+        eq_(
+            [self.put(cache, 'host', value) for index in range(4)],
+            [True, False, False, True]
+        )
+        eq_(cache.skipped, 2)
+
+        # changed entities are sent at once.
+        ok_(self.put(cache, 'host', [{'{#PORT}': 6380}]))
+        ok_(self.put(cache, 'another', value))
+
+    def test_unsent_value_is_not_recorded(self):
+        cache = lld.DiscoveryCache(refresh=3)
+        value = [{'{#PORT}': 6379}]
+        ok_(cache.check('host', 'redis.lld', value))
+        # "sent" isn't called, e.g: the queue was full.
+        ok_(cache.check('host', 'redis.lld', value))
+
+    def test_disabled(self):
+        cache = lld.DiscoveryCache(refresh=1)
+        ok_(cache.check('host', 'redis.lld', []))
+        ok_(cache.check('host', 'redis.lld', []))
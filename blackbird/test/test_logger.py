@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/logger.py
+"""
+
+import logging
+import sys
+import threading
+from nose.tools import eq_, ok_, raises
+
+from blackbird.utils import logger
+from blackbird.utils.error import BlackbirdError
+
+
+class RecordHandler(logging.Handler):
+    """
+    Keep the formatted messages.
+    "gate" stops the writer thread until it is set.
+    """
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = list()
+        self.threads = set()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def emit(self, record):
+        self.gate.wait()
+        self.threads.add(threading.current_thread().name)
+        self.messages.append(self.format(record))
+
+
+def record(message):
+    return logging.makeLogRecord({
+        'name': 'test_logger',
+        'levelno': logging.INFO,
+        'levelname': 'INFO',
+        'msg': message,
+    })
+
+
+class TestAsyncHandler(object):
+
+    def setup(self):
+        self.target = RecordHandler()
+
+    def test_write_in_background(self):
+        handler = logger.AsyncHandler(self.target, capacity=10)
+        handler.handle(record('hoge'))
+        handler.flush()
+        eq_(self.target.messages, ['hoge'])
+        eq_(self.target.threads, set(['blackbird-log-writer']))
+        handler.close()
+
+    def test_lazy_format(self):
+        handler = logger.AsyncHandler(self.target, capacity=10)
+        log = logging.getLogger('test_logger.lazy')
+        log.propagate = False
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+
+        class Expensive(object):
+            formatted = 0
+
+            def __str__(self):
+                Expensive.formatted += 1
+                return 'expensive'
+
+        log.debug('%s', Expensive())
+        log.info('%s', Expensive())
+        handler.flush()
+        log.removeHandler(handler)
+        handler.close()
+
+        eq_(Expensive.formatted, 1)
+        eq_(self.target.messages, ['expensive'])
+
+    def test_drop_new(self):
+        handler = logger.AsyncHandler(self.target, capacity=2)
+        self.target.gate.clear()
+        handler.handle(record('first'))
+        # wait for the writer to take "first" and to stop at the gate.
+        while handler._buffer:
+            threading.Event().wait(0.01)
+        for message in ('a', 'b', 'c', 'd'):
+            handler.handle(record(message))
+        self.target.gate.set()
+        handler.flush()
+        handler.close()
+
+        eq_(handler.dropped, 2)
+        ok_('2 log records were dropped' in self.target.messages[1])
+        eq_(self.target.messages[2:], ['a', 'b'])
+
+    def test_drop_old(self):
+        handler = logger.AsyncHandler(
+            self.target, capacity=2, overflow='drop_old'
+        )
+        self.target.gate.clear()
+        handler.handle(record('first'))
+        while handler._buffer:
+            threading.Event().wait(0.01)
+        for message in ('a', 'b', 'c', 'd'):
+            handler.handle(record(message))
+        self.target.gate.set()
+        handler.flush()
+        handler.close()
+
+        eq_(handler.dropped, 2)
+        eq_(self.target.messages[2:], ['c', 'd'])
+
+    def test_close_writes_buffered_records(self):
+        handler = logger.AsyncHandler(self.target, capacity=100)
+        for index in range(50):
+            handler.handle(record(str(index)))
+        handler.close()
+        eq_(len(self.target.messages), 50)
+
+    def test_exception_is_formatted(self):
+        handler = logger.AsyncHandler(self.target, capacity=10)
+        try:
+            raise ValueError('hoge')
+        except ValueError:
+            entry = record('failed')
+            entry.exc_info = sys.exc_info()
+        handler.handle(entry)
+        eq_(entry.exc_info, None)
+        handler.close()
+        ok_('ValueError: hoge' in self.target.messages[0])
+
+    @raises(BlackbirdError)
+    def test_unknown_overflow(self):
+        logger.AsyncHandler(self.target, overflow='hoge')
+
+
+class TestGetHandlerFp(object):
+
+    def test_unwrap_async_handler(self):
+        log = logging.getLogger('test_logger.fp')
+        target = logging.StreamHandler()
+        handler = logger.AsyncHandler(target)
+        log.addHandler(handler)
+        try:
+            eq_(logger.get_handler_fp(log), target.stream)
+        finally:
+            log.removeHandler(handler)
+            handler.close()
+
+
+class TestStormFilter(object):
+
+    def setup(self):
+        self.target = RecordHandler()
+        self.log = logging.getLogger('test_logger.storm')
+        self.log.propagate = False
+        self.log.setLevel(logging.INFO)
+        self.log.addHandler(self.target)
+
+    def teardown(self):
+        self.log.removeHandler(self.target)
+        for entry in list(self.log.filters):
+            self.log.removeFilter(entry)
+
+    def add_filter(self, **kwargs):
+        storm = logger.StormFilter(self.log, **kwargs)
+        self.log.addFilter(storm)
+        return storm
+
+    def test_collapse_repeats(self):
+        storm = self.add_filter(rate=0, repeat_interval=60)
+        for _ in range(5):
+            self.log.error('Blackbird item Queue is Full!!!')
+        self.log.error('hoge %s', 'fuga')
+        eq_(self.target.messages, [
+            'Blackbird item Queue is Full!!!',
+            'hoge fuga',
+        ])
+
+        # other messages don't break the repeats.
+        self.log.error('Blackbird item Queue is Full!!!')
+        eq_(len(self.target.messages), 2)
+        eq_(storm.stats()['blackbird.log.repeated'], 5)
+
+        for state in storm.templates.values():
+            state.written -= 60
+        self.log.error('Blackbird item Queue is Full!!!')
+        eq_(self.target.messages[2:], [
+            '"Blackbird item Queue is Full!!!" repeated 5 times',
+            'Blackbird item Queue is Full!!!',
+        ])
+
+    def test_different_arguments_are_not_repeats(self):
+        self.add_filter(rate=0, repeat_interval=60)
+        for index in range(3):
+            self.log.error('failed to send batch %d', index)
+        eq_(len(self.target.messages), 3)
+
+    def test_rate_limit_per_template(self):
+        storm = self.add_filter(rate=0.001, burst=2, repeat_interval=0)
+        for index in range(5):
+            self.log.warn('failed to send batch %d', index)
+        self.log.warn('other template')
+        eq_(self.target.messages, [
+            'failed to send batch 0',
+            'failed to send batch 1',
+            'other template',
+        ])
+        eq_(storm.stats()['blackbird.log.suppressed'], 3)
+
+        storm.flush()
+        eq_(self.target.messages[3],
+            '3 messages similar to "failed to send batch 1" suppressed')
+
+    def test_flush_after_interval(self):
+        storm = self.add_filter(rate=0, repeat_interval=60)
+        for _ in range(3):
+            self.log.error('hoge')
+        storm.flush()
+        eq_(len(self.target.messages), 1)
+
+        for state in storm.templates.values():
+            state.written -= 60
+        storm.flush()
+        eq_(self.target.messages[1], '"hoge" repeated 2 times')
+        storm.flush()
+        eq_(len(self.target.messages), 2)
+
+    def test_storm_filter(self):
+        eq_(logger.storm_filter(self.log), None)
+        storm = self.add_filter()
+        eq_(logger.storm_filter(self.log), storm)
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test plugins/base.py
+"""
+
+import json
+import logging
+import Queue
+import socket
+import threading
+import time
+from nose.tools import eq_, ok_, raises
+
+from blackbird.plugins import base
+
+
+class TestSharedCache(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def setup(self):
+        self.calls = 0
+
+    def fetch(self):
+        self.calls += 1
+        time.sleep(0.05)
+        return self.calls
+
+    def test_ttl(self):
+        cache = base.SharedCache()
+
+        eq_(cache.fetch('hoge', self.fetch, ttl=60), 1)
+        eq_(cache.fetch('hoge', self.fetch, ttl=60), 1)
+        eq_(cache.fetch('fuga', self.fetch, ttl=60), 2)
+
+        eq_(cache.fetch('piyo', self.fetch, ttl=0), 3)
+        eq_(cache.fetch('piyo', self.fetch, ttl=0), 4)
+
+    def test_single_flight(self):
+        cache = base.SharedCache()
+        results = list()
+
+        def reader():
+            results.append(cache.fetch('hoge', self.fetch, ttl=60))
+
+        threads = [threading.Thread(target=reader) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        eq_(self.calls, 1)
+        eq_(results, [1] * 10)
+        stats = cache.stats()
+        eq_(stats['misses'], 1, msg=stats)
+        eq_(stats['hits'] + stats['coalesced'], 9, msg=stats)
+
+    def test_lru(self):
+        cache = base.SharedCache(max_entries=2)
+        cache.fetch('hoge', self.fetch, ttl=60)
+        cache.fetch('fuga', self.fetch, ttl=60)
+        # "hoge" becomes the most recently used.
+        cache.fetch('hoge', self.fetch, ttl=60)
+        cache.fetch('piyo', self.fetch, ttl=60)
+
+        eq_(self.calls, 3)
+        cache.fetch('hoge', self.fetch, ttl=60)
+        eq_(self.calls, 3)
+        cache.fetch('fuga', self.fetch, ttl=60)
+        eq_(self.calls, 4)
+
+    @raises(base.BlackbirdPluginError)
+    def test_error_is_not_cached(self):
+        cache = base.SharedCache()
+
+        def fail():
+            self.calls += 1
+            raise base.BlackbirdPluginError('hogehoge')
+
+        for _ in range(2):
+            try:
+                cache.fetch('hoge', fail, ttl=60)
+            except base.BlackbirdPluginError:
+                pass
+        eq_(self.calls, 2)
+        cache.fetch('hoge', fail, ttl=60)
+
+    @raises(KeyboardInterrupt)
+    def test_base_exception_wakes_waiters(self):
+        cache = base.SharedCache()
+        errors = list()
+
+        def waiter():
+            try:
+                cache.fetch('hoge', self.fetch, ttl=60)
+            except BaseException as error:
+                errors.append(error)
+
+        thread = threading.Thread(target=waiter)
+
+        def interrupted():
+            # the waiter joins this flight.
+            thread.start()
+            time.sleep(0.05)
+            raise KeyboardInterrupt()
+
+        try:
+            cache.fetch('hoge', interrupted, ttl=60)
+        finally:
+            thread.join(1)
+            ok_(not thread.is_alive())
+            ok_(isinstance(errors[0], KeyboardInterrupt), msg=errors)
+            eq_(cache.fetch('hoge', self.fetch, ttl=60), 1)
+
+
+class TestConnectionPool(object):
+
+    def setup(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(16)
+        self.endpoint = self.server.getsockname()
+        self.accepted = list()
+        self.pool = base.ConnectionPool(max_per_endpoint=2, idle_timeout=60)
+
+    def teardown(self):
+        self.pool.clear()
+        for conn in self.accepted:
+            conn.close()
+        self.server.close()
+
+    def accept(self):
+        conn, _ = self.server.accept()
+        self.accepted.append(conn)
+        return conn
+
+    def test_reuse(self):
+        with self.pool.connection(self.endpoint) as first:
+            pass
+        with self.pool.connection(self.endpoint) as second:
+            pass
+
+        ok_(first is second)
+        stats = self.pool.stats()
+        eq_(stats['hits'], 1)
+        eq_(stats['misses'], 1)
+        eq_(stats['idle'], 1)
+        eq_(stats['in_use'], 0)
+
+    def test_keepalive(self):
+        with self.pool.connection(self.endpoint) as sock:
+            eq_(sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE), 1)
+
+    def test_closed_by_peer(self):
+        with self.pool.connection(self.endpoint) as first:
+            pass
+        self.accept().close()
+        time.sleep(0.05)
+
+        with self.pool.connection(self.endpoint) as second:
+            pass
+
+        ok_(first is not second)
+        eq_(self.pool.stats()['discarded'], 1)
+        eq_(self.pool.stats()['misses'], 2)
+
+    def test_error_closes_connection(self):
+        try:
+            with self.pool.connection(self.endpoint):
+                raise ValueError('hoge')
+        except ValueError:
+            pass
+        eq_(self.pool.stats()['idle'], 0)
+        eq_(self.pool.stats()['in_use'], 0)
+
+    def test_base_exception_releases_slot(self):
+        def job():
+            with self.pool.connection(self.endpoint):
+                yield
+
+        # closing the generator raises GeneratorExit in "with".
+        for _ in range(3):
+            generator = job()
+            next(generator)
+            generator.close()
+
+        eq_(self.pool.stats()['in_use'], 0)
+        eq_(self.pool.stats()['idle'], 0)
+        with self.pool.connection(self.endpoint, timeout=0.05):
+            pass
+
+    def test_idle_timeout(self):
+        self.pool.idle_timeout = 0
+        with self.pool.connection(self.endpoint) as first:
+            pass
+        time.sleep(0.01)
+        with self.pool.connection(self.endpoint) as second:
+            pass
+        ok_(first is not second)
+        eq_(self.pool.stats()['discarded'], 1)
+
+    @raises(base.BlackbirdPluginError)
+    def test_max_per_endpoint(self):
+        self.pool.checkout(self.endpoint)
+        self.pool.checkout(self.endpoint)
+        self.pool.checkout(self.endpoint, timeout=0.05)
+
+    def test_wait_for_checkin(self):
+        first = self.pool.checkout(self.endpoint)
+        self.pool.checkout(self.endpoint)
+        timer = threading.Timer(
+            0.05, self.pool.checkin, (self.endpoint, first)
+        )
+        timer.start()
+        ok_(self.pool.checkout(self.endpoint, timeout=1) is first)
+        timer.join()
+
+
+class TestItemWire(object):
+
+    def test_serialized_once(self):
+        item = base.StatisticsItem(key='hoge', value=1, host='fuga')
+        wire = item.wire
+        ok_(item.wire is wire)
+        eq_(
+            json.loads(wire),
+            {'key': 'hoge', 'value': 1, 'host': 'fuga',
+             'clock': item.clock, 'ns': item.ns}
+        )
+
+    def test_multiple_data(self):
+        item = base.DataItem({'key': 'hoge'})
+        item._data = ({'key': 'hoge'}, {'key': 'fuga'})
+        eq_(
+            json.loads('[' + item.wire + ']'),
+            [{'key': 'hoge'}, {'key': 'fuga'}]
+        )
+
+
+class HogeJob(base.JobBase):
+
+    def build_items(self):
+        pass
+
+
+class TestEnqueue(object):
+
+    def test_deadband(self):
+        queue = Queue.Queue()
+        stats_queue = Queue.Queue()
+        job = HogeJob(
+            options={'deadband': ['hoge'], 'heartbeat': 10},
+            queue=queue,
+            logger=logging.getLogger('test_plugins_base')
+        )
+
+        for value in (1, 1, 2):
+            job.enqueue(base.StatisticsItem(key='hoge', value=value))
+            job.enqueue(base.StatisticsItem(key='fuga', value=value))
+        for value in (1, 1):
+            job.enqueue(
+                base.StatisticsItem(key='hoge', value=value), stats_queue
+            )
+
+        eq_(queue.qsize(), 5)
+        eq_(stats_queue.qsize(), 2)
+
+    def test_deadband_full_queue(self):
+        queue = Queue.Queue(1)
+        job = HogeJob(
+            options={'deadband': ['hoge'], 'heartbeat': 10},
+            queue=queue,
+            logger=logging.getLogger('test_plugins_base')
+        )
+
+        ok_(job.enqueue(base.StatisticsItem(key='fuga', value=0)))
+        # the queue is full, so the value is not sent.
+        ok_(not job.enqueue(base.StatisticsItem(key='hoge', value=1)))
+        queue.get()
+        # not suppressed because 1 has never been sent.
+        ok_(job.enqueue(base.StatisticsItem(key='hoge', value=1)))
+        eq_(queue.get().value, 1)
+        ok_(not job.enqueue(base.StatisticsItem(key='hoge', value=1)))
+
+    def test_aggregate_flushed_after_run(self):
+        queue = Queue.Queue()
+
+        class AggregateJob(HogeJob):
+
+            def build_items(self):
+                self.enqueue(base.StatisticsItem(key='hoge', value=1))
+
+        job = AggregateJob(
+            options={'aggregate': ['hoge'], 'aggregate_window': 0,
+                     'aggregate_functions': ['max']},
+            queue=queue,
+            logger=logging.getLogger('test_plugins_base')
+        )
+        base.JobClock(job.build_items)()
+
+        # the window has ended, so it is flushed without the next value.
+        eq_(queue.get(block=False).data['key'], 'hoge.max')
+        ok_(queue.empty())
+
+    def test_discovery_full_queue(self):
+        queue = Queue.Queue(1)
+        job = HogeJob(
+            options={'lld_refresh': 6},
+            queue=queue,
+            logger=logging.getLogger('test_plugins_base')
+        )
+
+        def discovery():
+            return base.DiscoveryItem(
+                key='hoge.lld', value=[{'{#HOGE}': 'fuga'}], host='hoge'
+            )
+
+        ok_(job.enqueue(base.StatisticsItem(key='fuga', value=0)))
+        # the queue is full, so the payload is not sent.
+        ok_(not job.enqueue(discovery()))
+        queue.get()
+        # not suppressed because it has never been sent.
+        ok_(job.enqueue(discovery()))
+        eq_(queue.get().key, 'hoge.lld')
+        ok_(not job.enqueue(discovery()))
+
+    def test_discovery(self):
+        queue = Queue.Queue()
+        job = HogeJob(
+            options={'lld_refresh': 6},
+            queue=queue,
+            logger=logging.getLogger('test_plugins_base')
+        )
+
+        for value in ([{'{#A}': 1}], [{'{#A}': 1}], [{'{#A}': 2}]):
+            job.enqueue(
+                base.DiscoveryItem(key='hoge.lld', value=value, host='fuga')
+            )
+        eq_(queue.qsize(), 2)
+
+
+class TestJobClock(object):
+
+    def test_shared_clock(self):
+        items = list()
+
+        def build_items():
+            for key in ('hoge', 'fuga'):
+                items.append(base.StatisticsItem(key=key, value=1))
+                time.sleep(0.01)
+
+        base.JobClock(build_items)()
+        eq_(
+            (items[0].clock, items[0].ns), (items[1].clock, items[1].ns)
+        )
+        ok_(0 <= items[0].ns < 1000000000)
+
+        # outside of job runs, the clock is read for each item.
+        first = base.StatisticsItem(key='hoge', value=1)
+        time.sleep(0.01)
+        second = base.StatisticsItem(key='hoge', value=1)
+        ok_((first.clock, first.ns) < (second.clock, second.ns))
+
+    def test_given_clock(self):
+        item = base.DataItem({'key': 'hoge', 'clock': 946652400})
+        eq_((item.clock, item.ns), (946652400, None))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/procstat.py
+"""
+
+import os
+import shutil
+import tempfile
+from nose.tools import eq_, ok_
+
+from blackbird.utils import procstat
+
+STAT = (
+    '1234 (black bird) S 1 1234 1234 0 -1 4194560 1000 0 0 0 '
+    '{utime} {stime} 0 0 20 0 3 0 100 123456789 2000 '
+    '18446744073709551615 1 1 0 0 0 0 0 4096 0 0 0 0 17 0 0 0 0 0 0\n'
+)
+STATUS = (
+    'Name:\tblackbird\n'
+    'VmHWM:\t   20480 kB\n'
+    'VmRSS:\t   10240 kB\n'
+    'Threads:\t3\n'
+)
+
+
+class TestProcessStat(object):
+
+    def setup(self):
+        self.proc_dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.proc_dir, 'fd'))
+        for name in ('0', '1'):
+            open(os.path.join(self.proc_dir, 'fd', name), 'w').close()
+        self.write('status', STATUS)
+        self.write('stat', STAT.format(utime=100, stime=50))
+
+    def teardown(self):
+        shutil.rmtree(self.proc_dir)
+
+    def write(self, name, content):
+        with open(os.path.join(self.proc_dir, name), 'w') as fileobj:
+            fileobj.write(content)
+
+    def test_read(self):
+        stat = procstat.ProcessStat(self.proc_dir)
+        result = stat.read()
+        eq_(result['blackbird.process.rss'], 10240 * 1024)
+        eq_(result['blackbird.process.rss_peak'], 20480 * 1024)
+        eq_(result['blackbird.process.threads'], 3)
+        eq_(result['blackbird.process.fds'], 2)
+        ok_('blackbird.process.gc.gen0' in result)
+        ok_('blackbird.process.cpu.user' not in result)
+
+        # the same file object is re-read.
+        stat._last = (stat._last[0] - 10, stat._last[1])
+        self.write('stat', STAT.format(
+            utime=100 + procstat.CLOCK_TICKS, stime=50
+        ))
+        result = stat.read()
+        ok_(9 < result['blackbird.process.cpu.user'] < 11, msg=result)
+        eq_(result['blackbird.process.cpu.system'], 0)
+        stat.close()
+
+    def test_own_process(self):
+        stat = procstat.ProcessStat()
+        stat.read()
+        result = stat.read()
+        ok_(result['blackbird.process.rss'] > 0)
+        ok_(result['blackbird.process.threads'] >= 1)
+        ok_(result['blackbird.process.cpu.user'] >= 0)
+        stat.close()
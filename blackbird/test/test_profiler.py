@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/profiler.py
+"""
+
+import logging
+import os
+import pstats
+import shutil
+import tempfile
+from nose.tools import eq_, ok_
+
+from blackbird.utils import profiler
+
+
+class TestJobProfiler(object):
+
+    def __init__(self):
+        self.profile_dir = None
+
+    def setup(self):
+        self.profile_dir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.profile_dir)
+
+    def dumped(self):
+        return [
+            entry for entry in os.listdir(self.profile_dir)
+            if entry.endswith(profiler.JobProfiler.suffix)
+        ]
+
+    def test_dump_every_runs(self):
+        job = profiler.JobProfiler(
+            name='hogehoge-build_items',
+            method=lambda: sum(range(1000)),
+            profile_dir=self.profile_dir,
+            logger=logging,
+            runs=3
+        )
+
+        for _ in range(2):
+            eq_(job(), sum(range(1000)))
+        eq_(self.dumped(), [])
+
+        job()
+        dumped = self.dumped()
+        eq_(len(dumped), 1, msg=dumped)
+        ok_(dumped[0].startswith('hogehoge-build_items.'), msg=dumped)
+
+        stats = pstats.Stats(os.path.join(self.profile_dir, dumped[0]))
+        ok_(stats.total_calls > 0)
+
+    def test_rotate(self):
+        job = profiler.JobProfiler(
+            name='hogehoge-build_items',
+            method=lambda: None,
+            profile_dir=self.profile_dir,
+            logger=logging,
+            runs=1,
+            keep=2
+        )
+
+        for index in range(4):
+            # dump files are named by the time.
+            path = os.path.join(
+                self.profile_dir,
+                'hogehoge-build_items.{0}.pstats'.format(index)
+            )
+            open(path, 'w').close()
+            os.utime(path, (index, index))
+
+        job()
+        dumped = sorted(self.dumped())
+        eq_(len(dumped), 2, msg=dumped)
+        ok_('hogehoge-build_items.3.pstats' in dumped, msg=dumped)
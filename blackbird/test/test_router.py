@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/router.py
+"""
+
+import Queue
+from nose.tools import eq_, ok_, raises
+
+from blackbird.plugins import base
+from blackbird.utils import router
+
+
+def item(key, host='hogehoge'):
+    return base.StatisticsItem(key=key, value=1, host=host)
+
+
+class TestRouter(object):
+
+    def setup(self):
+        self.router = router.Router(maxsize=3)
+        self.zabbix = self.router.add_output('zabbix')
+        self.archive = self.router.add_output(
+            'archive', keys=['linux.*'], hosts=['hoge*']
+        )
+
+    def test_fan_out(self):
+        first = item('linux.load')
+        self.router.put(first)
+        self.router.put(item('blackbird.version'))
+        self.router.put(item('linux.load', host='fuga'))
+
+        eq_(self.zabbix.qsize(), 3)
+        eq_(self.archive.qsize(), 1)
+        # the same object is shared.
+        ok_(self.archive.get() is first)
+        ok_(self.zabbix.get() is first)
+
+    def test_output_queue_put_is_routed(self):
+        self.zabbix.put(item('linux.load'), block=False)
+        eq_(self.zabbix.qsize(), 1)
+        eq_(self.archive.qsize(), 1)
+
+    def test_slow_output(self):
+        for index in range(4):
+            self.router.put(item('linux.{0}'.format(index)))
+            self.archive.get()
+
+        # zabbix is full, but archive still accepts items.
+        eq_(self.router.status()['zabbix']['dropped'], 1)
+        eq_(self.router.status()['archive']['delivered'], 4)
+        eq_(self.router.qsize(), 3)
+
+    @raises(Queue.Full)
+    def test_full(self):
+        for index in range(4):
+            self.router.put(item('linux.{0}'.format(index)))
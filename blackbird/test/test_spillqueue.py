@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/spillqueue.py
+"""
+
+import os
+import Queue
+import shutil
+import tempfile
+from nose.tools import eq_, ok_, raises
+
+from blackbird.plugins import base
+from blackbird.utils import spillqueue
+
+
+def item(index):
+    return base.StatisticsItem(key='hoge{0}'.format(index), value=index)
+
+
+class TestSpillQueue(object):
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.spill_path = os.path.join(self.tmp_dir, 'queue.spill')
+        self.size = len(item(0).wire)
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_spill_and_read_back(self):
+        queue = spillqueue.SpillQueue(
+            max_bytes=self.size * 3, spill_path=self.spill_path
+        )
+        for index in range(10):
+            queue.put(item(index))
+
+        status = queue.status()
+        eq_(status['length'], 10)
+        eq_(status['spilled'], 7)
+        ok_(status['bytes'] <= self.size * 3, msg=status)
+
+        keys = list()
+        while not queue.empty():
+            keys.append(queue.get().key)
+        eq_(keys, ['hoge{0}'.format(index) for index in range(10)])
+        eq_(queue.bytes, 0)
+        eq_(os.path.getsize(self.spill_path), 0)
+
+    def test_interleaved(self):
+        queue = spillqueue.SpillQueue(
+            max_bytes=self.size, spill_path=self.spill_path
+        )
+        queue.put(item(0))
+        queue.put(item(1))
+        eq_(queue.get().key, 'hoge0')
+        queue.put(item(2))
+        eq_([queue.get().key for index in range(2)], ['hoge1', 'hoge2'])
+
+    @raises(Queue.Full)
+    def test_without_spill_dir(self):
+        queue = spillqueue.SpillQueue(max_bytes=self.size * 2)
+        for index in range(3):
+            queue.put(item(index), block=False)
+
+    def test_unlimited(self):
+        queue = spillqueue.SpillQueue()
+        for index in range(3):
+            queue.put(item(index))
+        eq_(queue.bytes, self.size * 3)
+        ok_(not os.path.exists(self.spill_path))
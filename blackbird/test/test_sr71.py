@@ -6,12 +6,18 @@ Tset sr71.py
 
 import glob
 import os
+import Queue
 import tempfile
+import threading
+import time
 import logging
 from nose.tools import *
 
 import blackbird.sr71
+from blackbird.plugins.base import BlackbirdPluginError
 from blackbird.utils import configread
+from blackbird.utils import targets
+from blackbird.utils.supervisor import JobSupervisor
 
 
 class TestJobCreater(object):
@@ -90,3 +96,161 @@ class TestJobCreater(object):
                  ''.format(jobs=threads)
                  )
             )
+
+
+class TestExecutor(object):
+
+    def __init__(self):
+        self.stats_queue = None
+
+    def setup(self):
+        self.stats_queue = Queue.Queue()
+
+    def stats(self):
+        stats = dict()
+        while not self.stats_queue.empty():
+            item = self.stats_queue.get()
+            key = item.data['key']
+            stats[key] = stats.get(key, 0) + item.data['value']
+        return stats
+
+    def test_overdue_run_is_not_overlapped(self):
+        finished = threading.Event()
+        executor = blackbird.sr71.Executor(
+            name='hogehoge-build_items',
+            job=lambda: finished.wait(1),
+            logger=logging,
+            interval=0.05,
+            stats_queue=self.stats_queue,
+            section='hogehoge',
+            timeout=0.05
+        )
+        executor.run_once()
+        executor.run_once()
+
+        status = executor.status()
+        eq_(status['timeouts'], 1, msg=status)
+        eq_(status['skipped'], 1, msg=status)
+        ok_(status['running'], msg=status)
+        eq_(status['runs'], 0, msg=status)
+
+        stats = self.stats()
+        eq_(stats['blackbird.job.timeouts[hogehoge]'], 1, msg=stats)
+
+        finished.set()
+        executor.runner.join(1)
+        eq_(executor.status()['runs'], 1)
+
+    def test_plugin_error_with_timeout(self):
+        def job():
+            raise BlackbirdPluginError('hogehoge')
+
+        executor = blackbird.sr71.Executor(
+            name='hogehoge-build_items',
+            job=job,
+            logger=logging,
+            interval=0.05,
+            timeout=1
+        )
+
+        try:
+            executor._execute_with_deadline()
+        except BlackbirdPluginError:
+            pass
+        else:
+            raise AssertionError('BlackbirdPluginError must be raised')
+        eq_(executor.runs, 1)
+
+    def test_failing_job_opens_circuit(self):
+        def job():
+            raise BlackbirdPluginError('hogehoge')
+
+        executor = blackbird.sr71.Executor(
+            name='hogehoge-build_items',
+            job=job,
+            logger=logging,
+            interval=0.01,
+            stats_queue=self.stats_queue,
+            section='hogehoge',
+            supervisor=JobSupervisor(
+                interval=0.01, max_backoff=0.02,
+                threshold=3, probe_interval=60
+            )
+        )
+        for _ in range(3):
+            executor.run_once()
+
+        status = executor.status()
+        eq_(status['circuit'], JobSupervisor.OPEN, msg=status)
+        eq_(status['runs'], 3, msg=status)
+        eq_(executor.supervisor.delay(), 60)
+
+        stats = self.stats()
+        eq_(stats['blackbird.job.failures[hogehoge]'], 3, msg=stats)
+        eq_(stats['blackbird.job.circuit_open[hogehoge]'], 1, msg=stats)
+
+    def test_stop(self):
+        runs = threading.Semaphore(0)
+        executor = blackbird.sr71.Executor(
+            name='hogehoge-build_items',
+            job=runs.release,
+            logger=logging,
+            interval=0.01
+        )
+        executor.start()
+        runs.acquire()
+        executor.stop()
+        executor.join(1)
+        ok_(not executor.is_alive())
+
+    def test_stop_closes_target_pool(self):
+        runs = threading.Semaphore(0)
+        group = targets.TargetGroup(
+            section='hogehoge',
+            methods=[('hoge', runs.release)],
+            logger=logging
+        )
+        executor = blackbird.sr71.Executor(
+            name='hogehoge-build_items',
+            job=group,
+            logger=logging,
+            interval=0.01
+        )
+        executor.start()
+        runs.acquire()
+        executor.stop()
+        executor.join(1)
+        ok_(not executor.is_alive())
+        eq_(group._pool, None)
+
+
+class TestConcreteJob(object):
+
+    def setup(self):
+        self.warnings = list()
+        test = self
+
+        class Logger(object):
+            def info(self, message):
+                pass
+
+            def warn(self, message):
+                test.warnings.append(message)
+
+        self.creator = blackbird.sr71.JobCreator(
+            {'global': {'max_queue_length': 1}}, dict(), Logger()
+        )
+
+    def test_profile_of_targets_is_warned(self):
+        group = targets.TargetGroup(
+            section='hogehoge',
+            methods=[('hoge', lambda: None)],
+            stats_queue=self.creator.stats_queue
+        )
+        concrete_job = self.creator._concrete_job(
+            'hogehoge-build_items', 'hogehoge', None, group,
+            {'profile': True}, 60
+        )
+        ok_(concrete_job['method'] is group)
+        eq_(len(self.warnings), 1)
+        ok_('"profile" is ignored' in self.warnings[0], msg=self.warnings)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/status.py
+"""
+
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+from nose.tools import eq_, ok_
+
+from blackbird.utils import status
+
+
+class TestStatusServer(object):
+
+    def __init__(self):
+        self.tmp_dir = None
+        self.server = None
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.server = status.StatusServer(
+            path=os.path.join(self.tmp_dir, 'status.sock'),
+            snapshot=lambda: {'queue': {'length': 3}},
+            logger=logging
+        )
+
+    def teardown(self):
+        self.server.shutdown()
+        shutil.rmtree(self.tmp_dir)
+
+    def request(self):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(self.server.path)
+        response = client.makefile('rb').read()
+        client.close()
+        return json.loads(response)
+
+    def test_snapshot(self):
+        self.server.bind()
+        self.server.start()
+
+        eq_(self.request(), {'queue': {'length': 3}})
+        eq_(self.request(), {'queue': {'length': 3}})
+
+    def test_remove_stale_socket(self):
+        open(self.server.path, 'w').close()
+        self.server.bind()
+        self.server.start()
+
+        ok_('queue' in self.request())
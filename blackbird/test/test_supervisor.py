@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/supervisor.py
+"""
+
+from nose.tools import eq_, ok_
+
+from blackbird.utils.supervisor import JobSupervisor
+
+
+class TestJobSupervisor(object):
+
+    def test_backoff(self):
+        supervisor = JobSupervisor(
+            interval=10, max_backoff=60, threshold=0
+        )
+        eq_(supervisor.delay(), 10)
+
+        delays = list()
+        for _ in range(5):
+            supervisor.failure()
+            delays.append(supervisor.delay())
+        eq_(delays, [20, 40, 60, 60, 60])
+
+        supervisor.success()
+        eq_(supervisor.delay(), 10)
+
+    def test_circuit(self):
+        supervisor = JobSupervisor(
+            interval=10, max_backoff=60, threshold=3, probe_interval=300
+        )
+
+        ok_(not supervisor.failure())
+        ok_(not supervisor.failure())
+        ok_(supervisor.failure())
+        eq_(supervisor.state, JobSupervisor.OPEN)
+        eq_(supervisor.delay(), 300)
+
+        # failed probe doesn't open the circuit again.
+        ok_(not supervisor.failure())
+        eq_(supervisor.delay(), 300)
+
+        ok_(supervisor.success())
+        eq_(supervisor.state, JobSupervisor.CLOSED)
+        eq_(supervisor.delay(), 10)
+
+    def test_probe_interval_shorter_than_interval(self):
+        supervisor = JobSupervisor(
+            interval=3600, max_backoff=3600, threshold=1, probe_interval=600
+        )
+        ok_(supervisor.failure())
+        eq_(supervisor.delay(), 3600)
+
+    def test_many_failures(self):
+        supervisor = JobSupervisor(interval=1, max_backoff=3600, threshold=0)
+        for _ in range(1000):
+            supervisor.failure()
+        eq_(supervisor.delay(), 3600)
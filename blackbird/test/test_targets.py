@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/targets.py
+"""
+
+import logging
+import os
+import Queue
+import shutil
+import tempfile
+import threading
+import time
+from nose.tools import eq_, ok_, raises
+
+from blackbird.utils import eventloop
+from blackbird.utils import targets
+from blackbird.utils.error import BlackbirdError
+
+
+class TestLoadTargets(object):
+
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_option_and_file(self):
+        path = os.path.join(self.tmp_dir, 'hoge.targets')
+        with open(path, 'w') as fileobj:
+            fileobj.write(
+                '# memcached\n'
+                '10.0.0.2:11211\n'
+                '\n'
+                '10.0.0.3:11211=cache03  # comment\n'
+            )
+        eq_(
+            targets.load_targets(['10.0.0.1:11211', ''], path),
+            ['10.0.0.1:11211', '10.0.0.2:11211', '10.0.0.3:11211=cache03']
+        )
+
+    @raises(BlackbirdError)
+    def test_missing_file(self):
+        targets.load_targets([], os.path.join(self.tmp_dir, 'hoge'))
+
+
+class TestTargetOptions(object):
+
+    def setup(self):
+        self.options = {
+            'module': 'memcached',
+            'host': '127.0.0.1',
+            'port': 11211,
+            'hostname': 'localhost',
+            'target_hostname': 'memcached-{host}-{port}',
+        }
+
+    def test_host_port_hostname(self):
+        options = targets.target_options(
+            self.options, '10.0.0.1:11212=cache01'
+        )
+        eq_(options['host'], '10.0.0.1')
+        eq_(options['port'], 11212)
+        eq_(options['hostname'], 'cache01')
+        eq_(self.options['host'], '127.0.0.1')
+
+    def test_target_hostname(self):
+        options = targets.target_options(self.options, 'cache02')
+        eq_(options['host'], 'cache02')
+        eq_(options['port'], 11211)
+        eq_(options['hostname'], 'memcached-cache02-11211')
+
+    def test_ipv6(self):
+        options = targets.target_options(self.options, '[::1]:11213')
+        eq_(options['host'], '::1')
+        eq_(options['port'], 11213)
+
+    @raises(BlackbirdError)
+    def test_invalid(self):
+        targets.target_options(self.options, 'hoge:fuga')
+
+    @raises(BlackbirdError)
+    def test_unknown_field_of_target_hostname(self):
+        self.options['target_hostname'] = 'memcached-{hostname}'
+        targets.target_options(self.options, 'cache02')
+
+    @raises(BlackbirdError)
+    def test_malformed_target_hostname(self):
+        self.options['target_hostname'] = 'memcached-{host'
+        targets.target_options(self.options, 'cache02')
+
+
+class TestTargetGroup(object):
+
+    def setup(self):
+        self.stats_queue = Queue.Queue()
+        self.threads = threading.enumerate()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def job(self, fail=False):
+        def method():
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            time.sleep(0.05)
+            with self.lock:
+                self.running -= 1
+            if fail:
+                raise ValueError('hoge')
+        return method
+
+    def group(self, methods, concurrency=4):
+        return targets.TargetGroup(
+            section='hoge',
+            methods=methods,
+            concurrency=concurrency,
+            logger=logging,
+            stats_queue=self.stats_queue
+        )
+
+    def test_bounded_concurrency(self):
+        group = self.group(
+            [(str(index), self.job()) for index in range(12)]
+        )
+        started = time.time()
+        group()
+        elapsed = time.time() - started
+
+        eq_(self.max_running, 4)
+        ok_(elapsed < 0.5, msg=elapsed)
+        ok_(self.stats_queue.empty())
+
+    def test_failure_is_isolated(self):
+        group = self.group([
+            ('a', self.job()),
+            ('b', self.job(fail=True)),
+            ('c', self.job()),
+        ])
+        group()
+        group()
+
+        eq_(group.status()['failing'], {'b': 2})
+        item = self.stats_queue.get()
+        eq_(item.data['key'], 'blackbird.job.target_failures[hoge]')
+        eq_(item.data['value'], 1)
+
+    def test_cpu_seconds(self):
+        def burn():
+            started = time.time()
+            while time.time() - started < 0.05:
+                pass
+
+        group = self.group(
+            [(str(index), burn) for index in range(4)], concurrency=1
+        )
+        group()
+        # measured in the pool threads, not in the calling thread.
+        ok_(group.cpu_seconds >= 0.1, msg=group.cpu_seconds)
+
+    @raises(BlackbirdError)
+    def test_all_targets_failed(self):
+        group = self.group([
+            ('a', self.job(fail=True)),
+            ('b', self.job(fail=True)),
+        ])
+        group()
+
+    def test_close(self):
+        group = self.group([(str(index), self.job()) for index in range(2)])
+        group()
+        workers = [
+            thread for thread in threading.enumerate()
+            if thread not in self.threads
+        ]
+        ok_(workers)
+
+        group.close()
+        eq_(group._pool, None)
+        ok_(not any([thread.is_alive() for thread in workers]))
+
+        # the pool is created again.
+        group()
+        group.close()
+
+
+class StubSemaphore(object):
+
+    def __init__(self, value):
+        self.value = value
+
+    def acquire(self):
+        self.value -= 1
+        return 'acquire'
+
+    def release(self):
+        self.value += 1
+
+
+class StubAsyncio(object):
+
+    def Semaphore(self, value):
+        self.semaphore = StubSemaphore(value)
+        return self.semaphore
+
+    def gather(self, *coroutines, **kwargs):
+        self.coroutines = coroutines
+        self.kwargs = kwargs
+        return 'gather'
+
+
+class TestTargetGroupGather(object):
+    """
+    TargetGroup._gather without the event loop.
+    """
+
+    def setup(self):
+        self.asyncio = eventloop.asyncio
+        eventloop.asyncio = StubAsyncio()
+        self.stats_queue = Queue.Queue()
+
+    def teardown(self):
+        eventloop.asyncio = self.asyncio
+
+    def group(self, targets_count):
+        return targets.TargetGroup(
+            section='hoge',
+            methods=[
+                (str(index), lambda: 'method')
+                for index in range(targets_count)
+            ],
+            concurrency=2,
+            logger=logging,
+            stats_queue=self.stats_queue,
+            coroutine=True
+        )
+
+    def test_limited_and_checked(self):
+        group = self.group(3)
+        gathered = group()
+        eq_(gathered.next(), 'gather')
+        stub = eventloop.asyncio
+        eq_(len(stub.coroutines), 3)
+        eq_(stub.kwargs, {'return_exceptions': True})
+
+        # each target holds the semaphore while it runs.
+        limited = stub.coroutines[0]
+        eq_(limited.next(), 'acquire')
+        eq_(limited.send(None), 'method')
+        eq_(stub.semaphore.value, 1)
+        try:
+            limited.send(None)
+        except StopIteration:
+            pass
+        eq_(stub.semaphore.value, 2)
+
+        try:
+            gathered.send([None, ValueError('hoge'), None])
+        except StopIteration:
+            pass
+        eq_(group.status()['failing'], {'1': 1})
+        eq_(self.stats_queue.get().data['value'], 1)
+
+    @raises(BlackbirdError)
+    def test_all_targets_failed(self):
+        gathered = self.group(2)()
+        gathered.next()
+        gathered.send([ValueError('hoge'), ValueError('fuga')])
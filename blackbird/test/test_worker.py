@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test utils/worker.py
+"""
+
+import logging
+import os
+import Queue
+import time
+from nose.tools import eq_, ok_, raises
+
+from blackbird.plugins import base
+from blackbird.utils import worker
+from blackbird.utils.error import JobTimeoutError
+
+
+class HogeItem(base.ItemBase):
+
+    def __init__(self, key, value, host):
+        super(HogeItem, self).__init__(key, value, host)
+        self._data = dict()
+        self._generate()
+
+    @property
+    def data(self):
+        return self._data
+
+
+class HogeJob(base.JobBase):
+
+    def __init__(self, options, queue=None, logger=None):
+        super(HogeJob, self).__init__(options, queue, logger)
+        self.runs = 0
+
+    def build_items(self):
+        self.runs += 1
+        for key in ('hoge.pid', 'hoge.runs'):
+            value = os.getpid() if key == 'hoge.pid' else self.runs
+            self.enqueue(HogeItem(key=key, value=value, host='hogehoge'))
+
+    def raise_error(self):
+        raise base.BlackbirdPluginError('hogehoge')
+
+    def exit(self):
+        os._exit(1)
+
+
+class TestProcessJob(object):
+
+    def __init__(self):
+        self.queue = None
+        self.stats_queue = None
+        self.job_obj = None
+        self.process_job = None
+
+    def setup(self):
+        self.queue = Queue.Queue()
+        self.stats_queue = Queue.Queue()
+        self.job_obj = HogeJob(options={}, queue=self.queue, logger=logging)
+
+    def teardown(self):
+        if self.process_job is not None:
+            self.process_job.stop()
+
+    def create(self, method):
+        self.process_job = worker.ProcessJob(
+            name='hogehoge-build_items',
+            section='hogehoge',
+            job_obj=self.job_obj,
+            method=method,
+            queue=self.queue,
+            stats_queue=self.stats_queue,
+            logger=logging
+        )
+        return self.process_job
+
+    def items(self):
+        items = dict()
+        while not self.queue.empty():
+            item = self.queue.get()
+            items[item.data['key']] = item.data['value']
+        return items
+
+    def test_items_in_batch(self):
+        process_job = self.create(self.job_obj.build_items)
+
+        process_job()
+        items = self.items()
+        ok_(items['hoge.pid'] != os.getpid(), msg=items)
+        eq_(items['hoge.runs'], 1)
+
+        process_job()
+        eq_(self.items()['hoge.runs'], 2)
+
+        # The job object in blackbird process is not run.
+        eq_(self.job_obj.runs, 0)
+
+    @raises(base.BlackbirdPluginError)
+    def test_plugin_error(self):
+        self.create(self.job_obj.raise_error)()
+
+    def test_restart_dead_worker(self):
+        process_job = self.create(self.job_obj.exit)
+        for _ in range(2):
+            try:
+                process_job()
+            except base.BlackbirdPluginError:
+                pass
+            else:
+                raise AssertionError('worker must die')
+
+        eq_(process_job.restarts, 1)
+        keys = [
+            self.stats_queue.get().data['key']
+            for _ in range(self.stats_queue.qsize())
+        ]
+        ok_('blackbird.job.worker_restarts[hogehoge]' in keys, msg=keys)
+
+    def test_timeout_kills_worker(self):
+        process_job = self.create(lambda: time.sleep(10))
+        process_job.timeout = 0.2
+
+        try:
+            process_job()
+        except JobTimeoutError:
+            pass
+        else:
+            raise AssertionError('JobTimeoutError must be raised')
+        ok_(not process_job.process.is_alive())
+
+        # replaced by a new worker at the next run.
+        process_job.method = self.job_obj.build_items
+        process_job.timeout = None
+        process_job()
+        eq_(process_job.restarts, 1)
+        eq_(self.items()['hoge.runs'], 1)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+u"""
+Test plugins/zabbix_sender.py
+"""
+
+import json
+import logging
+import Queue
+import socket
+from nose.tools import eq_, ok_
+
+from blackbird.plugins import base
+from blackbird.plugins import zabbix_sender
+
+RESPONSE = (
+    '{{"response":"success","info":"processed: {0}; failed: {1}; '
+    'total: {2}; seconds spent: 0.000040"}}'
+)
+
+
+class FakeConn(object):
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSender(zabbix_sender.ConcreteJob):
+    u"""
+    zabbix_sender which records sent batches instead of sending.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(FakeSender, self).__init__(*args, **kwargs)
+        self.down = False
+        self.sent = list()
+        self.bad_keys = set()
+        self.conns = list()
+
+    def connect(self, address, port):
+        if self.down:
+            return False
+        conn = FakeConn()
+        self.conns.append(conn)
+        return conn
+
+    def send(self, sock, items):
+        keys = [item.key for item in items]
+        self.sent.append(keys)
+        failed = len([key for key in keys if key in self.bad_keys])
+        response = RESPONSE.format(len(keys) - failed, failed, len(keys))
+        self.result = ('ZBXD', 1, len(response), response)
+
+
+class TestRetry(object):
+
+    def setup(self):
+        self.queue = Queue.Queue()
+        self.stats_queue = Queue.Queue()
+        self.sender = FakeSender(
+            options={
+                'server': '127.0.0.1',
+                'port': 10051,
+                'timeout': 1,
+                'hostname': 'hogehoge',
+                'retry_backoff': 0,
+                'retry_max_backoff': 0,
+                'max_staleness': 600,
+                'bisect_failures': False,
+                'reject_ttl': 3600,
+            },
+            queue=self.queue,
+            stats_queue=self.stats_queue,
+            logger=logging.getLogger('test_zabbix_sender')
+        )
+
+    def put(self, key):
+        self.queue.put(base.StatisticsItem(key=key, value=1))
+
+    def stats(self):
+        stats = dict()
+        while not self.stats_queue.empty():
+            item = self.stats_queue.get()
+            stats[item.key] = stats.get(item.key, 0) + item.value
+        return stats
+
+    def test_retry_without_duplicates(self):
+        self.sender.down = True
+        self.put('hoge')
+        self.sender.build_items()
+        eq_(len(self.sender.batches), 1)
+        eq_(self.sender.failures, 1)
+
+        self.put('fuga')
+        self.sender.down = False
+        self.sender.build_items()
+
+        # the newest batch first, and each item only once.
+        eq_(self.sender.sent, [['fuga'], ['hoge']])
+        eq_(len(self.sender.batches), 0)
+        eq_(self.sender.failures, 0)
+        ok_(all([conn.closed for conn in self.sender.conns]))
+
+    def test_backoff(self):
+        self.sender.options['retry_backoff'] = 60
+        self.sender.options['retry_max_backoff'] = 60
+        self.sender.down = True
+        self.put('hoge')
+        self.sender.build_items()
+
+        self.sender.down = False
+        self.put('fuga')
+        self.sender.build_items()
+        eq_(self.sender.sent, [])
+        eq_(len(self.sender.batches), 1)
+        # new items are left in the item queue while backing off.
+        eq_(self.queue.qsize(), 1)
+
+    def test_drop_stale_batch(self):
+        self.sender.down = True
+        self.put('hoge')
+        self.sender.build_items()
+        self.sender.batches[0].created -= 601
+
+        self.sender.down = False
+        self.sender.build_items()
+        eq_(self.sender.sent, [])
+        eq_(self.stats()['blackbird.zabbix_sender.dropped'], 1)
+
+    def test_pending_items_are_bounded(self):
+        self.sender.queue = self.queue = Queue.Queue(5)
+        self.sender.options['max_staleness'] = 0
+        self.sender.down = True
+        for _ in range(10):
+            for key in ('hoge', 'fuga', 'piyo'):
+                self.put(key)
+            self.sender.build_items()
+
+        pending = sum([len(batch.items) for batch in self.sender.batches])
+        ok_(pending <= 5, msg=pending)
+        eq_(self.stats()['blackbird.zabbix_sender.dropped'], 30 - pending)
+
+    def test_nothing_to_send(self):
+        self.sender.build_items()
+        eq_(self.sender.conns, [])
+
+    def test_send_error(self):
+        def send(sock, items):
+            raise socket.timeout('timed out')
+        self.sender.send = send
+
+        self.put('hoge')
+        self.sender.build_items()
+        eq_(len(self.sender.batches), 1)
+        eq_(self.sender.batches[0].attempts, 1)
+        ok_(self.sender.conns[0].closed)
+        ok_(self.queue.empty())
+
+
+class TestBisect(TestRetry):
+
+    def setup(self):
+        super(TestBisect, self).setup()
+        self.sender.options['bisect_failures'] = True
+        self.sender.bad_keys.add('hoge3')
+
+    def cycle(self):
+        # drop the statistics items of zabbix_sender itself.
+        while not self.queue.empty():
+            self.queue.get()
+        for index in range(8):
+            self.put('hoge{0}'.format(index))
+        self.sender.sent = list()
+        self.sender.build_items()
+        return self.sender.sent
+
+    def test_bisect(self):
+        eq_(len(self.cycle()), 1)
+        eq_(len(self.sender.suspects), 1)
+
+        # each cycle sends every item once, and halves the suspects.
+        for expected in ([4, 4], [2, 2, 4], [1, 1, 6]):
+            sent = self.cycle()
+            eq_([len(keys) for keys in sent], expected)
+            eq_(
+                sorted(sum(sent, [])),
+                ['hoge{0}'.format(index) for index in range(8)]
+            )
+
+        eq_(self.sender.rejected.keys(), [(None, 'hoge3')])
+        eq_(self.sender.suspects, [])
+
+        # rejected item is suppressed.
+        sent = self.cycle()
+        eq_(sent, [['hoge0', 'hoge1', 'hoge2', 'hoge4',
+                    'hoge5', 'hoge6', 'hoge7']])
+        eq_(self.stats()['blackbird.zabbix_sender.suppressed'], 1)
+
+    def test_probe_again(self):
+        self.sender.rejected[(None, 'hoge3')] = 0
+        sent = self.cycle()
+        eq_(len(sent[0]), 8)
+        eq_(self.sender.rejected, dict())
+
+
+class TestRequest(TestRetry):
+
+    def test_build_request(self):
+        items = [
+            base.StatisticsItem(key='hoge', value=1),
+            base.DataItem({'key': 'fuga', 'value': 2, 'clock': 946652400}),
+        ]
+        request = json.loads(self.sender.build_request(items))
+        eq_(request['request'], 'sender data')
+        eq_([entry['key'] for entry in request['data']], ['hoge', 'fuga'])
+        ok_('ns' in request['data'][0])
+        ok_('ns' not in request['data'][1])
+        ok_(request['clock'] >= items[0].clock)
+        ok_(0 <= request['ns'] < 1000000000)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Per job resource accounting.
+Executor measures CPU time of its own thread and
+(optionally) allocated memory around each job run.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    # tracemalloc is available since python 3.4.
+    tracemalloc = None
+
+
+# from <linux/time.h>
+CLOCK_THREAD_CPUTIME_ID = 3
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [
+        ('tv_sec', ctypes.c_long),
+        ('tv_nsec', ctypes.c_long),
+    ]
+
+
+def _thread_cpu_clock_factory():
+    """
+    Return the function which returns CPU time(sec) of the calling thread.
+    time.clock_gettime() is used if it exists(python 3.3+),
+    otherwise clock_gettime(3) is called by ctypes.
+    If neither is available, return None.
+    """
+    if hasattr(time, 'clock_gettime'):
+        clock_id = getattr(
+            time, 'CLOCK_THREAD_CPUTIME_ID', CLOCK_THREAD_CPUTIME_ID
+        )
+        return lambda: time.clock_gettime(clock_id)
+
+    # glibc < 2.17 has clock_gettime in librt.
+    for name in ('rt', 'c'):
+        library = ctypes.util.find_library(name)
+        if library is None:
+            continue
+        try:
+            clock_gettime = ctypes.CDLL(library, use_errno=True).clock_gettime
+            break
+        except (OSError, AttributeError):
+            continue
+    else:
+        return None
+
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_Timespec)]
+    clock_gettime.restype = ctypes.c_int
+
+    def thread_cpu_time():
+        timespec = _Timespec()
+        if clock_gettime(CLOCK_THREAD_CPUTIME_ID, ctypes.byref(timespec)):
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return timespec.tv_sec + timespec.tv_nsec * 1e-9
+
+    return thread_cpu_time
+
+
+thread_cpu_time = _thread_cpu_clock_factory()
+
+
+def start_tracing(logger):
+    """
+    Start tracemalloc for allocation accounting.
+    Return False if tracemalloc is not available in this python.
+    """
+    if tracemalloc is None:
+        logger.warn(
+            '"trace_allocations" requires tracemalloc (python 3.4+). '
+            'Allocation accounting is disabled.'
+        )
+        return False
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return True
+
+
+class JobAccounting(object):
+    """
+    Context manager which measures one job run.
+    Usage:
+        with JobAccounting(trace_allocations=True) as usage:
+            YOUR_JOB()
+
+        print usage.wall_seconds
+        print usage.cpu_seconds
+        print usage.allocated_bytes
+
+    "cpu_seconds" is CPU time consumed by the calling thread,
+    it is None if the platform doesn't have thread CPU clock.
+    "allocated_bytes" is the growth of memory traced by tracemalloc.
+    Because tracemalloc traces the whole process,
+    it includes allocations of other threads running at the same time.
+    It is None unless "trace_allocations" is True and tracing is started.
+    """
+
+    def __init__(self, trace_allocations=False):
+        self.trace_allocations = (
+            trace_allocations and
+            tracemalloc is not None and
+            tracemalloc.is_tracing()
+        )
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.allocated_bytes = None
+
+        self._wall_start = None
+        self._cpu_start = None
+        self._traced_start = None
+
+    def __enter__(self):
+        if self.trace_allocations:
+            self._traced_start = tracemalloc.get_traced_memory()[0]
+        if thread_cpu_time is not None:
+            self._cpu_start = thread_cpu_time()
+        self._wall_start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.wall_seconds = max(time.time() - self._wall_start, 0)
+        if self._cpu_start is not None:
+            self.cpu_seconds = max(thread_cpu_time() - self._cpu_start, 0)
+        if self._traced_start is not None:
+            self.allocated_bytes = max(
+                tracemalloc.get_traced_memory()[0] - self._traced_start, 0
+            )
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-aggregation of values.
+If you write "aggregate" option as following at each section in config file:
+    interval = 1
+    aggregate = linux.load*, *.latency
+    aggregate_window = 60
+    aggregate_functions = min, max, avg, last, p95
+
+the values of the items whose key matches one of the patterns
+are kept in a ring buffer instead of being enqueued,
+and their summaries are enqueued once per "aggregate_window" seconds
+as following keys:
+    linux.load.max[1min], hoge.latency.p95 ...
+
+The ring buffer holds "aggregate_size" values at most per (host, key).
+The summaries are calculated by NumPy if it is installed.
+The window is closed when a value arrives after the end of it,
+or by "flush" after each run of the job if the key stopped reporting.
+"""
+
+import array
+import math
+import re
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from blackbird.utils.deadband import translate
+from blackbird.utils.error import BlackbirdError
+
+PERCENTILE_PATTERN = re.compile(r'^p(\d{1,2}(?:\.\d+)?)$')
+
+
+class Ring(object):
+    """
+    Fixed size buffer of float values backed by array.array.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.buffer = array.array('d', [0.0]) * size
+        self.position = 0
+        self.count = 0
+        self.last = None
+
+    def append(self, value):
+        self.buffer[self.position] = value
+        self.position = (self.position + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        self.last = value
+
+    def values(self):
+        """
+        Return the filled part of the buffer(order is not kept).
+        """
+        if self.count == self.size:
+            return self.buffer
+        return self.buffer[:self.count]
+
+    def clear(self):
+        self.position = 0
+        self.count = 0
+        self.last = None
+
+
+def _rank_index(rank, length):
+    """
+    Index of the percentile in sorted values(nearest-rank method).
+    """
+    return max(int(math.ceil(rank / 100.0 * length)) - 1, 0)
+
+
+def _summarize(values, last, functions):
+    if numpy is not None:
+        values = numpy.frombuffer(values, dtype=numpy.float64)
+        reducers = {
+            'min': lambda: float(values.min()),
+            'max': lambda: float(values.max()),
+            'avg': lambda: float(values.mean()),
+        }
+
+        def percentile(rank):
+            index = _rank_index(rank, len(values))
+            return float(numpy.partition(values, index)[index])
+    else:
+        reducers = {
+            'min': lambda: min(values),
+            'max': lambda: max(values),
+            'avg': lambda: math.fsum(values) / len(values),
+        }
+        ordered = list()
+
+        def percentile(rank):
+            if not ordered:
+                ordered.extend(sorted(values))
+            return ordered[_rank_index(rank, len(ordered))]
+
+    reducers['last'] = lambda: last
+
+    results = list()
+    for function in functions:
+        if function in reducers:
+            results.append((function, reducers[function]()))
+        else:
+            rank = float(PERCENTILE_PATTERN.match(function).group(1))
+            results.append((function, percentile(rank)))
+    return results
+
+
+def summary_key(key, function):
+    """
+    "hoge.latency" -> "hoge.latency.max"
+    "linux.load[1min]" -> "linux.load.max[1min]"
+    """
+    name, bracket, parameters = key.partition('[')
+    return '{0}.{1}{2}{3}'.format(name, function, bracket, parameters)
+
+
+class Aggregator(object):
+    """
+    Keep values per (host, key) and summarize them every "window" seconds.
+    """
+
+    FUNCTIONS = ('min', 'max', 'avg', 'last')
+
+    def __init__(self, patterns, window=60, functions=FUNCTIONS, size=600):
+        self.regexes = [
+            re.compile(translate(pattern.strip()))
+            for pattern in patterns if pattern.strip()
+        ]
+        for function in functions:
+            if (function not in self.FUNCTIONS and
+                    not PERCENTILE_PATTERN.match(function)):
+                raise BlackbirdError(
+                    'unknown aggregate function "{0}"'.format(function)
+                )
+        self.window = float(window)
+        self.functions = functions
+        self.size = size
+
+        # (host, key) -> [Ring, end of the window, last clock] or None
+        self.windows = dict()
+        self.samples = 0
+        self.summaries = 0
+
+    def add(self, host, key, value, clock):
+        """
+        Add the value if the key is aggregated.
+        Return None if the key isn't aggregated,
+        or list of (key, value, clock) of the summaries of closed window.
+        """
+        pair = (host, key)
+        entry = self.windows.get(pair, False)
+        if entry is False:
+            entry = None
+            for regex in self.regexes:
+                if regex.match(key):
+                    entry = [Ring(self.size), None, None]
+                    break
+            self.windows[pair] = entry
+        if entry is None:
+            return None
+
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+
+        ring = entry[0]
+        now = time.time()
+        summaries = list()
+        if entry[1] is not None and now >= entry[1] and ring.count:
+            summaries = self.summarize(key, ring, entry[2])
+            ring.clear()
+        if ring.count == 0:
+            entry[1] = now + self.window
+
+        ring.append(value)
+        entry[2] = clock
+        self.samples += 1
+        return summaries
+
+    def flush(self, now=None):
+        """
+        Close the windows which have ended.
+        Return list of (host, key, value, clock) of their summaries.
+        """
+        if now is None:
+            now = time.time()
+        summaries = list()
+        for (host, key), entry in self.windows.items():
+            if not entry or not entry[0].count or now < entry[1]:
+                continue
+            for summary in self.summarize(key, entry[0], entry[2]):
+                summaries.append((host,) + summary)
+            entry[0].clear()
+            entry[1] = None
+        return summaries
+
+    def summarize(self, key, ring, clock):
+        results = _summarize(ring.values(), ring.last, self.functions)
+        self.summaries += 1
+        return [
+            (summary_key(key, function), value, clock)
+            for function, value in results
+        ]
+
+    def stats(self):
+        return {
+            'keys': len([entry for entry in self.windows.values() if entry]),
+            'samples': self.samples,
+            'summaries': self.summaries,
+            'numpy': numpy is not None,
+        }
@@ -50,8 +50,37 @@ def get_args():
                         dest='show_version'
                         )
 
+    parser.add_argument('--once',
+                        default=False,
+                        action='store_true',
+                        help=('Run each job once, print the items and '
+                              'timings, and exit (nothing is sent)'),
+                        dest='once'
+                        )
+
+    parser.add_argument('--bench',
+                        default=0,
+                        type=int,
+                        metavar='N',
+                        help=('Run each job N times, print mean/p99 '
+                              'runtime and items/s, and exit'),
+                        dest='bench'
+                        )
+
+    parser.add_argument('--section', '-s',
+                        action='append',
+                        metavar='SECTION',
+                        help=('Run only the jobs of this section '
+                              'with "--once" or "--bench" (repeatable)'),
+                        dest='sections'
+                        )
+
     args = parser.parse_args()
-    args.pid_file = is_pid(args.pid_file)
+    if args.bench < 0:
+        parser.error('--bench must be a positive number')
+    # "--once" and "--bench" don't create pid file.
+    if not (args.once or args.bench):
+        args.pid_file = is_pid(args.pid_file)
 
     return parser.parse_args()
 
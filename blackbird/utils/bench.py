@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+One-shot and bench run modes of blackbird.
+    blackbird --config CONFIG --once [--section SECTION ...]
+    blackbird --config CONFIG --bench 100 [--section SECTION ...]
+
+"--once" runs every job(or the jobs of given sections) exactly once,
+prints the produced items("HOST KEY CLOCK VALUE" separated by tab)
+and the timings of each job.
+"--bench N" runs each job N times back to back and prints
+mean/p99 runtime and items per second of each job.
+In both modes blackbird doesn't daemonize and nothing is sent,
+output plugins(e.g. zabbix_sender) are not loaded at all.
+"job_timeout" is not enforced, interrupt a hung job by Ctrl-C.
+"""
+
+import Queue
+import math
+import sys
+
+from blackbird.utils import accounting
+from blackbird.utils import eventloop
+from blackbird.utils import targets
+
+
+def percentile(samples, percent):
+    """
+    Return the "percent" percentile of the samples(nearest rank).
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = int(math.ceil(percent / 100.0 * len(ordered)))
+    return ordered[max(rank, 1) - 1]
+
+
+class JobBench(object):
+    """
+    Run the concrete jobs(see sr71.JobCreator.job_factory)
+    "runs" times and report the results to "output".
+    The items put by the jobs are taken from "queue" after each run,
+    and the statistics items in "stats_queue" are discarded.
+    """
+
+    def __init__(self, jobs, queue, logger, runs=1, show_items=False,
+                 output=sys.stdout, stats_queue=None):
+        self.jobs = jobs
+        self.queue = queue
+        self.stats_queue = stats_queue
+        self.logger = logger
+        self.runs = runs
+        self.show_items = show_items
+        self.output = output
+
+        self.results = dict()
+        self._loop = None
+
+    def run(self):
+        """
+        Run all the jobs and write the report.
+        Return the number of failed runs.
+        """
+        for name in sorted(self.jobs.keys()):
+            result = self.results.setdefault(name, {
+                'wall_seconds': list(),
+                'cpu_seconds': list(),
+                'items': 0,
+                'errors': 0,
+            })
+            try:
+                for _ in range(self.runs):
+                    usage, error = self._run(self.jobs[name])
+                    result['wall_seconds'].append(usage.wall_seconds)
+                    if usage.cpu_seconds is not None:
+                        result['cpu_seconds'].append(usage.cpu_seconds)
+                    if error is not None:
+                        result['errors'] += 1
+                        self.logger.error('%s: %s', name, error)
+                    result['items'] += self._drain()
+            finally:
+                method = self.jobs[name]['method']
+                if isinstance(method, targets.TargetGroup):
+                    method.close()
+
+        self.report()
+        return sum([result['errors'] for result in self.results.values()])
+
+    def _run(self, concrete_job):
+        """
+        Run the job once, return (JobAccounting, exception or None).
+        Coroutine jobs are run until complete on a private event loop.
+        """
+        usage = accounting.JobAccounting()
+        try:
+            with usage:
+                if concrete_job.get('coroutine'):
+                    self._event_loop().run_until_complete(
+                        concrete_job['method']()
+                    )
+                else:
+                    concrete_job['method']()
+        except Exception as error:
+            return self._target_usage(concrete_job, usage), error
+        return self._target_usage(concrete_job, usage), None
+
+    @staticmethod
+    def _target_usage(concrete_job, usage):
+        # the targets run in the threads of the pool, not in this one.
+        method = concrete_job['method']
+        if (isinstance(method, targets.TargetGroup) and
+                not concrete_job.get('coroutine')):
+            usage.cpu_seconds = method.cpu_seconds
+        return usage
+
+    def _event_loop(self):
+        if self._loop is None:
+            self._loop = eventloop.asyncio.new_event_loop()
+            eventloop.asyncio.set_event_loop(self._loop)
+        return self._loop
+
+    def _drain(self):
+        """
+        Take all the items from the queue and return the number of them.
+        """
+        # the queues are not bounded in these modes.
+        while self.stats_queue is not None:
+            try:
+                self.stats_queue.get(block=False)
+            except Queue.Empty:
+                break
+
+        count = 0
+        while True:
+            try:
+                item = self.queue.get(block=False)
+            except Queue.Empty:
+                break
+            data = item.data
+            if isinstance(data, dict):
+                data = [data]
+            count += len(data)
+            if self.show_items:
+                for entry in data:
+                    self._write(u'{0}\t{1}\t{2}\t{3}\n'.format(
+                        entry.get('host'), entry.get('key'),
+                        entry.get('clock'), entry.get('value')
+                    ))
+        return count
+
+    def report(self):
+        """
+        Write the timings of each job.
+        "items/s" is the number of items per second of runtime.
+        """
+        width = max([len(name) for name in self.results] + [3])
+        row = (
+            u'{0:<{width}} {1:>6} {2:>6} {3:>10} {4:>10} {5:>10} '
+            u'{6:>10} {7:>10}\n'
+        )
+        self._write(row.format(
+            'job', 'runs', 'errors', 'mean(s)', 'p99(s)', 'cpu(s)',
+            'items/run', 'items/s', width=width
+        ))
+        for name in sorted(self.results.keys()):
+            result = self.results[name]
+            runs = len(result['wall_seconds'])
+            total = sum(result['wall_seconds'])
+            cpu = (
+                '{0:.6f}'.format(
+                    sum(result['cpu_seconds']) / len(result['cpu_seconds'])
+                ) if result['cpu_seconds'] else '-'
+            )
+            self._write(row.format(
+                name, runs, result['errors'],
+                '{0:.6f}'.format(total / runs),
+                '{0:.6f}'.format(percentile(result['wall_seconds'], 99)),
+                cpu,
+                '{0:.1f}'.format(float(result['items']) / runs),
+                '{0:.1f}'.format(result['items'] / total) if total else '-',
+                width=width
+            ))
+
+    def _write(self, line):
+        if isinstance(line, unicode):
+            line = line.encode('utf-8')
+        self.output.write(line)
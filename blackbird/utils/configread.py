@@ -17,6 +17,75 @@ from blackbird.utils import base as base
 from blackbird.utils import helpers
 
 
+# Options that every section can have regardless of the plugin.
+# Plugin's "Validator.spec" takes priority over these.
+COMMON_SECTION_SPEC = (
+    "profile = boolean(default=False)",
+    "profile_runs = integer(min=1, default=100)",
+    "executor = option('thread', 'process', default='thread')",
+    "job_timeout = float(min=0, default=None)",
+    "max_backoff = float(min=0, default=600)",
+    "circuit_threshold = integer(min=0, default=5)",
+    "circuit_probe_interval = float(min=0, default=600)",
+    "deadband = force_list(default=list())",
+    "heartbeat = integer(min=1, default=10)",
+    "lld_refresh = integer(min=1, default=6)",
+    "output = boolean(default=None)",
+    "route_keys = force_list(default=list())",
+    "route_hosts = force_list(default=list())",
+    "aggregate = force_list(default=list())",
+    "aggregate_window = float(min=0, default=60)",
+    "aggregate_functions = "
+    "force_list(default=list('min', 'max', 'avg', 'last'))",
+    "aggregate_size = integer(min=1, default=600)",
+    "targets = force_list(default=list())",
+    "targets_file = string(default=None)",
+    "target_concurrency = integer(min=1, default=16)",
+    "target_hostname = string(default='{host}')",
+)
+
+
+class CachingValidator(validate.Validator):
+    """
+    validate.Validator which remembers the result of each check.
+    Thousands of sections which use the same plugin
+    check the same defaults and mostly the same values,
+    so each (check, value) pair is converted only once.
+    Failed checks and list values are not cached,
+    and cached lists are copied because sections may modify them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        validate.Validator.__init__(self, *args, **kwargs)
+        self._results = {}
+
+    def check(self, check, value, missing=False):
+        if not isinstance(value, (basestring, type(None))):
+            return validate.Validator.check(self, check, value, missing)
+
+        key = (check, value, missing)
+        try:
+            result = self._results[key]
+        except KeyError:
+            result = validate.Validator.check(self, check, value, missing)
+            self._results[key] = result
+        return _copy_value(result)
+
+    def get_default_value(self, check):
+        key = (check, None, 'default')
+        try:
+            result = self._results[key]
+        except KeyError:
+            result = validate.Validator.get_default_value(self, check)
+            self._results[key] = result
+        return _copy_value(result)
+
+
+def _copy_value(value):
+    if isinstance(value, list):
+        return list(value)
+    return value
+
 
 class JobObserver(base.Observer):
     """
@@ -61,6 +130,7 @@ class ConfigReader(base.Subject):
 
         # notify observers
         self._observers = []
+        self._modules = None
         self.register(observers)
         self._register_jobs()
 
@@ -281,9 +351,26 @@ class ConfigReader(base.Subject):
             "log_file = log(default=/var/log/blackbird/blackbird.log)",
             "log_level = log_level(default='info')",
             "log_format = log_format(default='ltsv')",
+            "log_buffer = integer(min=0, default=10000)",
+            "log_overflow = option('drop_new', 'drop_old', 'block', "
+            "default='drop_new')",
+            "log_rate = float(min=0, default=10)",
+            "log_burst = integer(min=1, default=20)",
+            "log_repeat_interval = integer(min=0, default=60)",
             "max_queue_length = integer(default=32767)",
+            "max_queue_bytes = integer(min=0, default=0)",
+            "spill_dir = dir(default=None)",
             "lld_interval = integer(default=600)",
-            "interval = integer(default=60)"
+            "interval = integer(default=60)",
+            "trace_allocations = boolean(default=False)",
+            "profile_dir = dir(default=None)",
+            "profile_keep = integer(min=1, default=10)",
+            "status_socket = string(default=None)",
+            "connection_pool_size = integer(min=1, default=4)",
+            "connection_idle_timeout = integer(min=0, default=60)",
+            "tcp_keepalive = boolean(default=True)",
+            "json_backend = option('auto', 'orjson', 'ujson', 'simplejson', "
+            "'json', default='auto')"
         )
 
         functions = {
@@ -323,8 +410,12 @@ class ConfigReader(base.Subject):
         collect all plugin modules under the self._module_dirs directories.
         Plugins that were collected by this method is used
         in ConfigReader._register_jobs() and ConfigReader._get_raw_specs().
+        The modules are collected only once.
         """
 
+        if self._modules is not None:
+            return self._modules
+
         not_import = set()
         not_import.add('base')
         modules = {}
@@ -345,6 +436,7 @@ class ConfigReader(base.Subject):
 
             sys.path.remove(path)
 
+        self._modules = modules
         return modules
 
     def _register_jobs(self):
@@ -394,6 +486,8 @@ class ConfigReader(base.Subject):
         }
 
         raw_specs is used by ConfigReader._create_specs().
+        "Validator.spec" is read once per module
+        however many sections use the module.
         """
 
         # spec_name is hard-corded
@@ -411,6 +505,9 @@ class ConfigReader(base.Subject):
             except KeyError:
                 raise ConfigMissingValue(section, 'module')
 
+            if name in raw_specs:
+                continue
+
             try:
                 spec = getattr(modules[name], spec_name)().spec
                 raw_specs[name] = spec
@@ -421,92 +518,69 @@ class ConfigReader(base.Subject):
 
     def _create_specs(self):
         """
-        Create configspec instances based "conf/defaults.cfg".
-        This function takes as arguments to the required section and module.
-        Take them out from self.config, _create_specs pass the _config_factory.
+        Create configspec of each plugin module used in "conf/defaults.cfg".
+        COMMON_SECTION_SPEC and the plugin's spec are parsed and merged
+        once per module, and the result is shared by all the sections
+        which use the module(configspec is not modified by validation).
+        So the cost doesn't grow with the number of sections.
+
+        This method returns a dictionary as following:
+        specs = {
+            'redis': <configspec section of [redis]>,
+            ...
+        }
         """
 
         raw_specs = self._get_raw_specs(self.config)
-        spec = self._configobj_factory(infile=None,
-                                       _inspec=True
-                                       )
-
-        for section, options in self.config.items():
-
-            if section == 'global':
-                continue
-
-            if 'module' in options:
-                module = options['module']
-            else:
-                raise ConfigMissingValue(section, 'module')
+        specs = {}
 
-            spec.merge(self._configspec_factory(section=section,
-                                                module=module,
-                                                infile=raw_specs[module]
-                                                )
+        for module, raw_spec in raw_specs.items():
+            spec = self._common_configspec_factory(section=module)
+            spec.merge(self._configobj_factory(infile=raw_spec,
+                                               _inspec=True
+                                               )
                        )
+            specs[module] = spec[module]
 
-        return spec
+        return specs
 
-    def _configspec_factory(self, section, module, infile):
+    def _common_configspec_factory(self, section):
         """
-        ConfigObj(_inspec=True) factory method.
-        ConfibObj instance that the "_inspec" argument is True
-        is called "configspec".
-
-        This method is called by ConfigReader._create_specs().
-        Beforehand, you need to define
-        type definitions and default values in "spec file" as follow:
-        [memcached]
-        module = string('memcached')
-        host = string(default='127.0.0.1')
-        port = integer(0, 65535, default=11211)
-
-        Notes: Must be the same all The following values.
-            "module" as the argument of _configspec_factory()
-            "module" in the spec file
-            section name in the spec file
-                (e.g: section name is [memcached] in the above case.)
-
-        This method load the modules under the directories
-        that is specified in config['global']['module_dir'] option,
-        and return converted "configspec" for conf/defaults.cfg.
-
-        Returned configspec is as follows:
-        [local_memcached]
-        module = string('memcached')
-        host = string(default='127.0.0.1')
-        port = integer(0, 65535, default=11211)
-
-        In short Rename section name in spec file
-        from [memcached] to specified [local_memcached] in conf/defaults.cfg.
+        Create configspec of COMMON_SECTION_SPEC for given section.
+        This configspec is merged before the plugin's one,
+        so that the plugin can override the common options.
         """
 
-        configspec = self._configobj_factory(
+        infile = ['[{0}]'.format(section)]
+        infile.extend(COMMON_SECTION_SPEC)
+
+        return self._configobj_factory(
             infile=infile,
             _inspec=True
         )
 
-        # Override the name of section in spec file
-        # by given module as argument.
-        configspec.rename(module, section)
-
-        return configspec
-
     def validate(self):
         """
         validate whether value in config file is correct.
         """
 
-        spec = self._create_specs()
+        specs = self._create_specs()
 
         # support in future
         functions = {}
 
-        validator = validate.Validator(functions=functions)
+        validator = CachingValidator(functions=functions)
+
+        # Each section refers to the configspec of its module,
+        # the top level configspec has no section.
+        self.config.configspec = self._configobj_factory(infile=None,
+                                                         _inspec=True
+                                                         )
+        for section, options in self.config.items():
+            if section == 'global':
+                continue
+            options.configspec = specs[options['module']]
 
-        self.config.configspec = spec
         result = self.config.validate(validator, preserve_errors=True)
 
         if self._parse_result(result):
@@ -521,6 +595,8 @@ class ConfigReader(base.Subject):
         """
         if result is not True:
             for section, errors in result.iteritems():
+                if errors is True:
+                    continue
                 for key, value in errors.iteritems():
                     if value is not True:
                         message = (
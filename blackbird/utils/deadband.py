@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Suppression of unchanged values.
+If you write "deadband" option as following at each section in config file:
+    deadband = blackbird.version, *.load[*]=0.05, *.memory.*=5%
+    heartbeat = 10
+
+the items whose key matches one of the patterns
+("*" matches any string and "?" matches any character)
+are not enqueued while the value stays within the deadband
+of the last enqueued value:
+    PATTERN       : the value is unchanged
+    PATTERN=0.05  : absolute difference is 0.05 or less
+    PATTERN=5%    : relative difference is 5% or less
+The value is enqueued at least once per "heartbeat" runs anyway,
+so that Zabbix doesn't regard the item as missing.
+"," separates the rules, use "?" in the pattern instead of it.
+"""
+
+import re
+
+from blackbird.utils.error import BlackbirdError
+
+RULE_PATTERN = re.compile(
+    r'^(?P<pattern>[^=]+)(?:=(?P<band>[0-9.]+)(?P<percent>%)?)?$'
+)
+
+_NO_RULE = object()
+
+
+def translate(pattern):
+    """
+    Translate the pattern to regular expression.
+    Unlike fnmatch, "[" and "]" match themselves
+    since they are common in the keys of Zabbix.
+    """
+    regex = list()
+    for char in pattern:
+        if char == '*':
+            regex.append('.*')
+        elif char == '?':
+            regex.append('.')
+        else:
+            regex.append(re.escape(char))
+    return ''.join(regex) + '$'
+
+
+class Rule(object):
+
+    def __init__(self, pattern, band=0.0, relative=False):
+        self.pattern = pattern
+        self.regex = re.compile(translate(pattern))
+        self.band = band
+        self.relative = relative
+
+    @classmethod
+    def parse(cls, entry):
+        matched = RULE_PATTERN.match(entry.strip())
+        try:
+            band = float(matched.group('band') or 0)
+        except (AttributeError, ValueError):
+            raise BlackbirdError('invalid deadband rule "{0}"'.format(entry))
+        if matched.group('percent'):
+            band /= 100
+        return cls(
+            matched.group('pattern'), band, bool(matched.group('percent'))
+        )
+
+    def within(self, last, value):
+        """
+        Return True if "value" is within the deadband of "last".
+        """
+        if last == value:
+            return True
+        if not self.band:
+            return False
+        try:
+            difference = abs(float(value) - float(last))
+            if self.relative:
+                return difference <= abs(float(last)) * self.band
+            return difference <= self.band
+        except (TypeError, ValueError):
+            return False
+
+
+class Deadband(object):
+    """
+    Decide whether the item is enqueued.
+    The last enqueued value and the number of suppressed runs
+    are kept per (host, key) as a tuple.
+    The rule of each key is looked up only once.
+    """
+
+    def __init__(self, rules, heartbeat=10):
+        self.rules = [Rule.parse(entry) for entry in rules if entry.strip()]
+        self.heartbeat = heartbeat
+
+        self.index = dict()
+        self.rule_cache = dict()
+        self.passed = 0
+        self.suppressed = 0
+
+    def rule(self, key):
+        rule = self.rule_cache.get(key, _NO_RULE)
+        if rule is _NO_RULE:
+            rule = None
+            for entry in self.rules:
+                if entry.regex.match(key):
+                    rule = entry
+                    break
+            self.rule_cache[key] = rule
+        return rule
+
+    def check(self, host, key, value):
+        """
+        Return False if the value should be suppressed.
+        The value isn't recorded, call "sent" after it is enqueued.
+        """
+        rule = self.rule(key)
+        if rule is None or isinstance(value, (list, tuple, dict)):
+            self.passed += 1
+            return True
+
+        pair = (host, key)
+        last = self.index.get(pair)
+        if (last is not None and last[1] + 1 < self.heartbeat and
+                rule.within(last[0], value)):
+            self.index[pair] = (last[0], last[1] + 1)
+            self.suppressed += 1
+            return False
+
+        self.passed += 1
+        return True
+
+    def sent(self, host, key, value):
+        """
+        Record the value as the last sent one of (host, key).
+        """
+        if self.rule(key) is None or isinstance(value, (list, tuple, dict)):
+            return
+        self.index[(host, key)] = (value, 0)
+
+    def stats(self):
+        return {
+            'keys': len(self.index),
+            'passed': self.passed,
+            'suppressed': self.suppressed,
+        }
@@ -11,3 +11,9 @@ class BlackbirdError(Exception):
 
     def __str__(self):
         return self.message.__str__()
+
+
+class JobTimeoutError(BlackbirdError):
+    """
+    Raise this error, when a job exceeds "job_timeout".
+    """
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Shared event loop for network-bound plugins.
+If "build_items" or "build_discovery_items" of ConcreteJob is a coroutine,
+the job doesn't get its own thread.
+All such jobs run on one event loop in "blackbird-event-loop" thread,
+and "job_timeout" option cancels the run which exceeds it.
+The coroutine puts items by "self.enqueue" like other plugins
+(it never blocks).
+
+asyncio is used if it is available, otherwise trollius(asyncio for
+python 2, "pip install trollius"). Coroutines are written as trollius:
+    import trollius
+    from trollius import From
+
+    class ConcreteJob(base.JobBase):
+
+        @trollius.coroutine
+        def build_items(self):
+            reader, writer = yield From(
+                trollius.open_connection(self.options['host'], 6379)
+            )
+            ...
+            self.enqueue(item=item)
+"""
+
+import threading
+
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError:
+        asyncio = None
+
+if asyncio is not None and hasattr(asyncio, 'From'):
+    From = asyncio.From
+else:
+    def From(obj):
+        return obj
+
+
+def iscoroutinefunction(method):
+    """
+    Return True if the method is a coroutine function.
+    Without asyncio(and trollius), nothing is a coroutine.
+    """
+    if asyncio is None:
+        return False
+    return asyncio.iscoroutinefunction(method)
+
+
+class EventLoopThread(threading.Thread):
+    """
+    Thread which runs the shared event loop forever.
+    Other threads schedule the coroutines by "spawn".
+    """
+
+    def __init__(self, logger, name='blackbird-event-loop'):
+        threading.Thread.__init__(self, name=name)
+        self.setDaemon(True)
+        self.logger = logger
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_exception_handler(self._handle_exception)
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def spawn(self, coroutine, callback=None):
+        """
+        Start a task of the coroutine in the loop (thread safe).
+        "callback" is called with the task in the loop thread.
+        """
+        def create():
+            task = asyncio.ensure_future(coroutine, loop=self.loop)
+            if callback is not None:
+                callback(task)
+
+        self.loop.call_soon_threadsafe(create)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def _handle_exception(self, loop, context):
+        self.logger.error(
+            'event loop: %s', context.get('exception', context['message'])
+        )
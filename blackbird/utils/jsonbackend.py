@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Pluggable JSON encoder.
+The fastest available library is selected at runtime
+in order of BACKENDS, and the standard json module is the fallback.
+You can also select the backend by "json_backend" option in global section.
+
+dumps() always returns compact JSON as UTF-8 encoded bytes
+(non-ASCII characters are not escaped),
+so that the results can be concatenated into one request as is.
+"""
+
+import json
+
+from blackbird.utils.error import BlackbirdError
+
+
+def _orjson_dumps_factory():
+    import orjson
+    return orjson.dumps
+
+
+def _ujson_dumps_factory():
+    import ujson
+
+    def dumps(obj):
+        return _encode(ujson.dumps(obj, ensure_ascii=False))
+    return dumps
+
+
+def _simplejson_dumps_factory():
+    import simplejson
+    encoder = simplejson.JSONEncoder(
+        ensure_ascii=False, separators=(',', ':')
+    )
+
+    def dumps(obj):
+        return _encode(encoder.encode(obj))
+    return dumps
+
+
+def _json_dumps_factory():
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(obj):
+        return _encode(encoder.encode(obj))
+    return dumps
+
+
+def _encode(result):
+    if isinstance(result, unicode):
+        return result.encode('utf-8')
+    return result
+
+
+# The order of preference.
+BACKENDS = (
+    ('orjson', _orjson_dumps_factory),
+    ('ujson', _ujson_dumps_factory),
+    ('simplejson', _simplejson_dumps_factory),
+    ('json', _json_dumps_factory),
+)
+
+name = None
+dumps = None
+
+
+def use(backend='auto'):
+    """
+    Select the backend. 'auto' selects the first importable one.
+    Return the name of selected backend.
+    """
+    global name, dumps
+
+    for backend_name, factory in BACKENDS:
+        if backend not in ('auto', backend_name):
+            continue
+        try:
+            dumps = factory()
+        except ImportError:
+            if backend == backend_name:
+                raise BlackbirdError(
+                    'json_backend "{0}" is not installed.'.format(backend)
+                )
+            continue
+        name = backend_name
+        return name
+
+    raise BlackbirdError('Unknown json_backend "{0}".'.format(backend))
+
+
+use()
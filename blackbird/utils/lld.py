@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Change detection of low level discovery.
+Discovered entities rarely change, but sending the same LLD value
+makes Zabbix server reprocess all the entities.
+JobBase.enqueue doesn't put DiscoveryItem
+whose entities are same as the last one put,
+except once per "lld_refresh" runs.
+Option at each section in config file:
+    # 1 means that LLD items are always put.
+    lld_refresh = 6
+"""
+
+import hashlib
+import json
+
+
+def digest(value):
+    """
+    Canonical hash of LLD entities.
+    The order of entities and the order of macros don't matter.
+    """
+    entries = sorted([
+        json.dumps(entry, sort_keys=True, separators=(',', ':'))
+        for entry in value
+    ])
+    return hashlib.sha1('\n'.join(entries).encode('utf-8')).hexdigest()
+
+
+class DiscoveryCache(object):
+    """
+    Keep (digest, skipped runs) of the last LLD value per (host, key).
+    """
+
+    def __init__(self, refresh=6):
+        self.refresh = refresh
+        self.index = dict()
+        self.skipped = 0
+
+    def check(self, host, key, value):
+        """
+        Return False if the value is same as the last one
+        and it is not the time to refresh.
+        The value isn't recorded, call "sent" after it is enqueued.
+        """
+        if self.refresh <= 1:
+            return True
+
+        pair = (host, key)
+        last = self.index.get(pair)
+        if (last is not None and last[1] + 1 < self.refresh and
+                last[0] == digest(value)):
+            self.index[pair] = (last[0], last[1] + 1)
+            self.skipped += 1
+            return False
+
+        return True
+
+    def sent(self, host, key, value):
+        """
+        Record the value as the last sent one of (host, key).
+        """
+        if self.refresh <= 1:
+            return
+        self.index[(host, key)] = (digest(value), 0)
@@ -1,14 +1,325 @@
 # -*- coding: utf-8 -*-
 
+import collections
 import logging
 import logging.handlers
+import os
 import sys
 import platform
+import threading
+import time
 
 import blackbird.utils.error
 
 
-def logger_factory(filename, level, fmt='ltsv'):
+class AsyncHandler(logging.Handler):
+    """
+    Handler which passes records to "target" handler in a writer thread,
+    so that threads of jobs don't wait for slow disk or syslog.
+    The message is formatted in the writer thread, too.
+
+    At most "capacity" records are buffered.
+    When the buffer is full, "overflow" decides what to do:
+        drop_new: discard the new record (default)
+        drop_old: discard the oldest record in the buffer
+        block:    wait until the writer makes room
+    The number of discarded records is logged when it happens.
+
+    The writer thread is started at the first record of each process,
+    so the handler works after daemonizing(fork) too.
+    """
+
+    OVERFLOWS = ('drop_new', 'drop_old', 'block')
+
+    def __init__(self, target, capacity=10000, overflow='drop_new'):
+        logging.Handler.__init__(self)
+        if overflow not in self.OVERFLOWS:
+            raise blackbird.utils.error.BlackbirdError(
+                'Unknown log overflow policy "{0}".'.format(overflow)
+            )
+        self.target = target
+        self.capacity = capacity
+        self.overflow = overflow
+        self.dropped = 0
+
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._buffer = collections.deque()
+        self._condition = threading.Condition(threading.Lock())
+        self._writer = None
+        self._closed = False
+
+    def _start(self):
+        self._reset()
+        self._pid = os.getpid()
+        self._writer = threading.Thread(
+            name='blackbird-log-writer', target=self._write
+        )
+        self._writer.daemon = True
+        self._writer.start()
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+
+        # traceback objects must not wait in the buffer.
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+
+        with self._condition:
+            while len(self._buffer) >= self.capacity:
+                if self.overflow == 'block' and not self._closed:
+                    self._condition.wait(1)
+                    continue
+                if self.overflow == 'drop_new':
+                    self.dropped += 1
+                    return
+                self._buffer.popleft()
+                self.dropped += 1
+            self._buffer.append(record)
+            self._condition.notify_all()
+
+    def _write(self):
+        dropped = 0
+        while True:
+            with self._condition:
+                while not self._buffer and not self._closed:
+                    self._condition.wait()
+                if not self._buffer:
+                    return
+                records = list(self._buffer)
+                self._buffer.clear()
+                self._condition.notify_all()
+                current_dropped = self.dropped
+
+            if current_dropped != dropped:
+                self.target.handle(logging.makeLogRecord({
+                    'name': 'blackbird',
+                    'levelno': logging.WARNING,
+                    'levelname': 'WARNING',
+                    'msg': '%d log records were dropped (buffer is full).',
+                    'args': (current_dropped - dropped,),
+                }))
+                dropped = current_dropped
+
+            for record in records:
+                try:
+                    self.target.handle(record)
+                except Exception:
+                    self.target.handleError(record)
+
+    def flush(self):
+        """
+        Wait until the buffered records are written.
+        """
+        if self._writer is None or self._pid != os.getpid():
+            return
+        with self._condition:
+            while self._buffer and self._writer.is_alive():
+                self._condition.wait(0.1)
+        self.target.flush()
+
+    def close(self):
+        if self._writer is not None and self._pid == os.getpid():
+            with self._condition:
+                self._closed = True
+                self._condition.notify_all()
+            self._writer.join(5)
+        self.target.close()
+        logging.Handler.close(self)
+
+
+class StormFilter(logging.Filter):
+    """
+    Filter which suppresses log storms
+    (e.g: "Blackbird item Queue is Full!!!" for every item).
+
+    Records are grouped by their template(level and unformatted message).
+    1. Same message(same template and arguments) within "repeat_interval"
+       seconds from the last written one is collapsed,
+       and "... repeated N times" is written instead.
+    2. Each template has a token bucket of "rate" records per second
+       and "burst" records at once. Records over it are suppressed,
+       and the number is written with the summary.
+    The summary is written when the template is written again,
+    or by "flush()" after "repeat_interval" seconds.
+    Records are never formatted here.
+    """
+
+    def __init__(self, logger, rate=10.0, burst=20, repeat_interval=60,
+                 max_templates=1000):
+        logging.Filter.__init__(self)
+        self.logger = logger
+        self.rate = rate
+        self.burst = burst
+        self.repeat_interval = repeat_interval
+        self.max_templates = max_templates
+
+        self.templates = dict()
+        self.repeated = 0
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if getattr(record, 'storm_summary', False):
+            return True
+
+        now = time.time()
+        summaries = list()
+        with self._lock:
+            template = record.msg
+            if not isinstance(template, basestring):
+                # e.g: logger.error(exception)
+                template = str(template)
+            state = self.templates.get((record.levelno, template))
+            if state is None:
+                if len(self.templates) >= self.max_templates:
+                    summaries.extend(self._purge(now))
+                if len(self.templates) >= self.max_templates:
+                    return True
+                state = _TemplateState(self.burst, now)
+                self.templates[(record.levelno, template)] = state
+
+            passed = self._check(state, record, now)
+            if passed and (state.repeated or state.suppressed):
+                summaries.append(state.summary())
+            if passed:
+                state.last = record
+                state.written = now
+
+        self._write(summaries)
+        return passed
+
+    def _check(self, state, record, now):
+        if (self.repeat_interval and state.last is not None and
+                now - state.written < self.repeat_interval and
+                _same_args(state.last.args, record.args)):
+            state.repeated += 1
+            self.repeated += 1
+            return False
+
+        if self.rate:
+            state.tokens = min(
+                self.burst, state.tokens + (now - state.refilled) * self.rate
+            )
+            state.refilled = now
+            if state.tokens < 1:
+                state.suppressed += 1
+                self.suppressed += 1
+                return False
+            state.tokens -= 1
+        return True
+
+    def _purge(self, now):
+        """
+        Forget the templates not written for "repeat_interval" seconds.
+        """
+        summaries = list()
+        for key, state in self.templates.items():
+            if now - state.written >= self.repeat_interval:
+                if state.repeated or state.suppressed:
+                    summaries.append(state.summary())
+                del self.templates[key]
+        return summaries
+
+    def flush(self):
+        """
+        Write the summaries of the templates
+        which have not been written for "repeat_interval" seconds.
+        """
+        now = time.time()
+        summaries = list()
+        with self._lock:
+            for state in self.templates.values():
+                if ((state.repeated or state.suppressed) and
+                        now - state.written >= self.repeat_interval):
+                    summaries.append(state.summary())
+                    state.written = now
+        self._write(summaries)
+
+    def _write(self, summaries):
+        for summary in summaries:
+            self.logger.callHandlers(summary)
+
+    def stats(self):
+        return {
+            'blackbird.log.repeated': self.repeated,
+            'blackbird.log.suppressed': self.suppressed,
+        }
+
+
+class _TemplateState(object):
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.refilled = now
+        self.last = None
+        self.written = now
+        self.repeated = 0
+        self.suppressed = 0
+
+    def summary(self):
+        """
+        Return the record of the summary and reset the counters.
+        """
+        last = self.last
+        if self.repeated and self.suppressed:
+            message = (
+                '"%s" repeated %d times, %d similar messages suppressed'
+            )
+            args = (last.getMessage(), self.repeated, self.suppressed)
+        elif self.repeated:
+            message = '"%s" repeated %d times'
+            args = (last.getMessage(), self.repeated)
+        else:
+            message = '%d messages similar to "%s" suppressed'
+            args = (self.suppressed, last.getMessage())
+        self.repeated = 0
+        self.suppressed = 0
+
+        summary = logging.makeLogRecord({
+            'name': last.name,
+            'levelno': last.levelno,
+            'levelname': last.levelname,
+            'threadName': last.threadName,
+            'msg': message,
+            'args': args,
+        })
+        summary.storm_summary = True
+        return summary
+
+
+def _same_args(first, second):
+    try:
+        return bool(first == second)
+    except Exception:
+        return False
+
+
+def storm_filter(logger):
+    """
+    Return StormFilter of the logger, or None.
+    """
+    for entry in getattr(logger, 'filters', ()):
+        if isinstance(entry, StormFilter):
+            return entry
+    return None
+
+
+def logger_factory(filename, level, fmt='ltsv', buffer_size=0,
+                   overflow='drop_new', rate=0, burst=20, repeat_interval=0):
+    """
+    Create "blackbird" logger.
+    If "buffer_size" is more than 0,
+    records are written in a background thread(see AsyncHandler).
+    If "rate" or "repeat_interval" is more than 0,
+    log storms are suppressed(see StormFilter).
+    """
 
     logger = logging.getLogger('blackbird')
 
@@ -21,7 +332,7 @@ def logger_factory(filename, level, fmt='ltsv'):
     }
     logger.setLevel(levels.get(level))
 
-    if filename == sys.stdout:
+    if filename in (sys.stdout, sys.stderr):
         handler = logging.StreamHandler(filename)
     elif filename.lower() == 'syslog':
         if platform.system() == 'Darwin':
@@ -61,8 +372,15 @@ def logger_factory(filename, level, fmt='ltsv'):
     formatter = logging.Formatter(fmt=format, datefmt=datefmt)
     handler.setFormatter(formatter)
 
+    if buffer_size:
+        # logging.shutdown() flushes and closes it at exit.
+        handler = AsyncHandler(handler, buffer_size, overflow)
+
     logger.addHandler(handler)
 
+    if rate or repeat_interval:
+        logger.addFilter(StormFilter(logger, rate, burst, repeat_interval))
+
     return logger
 
 
@@ -84,8 +402,12 @@ def get_handler_fp(logger):
             'Given logger has invalid handlers.'
         )
 
-    if hasattr(logger.handlers[0], 'stream'):
-        return logger.handlers[0].stream
+    handler = logger.handlers[0]
+    if isinstance(handler, AsyncHandler):
+        handler = handler.target
+
+    if hasattr(handler, 'stream'):
+        return handler.stream
 
     # case of setting SysLogHandler to logger.handlers[0]
-    return logger.handlers[0]
+    return handler
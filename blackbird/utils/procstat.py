@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Resource usage of blackbird process itself.
+/proc/self/stat and /proc/self/status are opened once
+and re-read at every "read()" (seek to the head).
+They are opened at the first "read()",
+because the files opened before daemonizing are closed.
+"""
+
+import gc
+import os
+import time
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+class GCTimer(object):
+    """
+    Cumulative time of garbage collection.
+    It needs gc.callbacks (python 3.3+), otherwise "seconds" stays None.
+    """
+
+    def __init__(self):
+        self.seconds = None
+        self._started = None
+        if hasattr(gc, 'callbacks'):
+            self.seconds = 0.0
+            gc.callbacks.append(self._callback)
+
+    def _callback(self, phase, info):
+        if phase == 'start':
+            self._started = time.time()
+        elif self._started is not None:
+            self.seconds += time.time() - self._started
+            self._started = None
+
+
+class ProcessStat(object):
+    """
+    Read resource usage of own process.
+    Usage:
+        stat = ProcessStat()
+        stat.read()
+        {'blackbird.process.rss': 12345678, ...}
+    """
+
+    def __init__(self, proc_dir='/proc/self'):
+        self.proc_dir = proc_dir
+        self._stat = None
+        self._status = None
+        self._last = None
+        self._gc_timer = GCTimer()
+
+    def _reread(self, name):
+        fileobj = getattr(self, '_' + name)
+        if fileobj is None:
+            fileobj = open(os.path.join(self.proc_dir, name), 'r')
+            setattr(self, '_' + name, fileobj)
+        fileobj.seek(0)
+        return fileobj.read()
+
+    def read(self):
+        """
+        Return the dictionary of "blackbird.process.*" keys.
+        CPU usage is percentage of one CPU since the last read,
+        it is not included at the first read.
+        """
+        result = dict()
+
+        # "comm" field may include spaces, so split after it.
+        fields = self._reread('stat').rsplit(')', 1)[1].split()
+        cpu = (
+            int(fields[11]) / float(CLOCK_TICKS),
+            int(fields[12]) / float(CLOCK_TICKS),
+        )
+        now = time.time()
+        if self._last is not None and now > self._last[0]:
+            elapsed = now - self._last[0]
+            result['blackbird.process.cpu.user'] = (
+                (cpu[0] - self._last[1][0]) / elapsed * 100
+            )
+            result['blackbird.process.cpu.system'] = (
+                (cpu[1] - self._last[1][1]) / elapsed * 100
+            )
+        self._last = (now, cpu)
+
+        for line in self._reread('status').splitlines():
+            name, _, value = line.partition(':')
+            if name == 'VmRSS':
+                result['blackbird.process.rss'] = int(value.split()[0]) * 1024
+            elif name == 'VmHWM':
+                result['blackbird.process.rss_peak'] = (
+                    int(value.split()[0]) * 1024
+                )
+            elif name == 'Threads':
+                result['blackbird.process.threads'] = int(value)
+
+        result['blackbird.process.fds'] = len(
+            os.listdir(os.path.join(self.proc_dir, 'fd'))
+        )
+
+        # objects tracked since the last collection of each generation.
+        for generation, count in enumerate(gc.get_count()):
+            result['blackbird.process.gc.gen{0}'.format(generation)] = count
+        # number of collections (python 3.4+).
+        if hasattr(gc, 'get_stats'):
+            for generation, stats in enumerate(gc.get_stats()):
+                key = 'blackbird.process.gc.collections.gen{0}'.format(
+                    generation
+                )
+                result[key] = stats['collections']
+        if self._gc_timer.seconds is not None:
+            result['blackbird.process.gc.seconds'] = self._gc_timer.seconds
+
+        return result
+
+    def close(self):
+        for name in ('_stat', '_status'):
+            fileobj = getattr(self, name)
+            if fileobj is not None:
+                fileobj.close()
+                setattr(self, name, None)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Opt-in profiler of each job.
+If you write "profile" option as following at each section in config file:
+    [redis]
+    module = redis
+    profile = True
+    profile_runs = 100
+
+    [global]
+    profile_dir = /var/tmp/blackbird
+
+"build_items" and "build_discovery_items" of the section are run in cProfile,
+and the stats of 100 runs are dumped to
+"/var/tmp/blackbird/redis-build_items.YYYYmmddHHMMSS.pstats".
+You can read the dumped file by "python -m pstats FILE".
+"""
+
+import cProfile
+import os
+import time
+
+
+class JobProfiler(object):
+    """
+    Callable wrapper which runs the job method in cProfile.
+    The stats of "runs" runs are accumulated and dumped into one file.
+    Only the newest "keep" files are kept per job to bound disk usage.
+    """
+
+    suffix = '.pstats'
+
+    def __init__(self, name, method, profile_dir, logger, runs=100, keep=10):
+        self.name = name.replace(os.sep, '_')
+        self.method = method
+        self.profile_dir = profile_dir
+        self.logger = logger
+        self.runs = runs
+        self.keep = keep
+
+        self.count = 0
+        self.profile = cProfile.Profile()
+
+    def __call__(self):
+        try:
+            return self.profile.runcall(self.method)
+        finally:
+            self.count += 1
+            if self.count >= self.runs:
+                self.dump()
+
+    def dump(self):
+        """
+        Dump accumulated stats to profile_dir and start a new profile.
+        """
+        path = os.path.join(
+            self.profile_dir,
+            '{0}.{1}{2}'.format(
+                self.name, time.strftime('%Y%m%d%H%M%S'), self.suffix
+            )
+        )
+
+        try:
+            self.profile.dump_stats(path)
+        except (IOError, OSError) as error:
+            self.logger.error(
+                'Failed to dump profile of {0}: {1}'.format(self.name, error)
+            )
+        else:
+            self.logger.info(
+                'Dumped profile of {0} runs to {1}'.format(self.count, path)
+            )
+            self.rotate()
+
+        self.count = 0
+        self.profile = cProfile.Profile()
+
+    def rotate(self):
+        """
+        Remove old dumped files except the newest "keep" files.
+        """
+        prefix = self.name + '.'
+        dumped = [
+            os.path.join(self.profile_dir, entry)
+            for entry in os.listdir(self.profile_dir)
+            if entry.startswith(prefix) and entry.endswith(self.suffix)
+        ]
+        dumped.sort(key=lambda path: (os.path.getmtime(path), path))
+
+        for path in dumped[:-self.keep]:
+            try:
+                os.remove(path)
+            except OSError as error:
+                self.logger.warn(
+                    'Failed to remove old profile {0}: {1}'
+                    ''.format(path, error)
+                )
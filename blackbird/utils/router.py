@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Fan-out of items to output plugins.
+Each section of output plugin(e.g: zabbix_sender) has its own bounded queue,
+and every item which is put to Router is delivered to all the queues
+whose routing rules match it.
+The item object itself is shared by the outputs,
+so it is serialized only once (see plugins.base.ItemBase.wire).
+A slow output fills only its own queue.
+
+Sections of the plugins whose ConcreteJob has "is_output = True"
+or which have "output = True" option are outputs.
+Options at the section of output plugin:
+    # patterns of key and host(only "*" and "?" are special).
+    # empty means all.
+    route_keys = linux.*, blackbird.*
+    route_hosts = web??.example.com
+"""
+
+import Queue
+import re
+
+from blackbird.utils.deadband import translate
+
+
+class Output(object):
+    """
+    Bounded queue of an output section and its routing rules.
+    """
+
+    def __init__(self, section, queue, keys=(), hosts=()):
+        self.section = section
+        self.queue = queue
+        self.keys = [re.compile(translate(pattern)) for pattern in keys]
+        self.hosts = [re.compile(translate(pattern)) for pattern in hosts]
+
+        self.delivered = 0
+        self.dropped = 0
+
+    def match(self, item):
+        if self.keys and not _match(self.keys, item.key):
+            return False
+        if self.hosts and not _match(self.hosts, item.host):
+            return False
+        return True
+
+    def status(self):
+        if hasattr(self.queue, 'status'):
+            status = self.queue.status()
+        else:
+            status = {
+                'length': self.queue.qsize(),
+                'max_length': self.queue.maxsize,
+            }
+        status.update({
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+        })
+        return status
+
+
+def _match(regexes, value):
+    if value is None:
+        return False
+    for regex in regexes:
+        if regex.match(value):
+            return True
+    return False
+
+
+class OutputQueue(object):
+    """
+    Queue which is set to ConcreteJob of output plugin.
+    "get" takes the items delivered to this output,
+    and "put" is routed to all the outputs like other plugins.
+    """
+
+    def __init__(self, router, output):
+        self.router = router
+        self.output = output
+        self.maxsize = output.queue.maxsize
+
+    def put(self, item, block=True, timeout=None):
+        self.router.put(item, block, timeout)
+
+    def put_nowait(self, item):
+        self.router.put(item, block=False)
+
+    def get(self, block=True, timeout=None):
+        return self.output.queue.get(block, timeout)
+
+    def get_nowait(self):
+        return self.output.queue.get_nowait()
+
+    def empty(self):
+        return self.output.queue.empty()
+
+    def qsize(self):
+        return self.output.queue.qsize()
+
+
+class Router(object):
+    """
+    Queue-like object which is set to ConcreteJob instead of Queue.
+    """
+
+    def __init__(self, maxsize=0, queue_factory=None):
+        self.maxsize = maxsize
+        self.queue_factory = queue_factory
+        self.outputs = list()
+
+    def add_output(self, section, keys=(), hosts=()):
+        """
+        Add an output and return OutputQueue for it.
+        The queue of the output is created by "queue_factory(section)",
+        or it is Queue.Queue of "maxsize".
+        """
+        if self.queue_factory is not None:
+            queue = self.queue_factory(section)
+        else:
+            queue = Queue.Queue(self.maxsize)
+        output = Output(section, queue, keys, hosts)
+        self.outputs.append(output)
+        return OutputQueue(self, output)
+
+    def put(self, item, block=True, timeout=None):
+        """
+        Deliver the item to the matched outputs without blocking.
+        Queue.Full is raised only when no output has accepted the item.
+        "block" and "timeout" are accepted for compatibility with Queue.
+        """
+        matched = 0
+        delivered = 0
+        for output in self.outputs:
+            if not output.match(item):
+                continue
+            matched += 1
+            try:
+                output.queue.put(item, block=False)
+                output.delivered += 1
+                delivered += 1
+            except Queue.Full:
+                output.dropped += 1
+
+        if matched and not delivered:
+            raise Queue.Full
+
+    def put_nowait(self, item):
+        self.put(item, block=False)
+
+    def qsize(self):
+        """
+        Length of the longest queue of the outputs.
+        """
+        if not self.outputs:
+            return 0
+        return max([output.queue.qsize() for output in self.outputs])
+
+    def empty(self):
+        return self.qsize() == 0
+
+    @property
+    def bytes(self):
+        """
+        Total size of the items in memory,
+        or None unless the queues count it (see utils/spillqueue.py).
+        """
+        sizes = [
+            output.queue.bytes for output in self.outputs
+            if hasattr(output.queue, 'bytes')
+        ]
+        if not sizes:
+            return None
+        return sum(sizes)
+
+    def status(self):
+        return dict([
+            (output.section, output.status()) for output in self.outputs
+        ])
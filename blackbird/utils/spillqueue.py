@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Item queue with memory budget.
+If you write "max_queue_bytes" option in global section,
+the item queue counts the size of items(serialized size, see
+plugins.base.ItemBase.wire) in addition to the number of items.
+When the size exceeds "max_queue_bytes",
+the oldest items are moved to a file in "spill_dir"
+and they are read back in order transparently.
+Without "spill_dir", new items are rejected instead (Queue.Full).
+"""
+
+import collections
+import json
+import Queue
+
+from blackbird.plugins.base import DataItem
+
+
+class SpillQueue(Queue.Queue):
+    """
+    Queue.Queue whose memory usage is bounded by "max_bytes".
+    Items on the file are older than the items in memory.
+    """
+
+    def __init__(self, maxsize=0, max_bytes=0, spill_path=None):
+        self.max_bytes = max_bytes
+        self.spill_path = spill_path
+        Queue.Queue.__init__(self, maxsize)
+
+    # Following methods are called with the mutex of Queue held.
+
+    def _init(self, maxsize):
+        self.queue = collections.deque()
+        self.bytes = 0
+        self.spill = None
+        self.spilled = 0
+        self.spilled_total = 0
+        self.read_offset = 0
+
+    def _qsize(self, len=len):
+        return len(self.queue) + self.spilled
+
+    def _put(self, item):
+        size = len(item.wire)
+        self.queue.append((item, size))
+        self.bytes += size
+
+        if not self.max_bytes:
+            return
+        while self.bytes > self.max_bytes and len(self.queue) > 1:
+            if self.spill_path is None:
+                self.queue.pop()
+                self.bytes -= size
+                raise Queue.Full
+            self._spill()
+
+    def _get(self):
+        if self.spilled:
+            return self._unspill()
+        item, size = self.queue.popleft()
+        self.bytes -= size
+        return item
+
+    def _spill(self):
+        item, size = self.queue.popleft()
+        self.bytes -= size
+
+        if self.spill is None:
+            self.spill = open(self.spill_path, 'w+b')
+        self.spill.seek(0, 2)
+        self.spill.write(json.dumps(item.data) + '\n')
+        self.spilled += 1
+        self.spilled_total += 1
+
+    def _unspill(self):
+        self.spill.seek(self.read_offset)
+        line = self.spill.readline()
+        self.read_offset = self.spill.tell()
+        self.spilled -= 1
+
+        if not self.spilled:
+            self.spill.seek(0)
+            self.spill.truncate()
+            self.read_offset = 0
+
+        return DataItem(json.loads(line))
+
+    def status(self):
+        with self.mutex:
+            return {
+                'length': self._qsize(),
+                'max_length': self.maxsize,
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'spilled': self.spilled,
+                'spilled_total': self.spilled_total,
+            }
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Local read-only status endpoint.
+If you write "status_socket" option in global section as following:
+    [global]
+    status_socket = /var/run/blackbird/status.sock
+
+blackbird writes its internal status(queue length, last run of each job,
+result of sender and so on) as JSON to every client which connects to
+the unix domain socket, and closes the connection.
+e.g:
+    socat - UNIX-CONNECT:/var/run/blackbird/status.sock
+"""
+
+import json
+import os
+import SocketServer
+import threading
+
+
+class StatusHandler(SocketServer.BaseRequestHandler):
+    """
+    Write JSON of the status and close the connection.
+    Requests from clients are not read.
+    """
+
+    def handle(self):
+        try:
+            status = self.server.snapshot()
+        except Exception as error:
+            status = {'error': str(error)}
+
+        self.request.sendall(
+            json.dumps(status, default=str, sort_keys=True) + '\n'
+        )
+
+
+class StatusServer(threading.Thread):
+    """
+    Thread which serves the status on the unix domain socket.
+    "snapshot" argument is callable which returns the status as dict.
+    The clients are served one by one in this thread,
+    so this thread doesn't cost anything while nobody connects.
+    """
+
+    def __init__(self, path, snapshot, logger, mode=0660):
+        threading.Thread.__init__(self, name='status_server')
+        self.setDaemon(True)
+        self.path = path
+        self.snapshot = snapshot
+        self.logger = logger
+        self.mode = mode
+        self.server = None
+
+    def bind(self):
+        """
+        Create the unix domain socket.
+        The stale socket file of previous process is removed.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+        self.server = SocketServer.UnixStreamServer(self.path, StatusHandler)
+        self.server.snapshot = self.snapshot
+        os.chmod(self.path, self.mode)
+
+    def run(self):
+        try:
+            if self.server is None:
+                self.bind()
+        except (IOError, OSError) as error:
+            self.logger.error(
+                'Failed to create status socket {0}: {1}'
+                ''.format(self.path, error)
+            )
+            return
+
+        self.logger.info('serving status on {0}'.format(self.path))
+        self.server.serve_forever()
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
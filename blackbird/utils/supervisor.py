@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Supervision of failing jobs.
+Executor asks JobSupervisor how long to wait before the next run.
+Options at each section in config file:
+    # cap of exponential backoff after consecutive failures (sec).
+    max_backoff = 600
+    # open the circuit after this number of consecutive failures.
+    # 0 means that the circuit is never opened.
+    circuit_threshold = 5
+    # while the circuit is open, the job is run only once per this seconds
+    # (or "interval" if it is longer).
+    circuit_probe_interval = 600
+"""
+
+
+class JobSupervisor(object):
+    """
+    Count consecutive failures of a job and decide the delay of next run.
+
+    closed: delay is "interval" while the job succeeds.
+            After N consecutive failures,
+            delay is interval * 2 ** N up to "max_backoff".
+    open:   After "threshold" consecutive failures the circuit is opened,
+            the job is probed every "probe_interval" seconds
+            (or "interval" if it is longer).
+            One success closes the circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+
+    def __init__(self, interval, max_backoff=600, threshold=5,
+                 probe_interval=600):
+        self.interval = float(interval)
+        self.max_backoff = max(float(max_backoff), self.interval)
+        self.threshold = threshold
+        self.probe_interval = float(probe_interval)
+
+        self.failures = 0
+        self.state = self.CLOSED
+
+    def success(self):
+        """
+        Record a success. Return True if the circuit has been closed.
+        """
+        closed = self.state == self.OPEN
+        self.failures = 0
+        self.state = self.CLOSED
+        return closed
+
+    def failure(self):
+        """
+        Record a failure. Return True if the circuit has been opened.
+        """
+        self.failures += 1
+        if (self.state == self.CLOSED and
+                self.threshold and self.failures >= self.threshold):
+            self.state = self.OPEN
+            return True
+        return False
+
+    def delay(self):
+        """
+        Seconds to wait before the next run.
+        """
+        if self.state == self.OPEN:
+            # a failing job never runs more often than a healthy one.
+            return max(self.probe_interval, self.interval)
+        if self.failures == 0:
+            return self.interval
+
+        # avoid huge numbers after many failures.
+        exponent = min(self.failures, 32)
+        return min(self.interval * 2 ** exponent, self.max_backoff)
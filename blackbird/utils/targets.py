@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+One section, many targets.
+If you write "targets"(or "targets_file") option at a section,
+the plugin is run against all the targets in one job.
+e.g:
+    [memcached]
+    module = memcached
+    # HOST[:PORT][=ZABBIX_HOSTNAME]
+    targets = 10.0.0.1:11211=cache01.example.com, 10.0.0.2:11211
+    # one target per line, "#" starts a comment.
+    targets_file = /etc/blackbird/memcached.targets
+    # number of targets collected at the same time.
+    target_concurrency = 16
+    # hostname of the targets without "=ZABBIX_HOSTNAME".
+    target_hostname = {host}
+
+Each target gets its own ConcreteJob whose "host", "port" and "hostname"
+options are replaced, so plugins need no change.
+The targets are collected in parallel by a thread pool
+(or by the event loop if "build_items" is a coroutine).
+A failing target doesn't stop the others, it is logged and counted as
+"blackbird.job.target_failures[SECTION]".
+The run fails only when all the targets fail.
+CPU time of the targets is measured in the threads of the pool
+and summed up as CPU time of the job.
+"""
+
+import Queue
+import multiprocessing.pool
+import os
+import re
+import sys
+
+from blackbird.plugins.base import StatisticsItem
+from blackbird.utils import accounting
+from blackbird.utils import eventloop
+from blackbird.utils.error import BlackbirdError
+from blackbird.utils.eventloop import From
+
+TARGET_PATTERN = re.compile(
+    r'^(?:\[(?P<host6>[^\]]+)\]|(?P<host>[^:=\s\[\]]+))'
+    r'(?::(?P<port>\d+))?'
+    r'(?:=(?P<hostname>\S+))?$'
+)
+
+
+def load_targets(targets=(), targets_file=None):
+    """
+    Return the target entries of the option and the file.
+    """
+    entries = [entry.strip() for entry in targets if entry.strip()]
+    if targets_file is not None:
+        try:
+            with open(targets_file) as fileobj:
+                for line in fileobj:
+                    line = line.split('#', 1)[0].strip()
+                    if line:
+                        entries.append(line)
+        except IOError as error:
+            raise BlackbirdError(
+                'cannot read targets_file {0}: {1}'
+                ''.format(targets_file, error)
+            )
+    return entries
+
+
+def target_options(options, entry):
+    """
+    Return the copy of the section options for the target entry.
+    """
+    matched = TARGET_PATTERN.match(entry)
+    if matched is None:
+        raise BlackbirdError('invalid target "{0}"'.format(entry))
+
+    host = matched.group('host6') or matched.group('host')
+    port = matched.group('port')
+
+    overrides = dict(options)
+    overrides['host'] = host
+    if port is not None:
+        overrides['port'] = int(port)
+    hostname = matched.group('hostname')
+    if hostname is None:
+        template = options.get('target_hostname', '{host}')
+        try:
+            hostname = template.format(
+                host=host, port=overrides.get('port', '')
+            )
+        except (KeyError, IndexError, ValueError) as error:
+            raise BlackbirdError(
+                'invalid target_hostname "{0}": {1}'.format(template, error)
+            )
+    overrides['hostname'] = hostname
+    return overrides
+
+
+class TargetGroup(object):
+    """
+    Job method which runs the methods of all the targets.
+    "methods" is the list of (target, method).
+    """
+
+    def __init__(self, section, methods, concurrency=16, logger=None,
+                 stats_queue=None, coroutine=False):
+        self.section = section
+        self.methods = methods
+        self.concurrency = concurrency
+        self.logger = logger
+        self.stats_queue = stats_queue
+        self.coroutine = coroutine
+
+        self.failures = dict()
+        # CPU time of the targets in the last run(None if unknown).
+        self.cpu_seconds = None
+        self._pool = None
+        self._pid = None
+
+    def __call__(self):
+        if self.coroutine:
+            return self._gather()
+
+        self.cpu_seconds = None
+        results = [
+            self._thread_pool().apply_async(self._run, (target, method))
+            for target, method in self.methods
+        ]
+        results = [result.get() for result in results]
+        cpu_seconds = [usage.cpu_seconds for usage, _ in results]
+        if None not in cpu_seconds:
+            self.cpu_seconds = sum(cpu_seconds)
+        self._check([error for _, error in results])
+
+    def _thread_pool(self):
+        # threads don't survive fork(daemonizing).
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = multiprocessing.pool.ThreadPool(
+                min(self.concurrency, len(self.methods))
+            )
+            self._pid = os.getpid()
+        return self._pool
+
+    def close(self):
+        """
+        Terminate the thread pool, the next call creates it again.
+        """
+        pool, self._pool = self._pool, None
+        # the pool inherited by fork has no threads in this process.
+        if pool is not None and self._pid == os.getpid():
+            pool.terminate()
+            pool.join()
+
+    @staticmethod
+    def _run(target, method):
+        """
+        Return (JobAccounting, exception or None).
+        """
+        usage = accounting.JobAccounting()
+        try:
+            with usage:
+                method()
+        except Exception:
+            return usage, sys.exc_info()[1]
+        return usage, None
+
+    def _gather(self):
+        asyncio = eventloop.asyncio
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        def limited(method):
+            yield From(semaphore.acquire())
+            try:
+                yield From(method())
+            finally:
+                semaphore.release()
+
+        results = yield From(asyncio.gather(
+            *[limited(method) for _, method in self.methods],
+            return_exceptions=True
+        ))
+        self._check(results)
+
+    def _check(self, errors):
+        """
+        Log and count the failed targets.
+        """
+        failed = 0
+        for (target, _), error in zip(self.methods, errors):
+            if not isinstance(error, BaseException):
+                self.failures.pop(target, None)
+                continue
+            failed += 1
+            self.failures[target] = self.failures.get(target, 0) + 1
+            self.logger.error(
+                '%s: target %s failed: %s', self.section, target, error
+            )
+
+        if failed:
+            self._put_stats(failed)
+        if failed and failed == len(self.methods):
+            raise BlackbirdError(
+                'all {0} targets of {1} failed'.format(failed, self.section)
+            )
+
+    def _put_stats(self, failed):
+        if self.stats_queue is None:
+            return
+        try:
+            self.stats_queue.put(StatisticsItem(
+                key='blackbird.job.target_failures[{0}]'.format(
+                    self.section
+                ),
+                value=failed
+            ), block=False)
+        except Queue.Full:
+            pass
+
+    def status(self):
+        return {
+            'targets': len(self.methods),
+            'concurrency': self.concurrency,
+            # consecutive failures of each failing target.
+            'failing': dict(self.failures),
+        }
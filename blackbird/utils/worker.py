@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Process execution mode of jobs.
+If you write "executor" option as following at each section in config file:
+    executor = process
+
+the job of the section runs in a worker subprocess
+instead of the thread of blackbird process,
+so that CPU-bound plugins don't share GIL with other plugins.
+
+The worker puts items into a local batch instead of the item queue,
+and sends the batch to blackbird process through a pipe at once
+after each run.
+"""
+
+import logging
+import multiprocessing
+import Queue
+
+from blackbird.plugins.base import BlackbirdPluginError
+from blackbird.plugins.base import DataItem
+from blackbird.plugins.base import StatisticsItem
+from blackbird.utils import accounting
+from blackbird.utils.error import JobTimeoutError
+
+
+class BatchQueue(object):
+    """
+    Queue-like object which is set to ConcreteJob in the worker process.
+    Items are kept in a list until the end of the run.
+    """
+
+    def __init__(self):
+        self.items = list()
+
+    def put(self, item, block=True, timeout=None):
+        self.items.append(item)
+
+    def put_nowait(self, item):
+        self.items.append(item)
+
+    def qsize(self):
+        return len(self.items)
+
+    def empty(self):
+        return not self.items
+
+    def drain(self):
+        """
+        Return all items and clear the batch.
+        """
+        items, self.items = self.items, list()
+        return items
+
+
+def _worker_main(conn, job_obj, method, logger):
+    """
+    Main function of the worker process.
+    Run "method" every time "run" is received,
+    and send back the batch of items as following tuple:
+        (error_message or None, [item.data, ...],
+         [(stats_item.data, gauge), ...], cpu_seconds)
+    """
+
+    # The locks of the handlers may have been held
+    # by another thread of parent at the time of fork.
+    if isinstance(logger, logging.Logger):
+        for handler in logger.handlers:
+            handler.createLock()
+
+    queue = BatchQueue()
+    stats_queue = BatchQueue()
+    job_obj.queue = queue
+    if hasattr(job_obj, 'stats_queue'):
+        job_obj.stats_queue = stats_queue
+
+    while True:
+        try:
+            conn.recv()
+        except (EOFError, IOError):
+            # blackbird process has gone.
+            return
+
+        error = None
+        usage = accounting.JobAccounting()
+        try:
+            with usage:
+                method()
+        except Exception as exception:
+            error = '{0}: {1}'.format(type(exception).__name__, exception)
+
+        conn.send((
+            error,
+            [item.data for item in queue.drain()],
+            [
+                (item.data, getattr(item, 'gauge', False))
+                for item in stats_queue.drain()
+            ],
+            usage.cpu_seconds,
+        ))
+
+
+class ProcessJob(object):
+    """
+    Callable which is registered as a job instead of the job method.
+    Executor calls this object as usual,
+    and this object asks the worker process to run the job method
+    and puts the received items into the item queue.
+
+    If the worker process has died,
+    it is restarted at the next run and
+    "blackbird.job.worker_restarts[SECTION]" is put to "stats_queue".
+    If the worker doesn't answer within "timeout" seconds,
+    it is killed(and replaced at the next run) and JobTimeoutError is raised.
+    """
+
+    def __init__(self, name, section, job_obj, method,
+                 queue, stats_queue, logger, timeout=None):
+        self.name = name
+        self.section = section
+        self.job_obj = job_obj
+        self.method = method
+        self.queue = queue
+        self.stats_queue = stats_queue
+        self.logger = logger
+        self.timeout = timeout
+
+        self.process = None
+        self.conn = None
+        self.restarts = 0
+
+    def __call__(self):
+        self.start()
+
+        try:
+            self.conn.send('run')
+            if self.timeout is not None and not self.conn.poll(self.timeout):
+                self.stop()
+                raise JobTimeoutError(
+                    '{0} exceeded job_timeout ({1} sec). '
+                    'worker process(pid {2}) was killed.'
+                    ''.format(self.name, self.timeout, self.process.pid)
+                )
+            error, items, stats, cpu_seconds = self.conn.recv()
+        except (EOFError, IOError):
+            exitcode = self.stop()
+            raise BlackbirdPluginError(
+                'worker process of {0} has died (exitcode {1})'
+                ''.format(self.name, exitcode)
+            )
+
+        for data in items:
+            try:
+                self.queue.put(DataItem(data), block=False)
+            except Queue.Full:
+                self.logger.error('Blackbird item Queue is Full!!!')
+                break
+
+        for data, gauge in stats:
+            self._put_stats(data['key'], data['value'], gauge)
+        if cpu_seconds is not None:
+            self._put_stats(
+                'blackbird.job.cpu_seconds[{0}]'.format(self.section),
+                cpu_seconds
+            )
+
+        if error is not None:
+            raise BlackbirdPluginError(
+                '{0} failed in worker process: {1}'.format(self.name, error)
+            )
+
+    def start(self):
+        """
+        Start the worker process unless it is running.
+        """
+        if self.process is not None and self.process.is_alive():
+            return
+
+        if self.process is not None:
+            self.stop()
+            self.restarts += 1
+            self._put_stats(
+                'blackbird.job.worker_restarts[{0}]'.format(self.section), 1
+            )
+
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            name='{0}-worker'.format(self.name),
+            target=_worker_main,
+            args=(child_conn, self.job_obj, self.method, self.logger)
+        )
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+
+        self.logger.info(
+            'started worker process of {0} (pid {1})'
+            ''.format(self.name, self.process.pid)
+        )
+
+    def stop(self):
+        """
+        Terminate the worker process and return its exitcode.
+        """
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join(1)
+        self.conn.close()
+
+        return self.process.exitcode
+
+    def status(self):
+        return {
+            'pid': self.process.pid if self.process is not None else None,
+            'restarts': self.restarts,
+        }
+
+    def _put_stats(self, key, value, gauge=False):
+        if self.stats_queue is None:
+            return
+        try:
+            self.stats_queue.put(
+                StatisticsItem(key=key, value=value, gauge=gauge),
+                block=False
+            )
+        except Queue.Full:
+            pass
@@ -33,7 +33,8 @@ setup(
         "python-daemon<2",
     ],
     tests_require=[
-        'nose'
+        'nose',
+        'trollius',
     ],
     classifiers=[
         'Programming Language :: Python :: 2.6',